@@ -4,42 +4,54 @@ functions.
 
 """
 from .code_edit import CodeEdit
+from .decoration import DecorationPool
 from .decoration import TextDecoration
+from .decoration import ViewportDecorations
 from .encodings import ENCODINGS_MAP, convert_to_codec_key
 from .manager import Manager
 from .mode import Mode
 from .panel import Panel
+from .snapshot import DocumentSnapshot
+from .snapshot import SnapshotCache
 from .syntax_highlighter import ColorScheme
 from .syntax_highlighter import PYGMENTS_STYLES
 from .syntax_highlighter import SyntaxHighlighter
 from .syntax_highlighter import TextBlockUserData
 from .utils import TextHelper, TextBlockHelper
 from .utils import get_block_symbol_data
+from .utils import is_format_change
 from .utils import DelayJobRunner
 from .folding import FoldDetector
 from .folding import IndentFoldDetector
 from .folding import CharBasedFoldDetector
 from .folding import FoldScope
+from .folding import FoldIndex
 
 
 __all__ = [
     'convert_to_codec_key',
     'get_block_symbol_data',
+    'is_format_change',
     'CharBasedFoldDetector',
     'CodeEdit',
     'ColorScheme',
+    'DecorationPool',
     'DelayJobRunner',
+    'DocumentSnapshot',
     'ENCODINGS_MAP',
     'FoldDetector',
+    'FoldIndex',
     'IndentFoldDetector',
     'FoldScope',
     'Manager',
     'Mode',
     'Panel',
     'PYGMENTS_STYLES',
+    'SnapshotCache',
     'SyntaxHighlighter',
     'TextBlockUserData',
     'TextDecoration',
     'TextHelper',
-    'TextBlockHelper'
+    'TextBlockHelper',
+    'ViewportDecorations'
 ]
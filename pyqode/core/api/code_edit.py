@@ -13,6 +13,7 @@ import logging
 import platform
 from pyqode.core import icons
 from pyqode.core.cache import Cache
+from pyqode.core.api.snapshot import SnapshotCache
 from pyqode.core.api.utils import DelayJobRunner, TextHelper
 from pyqode.core.dialogs.goto import DlgGotoLine
 from pyqode.core.managers import BackendManager
@@ -171,6 +172,26 @@ class CodeEdit(QtWidgets.QPlainTextEdit):
                 c.show_whitespaces = value
             self.rehighlight()
 
+    @property
+    def long_line_limit(self):
+        """
+        Maximum number of columns of a line that are scanned by the editor
+        modes (syntax highlighting, white spaces, symbol matching, occurrences
+        highlighting,...). The end of longer lines (e.g. minified files) is
+        rendered as plain text. 0 means no limit.
+
+        Default is 10000.
+        """
+        return self._long_line_limit
+
+    @long_line_limit.setter
+    def long_line_limit(self, value):
+        if self._long_line_limit != value:
+            self._long_line_limit = value
+            for c in self.clones:
+                c.long_line_limit = value
+            self.rehighlight()
+
     @property
     def font_name(self):
         """
@@ -444,6 +465,9 @@ class CodeEdit(QtWidgets.QPlainTextEdit):
         self._panels = PanelsManager(self)
         self._decorations = TextDecorationsManager(self)
         self.document().modificationChanged.connect(self._emit_dirty_changed)
+        # create the snapshot cache now, so that it is notified of the
+        # document changes before the modes and panels
+        SnapshotCache.get(self.document())
 
         self._word_separators = [
             '~', '!', '@', '#', '$', '%', '^', '&', '*', '(', ')', '+', '{',
@@ -458,6 +482,7 @@ class CodeEdit(QtWidgets.QPlainTextEdit):
         self._foreground = None
         self._sel_foreground = None
         self._tab_length = 4
+        self._long_line_limit = 10000
         self._zoom_level = 0
         self._font_size = 10
         self._background = None
@@ -560,6 +585,7 @@ class CodeEdit(QtWidgets.QPlainTextEdit):
         clone.tab_length = self.tab_length
         clone.save_on_focus_out = self.save_on_focus_out
         clone.show_whitespaces = self.show_whitespaces
+        clone.long_line_limit = self.long_line_limit
         clone.font_name = self.font_name
         clone.font_size = self.font_size
         clone.zoom_level = self.zoom_level
@@ -576,13 +602,14 @@ class CodeEdit(QtWidgets.QPlainTextEdit):
         Closes the editor, stops the backend and removes any installed
         mode/panel.
 
-        This is also where we cache the cursor position.
+        This is also where we cache the cursor position and the fold state.
 
         :param clear: True to clear the editor content before closing.
         """
         if self._tooltips_runner:
             self._tooltips_runner.cancel_requests()
             self._tooltips_runner = None
+        self.file._cache_fold_state()
         self.decorations.clear()
         self.modes.clear()
         self.panels.clear()
@@ -632,12 +659,32 @@ class CodeEdit(QtWidgets.QPlainTextEdit):
         self._modified_lines.clear()
         import time
         t = time.time()
-        super(CodeEdit, self).setPlainText(txt)
+        highlighter = self.syntax_highlighter
+        if highlighter is not None:
+            # big texts are highlighted lazily
+            highlighter.set_plain_text(
+                txt, super(CodeEdit, self).setPlainText)
+        else:
+            super(CodeEdit, self).setPlainText(txt)
         _logger().log(5, 'setPlainText duration: %fs' % (time.time() - t))
         self.new_text_set.emit()
         self.redoAvailable.emit(False)
         self.undoAvailable.emit(False)
 
+    def snapshot(self):
+        """
+        Returns an immutable snapshot of the text of the current revision of
+        the document.
+
+        Use this method instead of ``toPlainText`` to get the whole text: the
+        text is copied once per revision and shared by all the modes and
+        panels (and clones) that need it. The snapshot also provides a line
+        index (see :class:`pyqode.core.api.DocumentSnapshot`).
+
+        :rtype: pyqode.core.api.DocumentSnapshot
+        """
+        return SnapshotCache.get(self.document()).snapshot()
+
     def add_action(self, action, sub_menu='Advanced'):
         """
         Adds an action to the editor's context menu.
@@ -1015,8 +1062,10 @@ class CodeEdit(QtWidgets.QPlainTextEdit):
             cursor = self.cursorForPosition(event.pos())
             for sel in self.decorations:
                 if sel.cursor.blockNumber() == cursor.blockNumber():
-                    if sel.contains_cursor(cursor):
-                        sel.signals.clicked.emit(sel)
+                    # signals are created when someone connects to them
+                    signals = getattr(sel, '_signals', None)
+                    if signals is not None and sel.contains_cursor(cursor):
+                        signals.clicked.emit(sel)
         if not event.isAccepted():
             event.setAccepted(initial_state)
             super(CodeEdit, self).mousePressEvent(event)
@@ -2,6 +2,8 @@
 This module contains the text decoration API.
 
 """
+import bisect
+
 from pyqode.qt import QtWidgets, QtCore, QtGui
 
 
@@ -14,7 +16,8 @@ class TextDecoration(QtWidgets.QTextEdit.ExtraSelection):
     (useful for errors markers and so on...)
 
     Text decoration expose a **clicked** signal stored in a separate QObject:
-        :attr:`pyqode.core.api.TextDecoration.Signals`
+        :attr:`pyqode.core.api.TextDecoration.Signals`. This QObject is
+        created the first time :attr:`signals` is accessed.
 
     .. code-block:: python
 
@@ -47,8 +50,9 @@ class TextDecoration(QtWidgets.QTextEdit.ExtraSelection):
             QTextCursor/QTextBlock/QTextDocument
         :param start_pos: Selection start position
         :param end_pos: Selection end position
-        :param start_line: Selection start line.
-        :param end_line: Selection end line.
+        :param start_line: Selection start line (block number).
+        :param end_line: Selection end line (block number), the selection
+            ends at the start of this line.
         :param draw_order: The draw order of the selection, highest values will
             appear on top of the lowest values.
         :param tooltip: An optional tooltips that will be automatically shown
@@ -58,7 +62,7 @@ class TextDecoration(QtWidgets.QTextEdit.ExtraSelection):
         .. note:: Use the cursor selection if startPos and endPos are none.
         """
         super(TextDecoration, self).__init__()
-        self.signals = self.Signals()
+        self._signals = None
         self.draw_order = draw_order
         self.tooltip = tooltip
         self.cursor = QtGui.QTextCursor(cursor_or_bloc_or_doc)
@@ -69,12 +73,31 @@ class TextDecoration(QtWidgets.QTextEdit.ExtraSelection):
         if end_pos is not None:
             self.cursor.setPosition(end_pos, QtGui.QTextCursor.KeepAnchor)
         if start_line is not None:
-            self.cursor.movePosition(self.cursor.Start, self.cursor.MoveAnchor)
-            self.cursor.movePosition(self.cursor.Down, self.cursor.MoveAnchor,
-                                     start_line)
+            self.cursor.setPosition(self._line_position(start_line))
         if end_line is not None:
-            self.cursor.movePosition(self.cursor.Down, self.cursor.KeepAnchor,
-                                     end_line - start_line)
+            self.cursor.setPosition(self._line_position(end_line),
+                                    QtGui.QTextCursor.KeepAnchor)
+
+    @property
+    def signals(self):
+        """
+        Signals of the decoration (see :class:`TextDecoration.Signals`),
+        created on first access.
+        """
+        if self._signals is None:
+            self._signals = self.Signals()
+        return self._signals
+
+    def _line_position(self, line):
+        """
+        Returns the position of the start of a line, the start of the last
+        line if ``line`` is out of range.
+        """
+        doc = self.cursor.document()
+        block = doc.findBlockByNumber(line)
+        if not block.isValid():
+            block = doc.lastBlock()
+        return block.position()
 
     def contains_cursor(self, cursor):
         """
@@ -189,3 +212,246 @@ class TextDecoration(QtWidgets.QTextEdit.ExtraSelection):
         self.format.setUnderlineStyle(
             QtGui.QTextCharFormat.WaveUnderline)
         self.format.setUnderlineColor(color)
+
+
+class DecorationPool(object):
+    """
+    Pool of reusable text decorations, for the modes that create and remove a
+    lot of short lived decorations (e.g. occurrences or symbols matching).
+
+    Released decorations are reset and reused by :meth:`acquire` instead of
+    creating new ones.
+
+    .. code-block:: python
+
+        pool = DecorationPool()
+        deco = pool.acquire(editor.document(), start, end)
+        deco.set_background(QtGui.QBrush(QtGui.QColor('yellow')))
+        editor.decorations.append(deco)
+        ...
+        editor.decorations.remove(deco)
+        pool.release([deco])
+
+    .. note:: Only release decorations that are not used anymore (i.e. that
+        have been removed from the editor). Decorations whose signals have
+        been used are not reused.
+    """
+    def __init__(self, max_size=1000):
+        """
+        :param max_size: maximum number of decorations kept in the pool.
+        """
+        self.max_size = max_size
+        self._free = []
+
+    def __len__(self):
+        return len(self._free)
+
+    def acquire(self, document, start_pos, end_pos, draw_order=0,
+                tooltip=None):
+        """
+        Gets a decoration that selects the text between ``start_pos`` and
+        ``end_pos``. The decoration has the default (empty) format.
+
+        :param document: QTextDocument
+        :param start_pos: Selection start position
+        :param end_pos: Selection end position
+        :param draw_order: The draw order of the decoration.
+        :param tooltip: An optional tooltip.
+        :rtype: TextDecoration
+        """
+        try:
+            deco = self._free.pop()
+        except IndexError:
+            return TextDecoration(document, start_pos=start_pos,
+                                  end_pos=end_pos, draw_order=draw_order,
+                                  tooltip=tooltip)
+        if deco.cursor.document() is not document:
+            deco.cursor = QtGui.QTextCursor(document)
+        deco.cursor.setPosition(start_pos)
+        deco.cursor.setPosition(end_pos, QtGui.QTextCursor.KeepAnchor)
+        deco.format = QtGui.QTextCharFormat()
+        deco.draw_order = draw_order
+        deco.tooltip = tooltip
+        return deco
+
+    def release(self, decorations):
+        """
+        Gives decorations back to the pool.
+
+        :param decorations: list of TextDecoration
+        """
+        free = self._free
+        for deco in decorations:
+            if len(free) >= self.max_size:
+                break
+            if deco._signals is None:
+                free.append(deco)
+
+    def clear(self):
+        """
+        Empties the pool.
+        """
+        self._free[:] = []
+
+
+class ViewportDecorations(object):
+    """
+    Decorates a (possibly huge) list of text ranges (e.g. search results)
+    without creating a text decoration for each range: decorations are only
+    created for the ranges that intersect the visible part of the document
+    (plus a margin of a few lines). This keeps the cost of highlighting
+    constant, whatever the number of ranges.
+
+    The owner is responsible for calling :meth:`update` when the viewport
+    changed (e.g. by connecting it to ``editor.updateRequest``) and for
+    setting the new list of ranges when they changed (or invalidating them
+    with :meth:`invalidate` until the new ranges are available).
+
+    Editors that do not have an ``updateRequest`` signal (QTextEdit) are
+    decorated eagerly: all the ranges are decorated.
+
+    .. code-block:: python
+
+        decorations = ViewportDecorations(editor, create_deco)
+        editor.updateRequest.connect(decorations.update)
+        decorations.set_ranges([(0, 5), (10, 15)])
+
+        def create_deco(start, end):
+            return TextDecoration(editor.document(), start, end)
+
+    """
+    def __init__(self, editor, factory, margin=50, pool=None):
+        """
+        :param editor: editor instance
+        :param factory: callable that creates the text decoration of a range,
+            it takes two arguments: the range start and end positions.
+        :param margin: number of lines before and after the visible lines
+            that are decorated too.
+        :param pool: optional :class:`DecorationPool` where the removed
+            decorations are released (the factory is then expected to
+            acquire its decorations from the pool).
+        """
+        self.editor = editor
+        self.factory = factory
+        self.margin = margin
+        self.pool = pool
+        self._ranges = []
+        self._starts = []
+        self._ends = []
+        self._decorations = []
+        self._visible_range = None
+
+    def __iter__(self):
+        return iter(self._decorations)
+
+    def __len__(self):
+        return len(self._decorations)
+
+    @property
+    def ranges(self):
+        """
+        Returns the list of decorated ranges, None if they are out of date.
+        """
+        return self._ranges
+
+    def set_ranges(self, ranges):
+        """
+        Sets the list of ranges to decorate and updates the decorations.
+
+        :param ranges: list of tuple(start, end), sorted by start position.
+            Ranges must not be nested into each others (their end positions
+            must be sorted too).
+        """
+        self._ranges = list(ranges)
+        self._starts = [start for start, end in ranges]
+        self._ends = [end for start, end in ranges]
+        self.update(force=True)
+
+    def invalidate(self, *args):
+        """
+        Marks the ranges as out of date: existing decorations are kept (they
+        follow the text edits) but no new decoration will be created until
+        :meth:`set_ranges` is called.
+
+        This method can be connected to any signal (e.g.
+        ``QTextDocument.contentsChange``), its arguments are ignored.
+        """
+        self._ranges = None
+
+    def clear(self):
+        """
+        Removes all the decorations and ranges.
+        """
+        self.reset()
+        self.set_ranges([])
+
+    def reset(self):
+        """
+        Removes the existing decorations, they will be created again on the
+        next update (e.g. when the decorations style changed).
+        """
+        self.editor.decorations.remove_many(self._decorations)
+        if self.pool is not None:
+            self.pool.release(self._decorations)
+        self._decorations[:] = []
+        self._visible_range = None
+
+    def update(self, *args, **kwargs):
+        """
+        Creates the decorations of the visible ranges (if the visible part of
+        the document changed) and removes the ones that are not visible
+        anymore.
+
+        :param force: True to update the decorations even if the visible part
+            of the document did not change. Default is False.
+        """
+        if self._ranges is None or self.editor is None:
+            return
+        visible_range = self.visible_range()
+        if visible_range == self._visible_range and \
+                not kwargs.get('force', False):
+            return
+        self._visible_range = visible_range
+        start, end = visible_range
+        wanted = set(self._ranges[bisect.bisect_left(self._ends, start):
+                                  bisect.bisect_right(self._starts, end)])
+        # decorations follow the text edits, keep the ones that match a
+        # visible range and create the missing ones.
+        decorations = []
+        removed = []
+        for deco in self._decorations:
+            rng = (deco.cursor.selectionStart(), deco.cursor.selectionEnd())
+            if rng in wanted:
+                wanted.remove(rng)
+                decorations.append(deco)
+            else:
+                removed.append(deco)
+        added = [self.factory(start, end) for start, end in sorted(wanted)]
+        with self.editor.decorations.transaction():
+            self.editor.decorations.remove_many(removed)
+            if self.pool is not None:
+                self.pool.release(removed)
+            self.editor.decorations.append_many(added)
+        self._decorations = decorations + added
+
+    def visible_range(self):
+        """
+        Returns the range of the document that is decorated: the visible
+        lines plus :attr:`margin` lines before and after.
+
+        :return: tuple(start, end)
+        """
+        editor = self.editor
+        doc = editor.document()
+        if not hasattr(editor, 'updateRequest'):
+            # QTextEdit, we can't be notified of viewport changes: decorate
+            # the whole document
+            return 0, doc.characterCount()
+        first = editor.firstVisibleBlock().blockNumber()
+        last = editor.cursorForPosition(QtCore.QPoint(
+            0, editor.viewport().height())).blockNumber()
+        first = doc.findBlockByNumber(max(0, first - self.margin))
+        last = doc.findBlockByNumber(last + self.margin)
+        if not last.isValid():
+            last = doc.lastBlock()
+        return first.position(), last.position() + last.length()
@@ -3,9 +3,11 @@ This module contains the code folding API.
 
 """
 from __future__ import print_function
+import bisect
 import logging
 import sys
 from pyqode.core.api.utils import TextBlockHelper
+from pyqode.qt import QtCore
 
 
 def print_tree(editor, file=sys.stdout, print_blocks=False):
@@ -62,6 +64,8 @@ class FoldDetector(object):
         #: Fold level limit, any level greater or equal is skipped.
         #: Default is sys.maxsize (i.e. all levels are accepted)
         self.limit = sys.maxsize
+        # fold index of the document of the processed blocks
+        self._fold_index = None
 
     def process_block(self, current_block, previous_block, text):
         """
@@ -117,6 +121,22 @@ class FoldDetector(object):
             TextBlockHelper.set_fold_trigger(prev, False)
             TextBlockHelper.set_collapsed(prev, False)
 
+        # report the blocks we might have modified to the fold index
+        self._get_fold_index(current_block.document()).update_blocks(
+            previous_block if previous_block else current_block,
+            current_block)
+
+    def _get_fold_index(self, document):
+        """
+        Returns the fold index of ``document``. The index is cached (looking
+        it up is not free), the cache is refreshed when the document changes
+        (e.g. when a new document is set on the editor).
+        """
+        index = self._fold_index
+        if index is None or index._document is not document:
+            index = self._fold_index = FoldIndex.get(document)
+        return index
+
     def detect_fold_level(self, prev_block, block):
         """
         Detects the block fold level.
@@ -179,6 +199,613 @@ class CharBasedFoldDetector(FoldDetector):
         return TextBlockHelper.get_fold_lvl(prev_block)
 
 
+class _FoldChunk(object):
+    """
+    A chunk of consecutive lines of a :class:`FoldIndex`, with a summary of
+    its lines that lets the index skip the whole chunk when searching a line.
+    """
+    __slots__ = ('levels', 'triggers', 'blanks', 'min_level',
+                 'min_trigger_level', 'has_text', 'dirty')
+
+    def __init__(self, levels, triggers, blanks):
+        self.levels = levels
+        self.triggers = triggers
+        self.blanks = blanks
+        self.min_level = 0
+        self.min_trigger_level = 0
+        self.has_text = False
+        self.dirty = True
+
+    def update(self):
+        """
+        Updates the summary of the chunk.
+        """
+        levels = self.levels
+        self.min_level = min(levels) if levels else sys.maxsize
+        self.min_trigger_level = min(
+            [lvl for lvl, trigger in zip(levels, self.triggers) if trigger] or
+            [sys.maxsize])
+        self.has_text = not all(self.blanks)
+        self.dirty = False
+
+
+class FoldIndex(QtCore.QObject):
+    """
+    Index of the fold regions of a document.
+
+    The index mirrors the blocks fold levels, fold triggers and blank state in
+    plain python lists, split in chunks of :attr:`CHUNK_SIZE` lines. Each
+    chunk keeps a summary of its lines (lowest fold level, lowest fold
+    trigger level, whether it has non blank lines), so that scope queries
+    (range, parent and children of a fold trigger) only scan a couple of
+    chunks and the chunk summaries instead of walking over the text blocks
+    of the scope.
+
+    The index is maintained incrementally: the fold detector reports the
+    blocks it has processed (see :meth:`FoldDetector.process_block`) and
+    lines insertions/removals are tracked with the document's
+    ``contentsChange`` signal. Only the chunks of the modified lines are
+    updated.
+
+    There is one index per document, use :meth:`FoldIndex.get` to get it.
+
+    .. note:: If you modify the fold levels/triggers yourself (i.e. without
+        using a :class:`FoldDetector`), call :meth:`invalidate`.
+    """
+    #: Maximum number of lines that are updated incrementally when the text
+    #: changes. Bigger changes (e.g. setPlainText) invalidate the whole index.
+    MAX_INCREMENTAL_LINES = 1000
+
+    #: Number of lines per chunk (chunks are split when they get twice as
+    #: big).
+    CHUNK_SIZE = 256
+
+    @staticmethod
+    def get(document):
+        """
+        Gets the fold index of a document, the index is created if needed.
+
+        :param document: QTextDocument
+        :rtype: FoldIndex
+        """
+        index = document.findChild(FoldIndex)
+        if index is None:
+            index = FoldIndex(document)
+        return index
+
+    def __init__(self, document):
+        super(FoldIndex, self).__init__(document)
+        self._document = document
+        # chunks of lines, None until the index is built
+        self._chunks = None
+        # first line of each chunk
+        self._firsts = []
+        self._count = 0
+        # chunks whose summary must be updated
+        self._dirty = []
+        # blocks processed by the fold detector while the document and the
+        # index were not in sync (during a contentsChange)
+        self._pending = []
+        document.contentsChange.connect(self._on_contents_change)
+
+    def invalidate(self):
+        """
+        Invalidates the whole index, it will be rebuilt on the next query.
+        """
+        self._chunks = None
+        self._dirty = []
+        self._pending[:] = []
+
+    def update_blocks(self, first, last):
+        """
+        Updates the index after the fold level/trigger of a range of blocks
+        has changed.
+
+        :param first: first modified block
+        :param last: last modified block
+        """
+        if self._chunks is None:
+            return
+        if self._count != self._document.blockCount():
+            # contentsChange has not been handled yet, the lines will be
+            # spliced in _on_contents_change
+            self._pending.append((first.blockNumber(), last.blockNumber()))
+        else:
+            self._read_lines(first.blockNumber(), last.blockNumber())
+
+    def get_range(self, line, ignore_blank_lines=True):
+        """
+        Gets the range of the fold region started by a fold trigger.
+
+        :param line: line number of the fold trigger.
+        :param ignore_blank_lines: True to exclude the blank lines at the end
+            of the region.
+        :returns: tuple(int, int)
+        """
+        self._update()
+        if self._line(line)[1]:
+            end = self._region_end(line)
+        else:
+            # not a trigger (anymore), e.g. an outdated FoldScope
+            end = self._scan_end(line)
+        if ignore_blank_lines and end:
+            end = self._previous_non_blank(end)
+        return line, end
+
+    def parent(self, line):
+        """
+        Gets the parent fold trigger of a fold trigger.
+
+        :param line: line number of the fold trigger.
+        :returns: line number of the parent trigger or None.
+        """
+        self._update()
+        level = self._line(line)[0]
+        if not level or not line:
+            return None
+        parent = self._previous_trigger(line - 1, level - 1)
+        if parent is not None:
+            return parent
+        return 0 if self._line(0)[1] else None
+
+    def child_regions(self, line):
+        """
+        Gets the direct child fold triggers of a fold trigger.
+
+        :param line: line number of the fold trigger.
+        :returns: list of line numbers
+        """
+        _, end = self.get_range(line)
+        if line + 1 >= self._count:
+            return []
+        level = self._line(line + 1)[0]
+        children = []
+        child = self._next_trigger(line, level, end)
+        while child is not None:
+            if self._line(child)[0] == level:
+                children.append(child)
+            child = self._next_trigger(child, level, end)
+        return children
+
+    def find_parent_scope(self, line):
+        """
+        Finds the fold trigger of the scope that contains a line.
+
+        :param line: line number
+        :returns: line number of the fold trigger (or the first line of the
+            document if the line is not in a fold scope).
+        """
+        self._update()
+        if self._line(line)[1]:
+            return line
+        # level of the next non blank line
+        next_line = self._next_non_blank(line)
+        if next_line is not None:
+            ref_lvl = self._line(next_line)[0] - 1
+        else:
+            ref_lvl = -1
+        trigger = self._previous_trigger(line, ref_lvl)
+        if trigger is None:
+            return 0
+        return trigger
+
+    def fold_to_level(self, level):
+        """
+        Collapses the regions whose trigger level is greater or equal to
+        ``level`` and expands the other regions.
+
+        The new visibility of every block is computed from the index, in a
+        single pass, and only the blocks whose visibility or trigger state
+        actually changes are modified. It is up to the caller to refresh the
+        layout of those blocks (see
+        :meth:`pyqode.core.panels.FoldingPanel.fold_to_level`).
+
+        :param level: fold level. 0 collapses all the regions,
+            ``sys.maxsize`` expands all the regions.
+        :returns: the range of lines whose visibility changed (first, last)
+            or None if no block visibility changed.
+        """
+        self._update()
+        levels, triggers, blanks = self._lines()
+        count = len(levels)
+        visible = [lvl <= level for lvl in levels]
+        # blank lines that precede a visible trigger stay visible, so do the
+        # blank lines at the end of the document
+        for line in range(count):
+            if triggers[line] and levels[line] <= level:
+                line -= 1
+                while line >= 0 and blanks[line]:
+                    visible[line] = True
+                    line -= 1
+        line = count - 1
+        while line >= 0 and blanks[line]:
+            visible[line] = True
+            line -= 1
+        return self._apply(
+            triggers, visible, [lvl >= level for lvl in levels])
+
+    def collapsed_triggers(self):
+        """
+        Gets the line numbers of the collapsed fold triggers.
+
+        :returns: sorted list of line numbers.
+        """
+        self._update()
+        triggers = self._lines()[1]
+        doc = self._document
+        return [line for line in range(len(triggers)) if triggers[line] and
+                TextBlockHelper.is_collapsed(doc.findBlockByNumber(line))]
+
+    def fold_triggers(self, lines):
+        """
+        Collapses the fold triggers found in ``lines`` and expands the other
+        ones (e.g. to restore the result of :meth:`collapsed_triggers`).
+
+        Like :meth:`fold_to_level`, the new fold state is applied in a single
+        pass. Lines that are not fold triggers are ignored.
+
+        :param lines: line numbers of the triggers to collapse.
+        :returns: the range of lines whose visibility changed (first, last)
+            or None if no block visibility changed.
+        """
+        self._update()
+        triggers = self._lines()[1]
+        count = len(triggers)
+        collapsed = [False] * count
+        # number of collapsed regions that start/stop hiding a line
+        delta = [0] * (count + 1)
+        for line in lines:
+            if 0 <= line < count and triggers[line] and not collapsed[line]:
+                collapsed[line] = True
+                start, end = self.get_range(line)
+                if end > start:
+                    delta[start + 1] += 1
+                    delta[end + 1] -= 1
+        visible = []
+        depth = 0
+        for line in range(count):
+            depth += delta[line]
+            visible.append(depth == 0)
+        return self._apply(triggers, visible, collapsed)
+
+    def _apply(self, triggers, visible, collapsed):
+        """
+        Applies a fold state: the visibility of every line and the collapsed
+        state of every trigger. Only the blocks that actually change are
+        modified.
+        """
+        first = last = None
+        block = self._document.firstBlock()
+        for line in range(len(triggers)):
+            if triggers[line]:
+                if TextBlockHelper.is_collapsed(block) != collapsed[line]:
+                    TextBlockHelper.set_collapsed(block, collapsed[line])
+            if block.isVisible() != visible[line]:
+                block.setVisible(visible[line])
+                if first is None:
+                    first = line
+                last = line
+            block = block.next()
+        if first is None:
+            return None
+        return first, last
+
+    def _lines(self):
+        """
+        Returns the levels, triggers and blanks of all the lines, as three
+        flat lists.
+        """
+        levels, triggers, blanks = [], [], []
+        for chunk in self._chunks:
+            levels += chunk.levels
+            triggers += chunk.triggers
+            blanks += chunk.blanks
+        return levels, triggers, blanks
+
+    def _locate(self, line):
+        """
+        Returns the index of the chunk that contains a line and the offset of
+        the line in that chunk.
+        """
+        index = bisect.bisect_right(self._firsts, line) - 1
+        return index, line - self._firsts[index]
+
+    def _line(self, line):
+        """
+        Returns the level, the trigger flag and the blank flag of a line.
+        """
+        index, offset = self._locate(line)
+        chunk = self._chunks[index]
+        return (chunk.levels[offset], chunk.triggers[offset],
+                chunk.blanks[offset])
+
+    def _region_end(self, line):
+        """
+        Returns the last line of the fold region started by the trigger found
+        at ``line``.
+        """
+        level = self._line(line)[0]
+        ref_lvl = level
+        if line + 1 < self._count and self._line(line + 1)[0] == level:
+            # zone set programmatically, such as imports in pyqode.python
+            ref_lvl -= 1
+        end = self._next_level(line, ref_lvl)
+        if end is None:
+            return self._count - 1
+        return max(end - 1, line + 1)
+
+    def _scan_end(self, line):
+        if line + 1 >= self._count:
+            return line
+        ref_lvl = self._line(line)[0]
+        if self._line(line + 1)[0] == ref_lvl:
+            ref_lvl -= 1
+        end = self._next_level(line + 1, ref_lvl)
+        if end is None:
+            return self._count - 1
+        return end - 1
+
+    def _next_level(self, line, max_level):
+        """
+        Finds the first line after ``line`` whose level is lower or equal to
+        ``max_level``.
+        """
+        if line + 1 >= self._count:
+            return None
+        chunks, firsts = self._chunks, self._firsts
+        index, offset = self._locate(line + 1)
+        while index < len(chunks):
+            chunk = chunks[index]
+            if chunk.min_level <= max_level:
+                levels = chunk.levels
+                for i in range(offset, len(levels)):
+                    if levels[i] <= max_level:
+                        return firsts[index] + i
+            index += 1
+            offset = 0
+        return None
+
+    def _next_trigger(self, line, max_level, last):
+        """
+        Finds the first trigger after ``line`` (and before or at ``last``)
+        whose level is lower or equal to ``max_level``.
+        """
+        if line + 1 > last:
+            return None
+        chunks, firsts = self._chunks, self._firsts
+        index, offset = self._locate(line + 1)
+        while index < len(chunks) and firsts[index] <= last:
+            chunk = chunks[index]
+            if chunk.min_trigger_level <= max_level:
+                levels, triggers = chunk.levels, chunk.triggers
+                for i in range(offset, min(len(levels),
+                                           last - firsts[index] + 1)):
+                    if triggers[i] and levels[i] <= max_level:
+                        return firsts[index] + i
+            index += 1
+            offset = 0
+        return None
+
+    def _previous_trigger(self, line, max_level):
+        """
+        Finds the last trigger at or before ``line`` whose level is lower or
+        equal to ``max_level``.
+        """
+        if line < 0 or max_level < 0:
+            return None
+        chunks, firsts = self._chunks, self._firsts
+        index, offset = self._locate(line)
+        while index >= 0:
+            chunk = chunks[index]
+            if chunk.min_trigger_level <= max_level:
+                levels, triggers = chunk.levels, chunk.triggers
+                for i in range(offset, -1, -1):
+                    if triggers[i] and levels[i] <= max_level:
+                        return firsts[index] + i
+            index -= 1
+            if index >= 0:
+                offset = len(chunks[index].levels) - 1
+        return None
+
+    def _next_non_blank(self, line):
+        """
+        Finds the first non blank line at or after ``line``.
+        """
+        chunks, firsts = self._chunks, self._firsts
+        index, offset = self._locate(line)
+        while index < len(chunks):
+            chunk = chunks[index]
+            if chunk.has_text:
+                blanks = chunk.blanks
+                for i in range(offset, len(blanks)):
+                    if not blanks[i]:
+                        return firsts[index] + i
+            index += 1
+            offset = 0
+        return None
+
+    def _previous_non_blank(self, line):
+        """
+        Finds the last non blank line at or before ``line`` (0 if there is
+        none).
+        """
+        chunks, firsts = self._chunks, self._firsts
+        index, offset = self._locate(line)
+        while index >= 0:
+            chunk = chunks[index]
+            if chunk.has_text:
+                blanks = chunk.blanks
+                for i in range(offset, -1, -1):
+                    if not blanks[i]:
+                        return firsts[index] + i
+            index -= 1
+            if index >= 0:
+                offset = len(chunks[index].blanks) - 1
+        return 0
+
+    def _on_contents_change(self, position, chars_removed, chars_added):
+        if self._chunks is None:
+            return
+        doc = self._document
+        first = doc.findBlock(position).blockNumber()
+        last = doc.findBlock(position + chars_added).blockNumber()
+        if last == -1:
+            last = doc.blockCount() - 1
+        delta = doc.blockCount() - self._count
+        if first == -1 or last - first > self.MAX_INCREMENTAL_LINES or \
+                abs(delta) > self.MAX_INCREMENTAL_LINES:
+            self.invalidate()
+            return
+        if delta > 0:
+            self._insert_lines(first + 1, delta)
+        elif delta < 0:
+            self._remove_lines(first + 1, -delta)
+        self._read_lines(first, last)
+        for first, last in self._pending:
+            self._read_lines(first, last)
+        self._pending[:] = []
+
+    def _insert_lines(self, line, count):
+        """
+        Inserts ``count`` (empty) lines before ``line``.
+        """
+        chunks = self._chunks
+        index, offset = self._locate(line)
+        chunk = chunks[index]
+        chunk.levels[offset:offset] = [0] * count
+        chunk.triggers[offset:offset] = [False] * count
+        chunk.blanks[offset:offset] = [False] * count
+        self._touch(chunk)
+        if len(chunk.levels) > 2 * self.CHUNK_SIZE:
+            chunks[index:index + 1] = self._split(
+                chunk.levels, chunk.triggers, chunk.blanks)
+        self._count += count
+        self._update_firsts()
+
+    def _remove_lines(self, line, count):
+        """
+        Removes ``count`` lines, starting at ``line``.
+        """
+        chunks = self._chunks
+        first_index, offset = self._locate(line)
+        index = first_index
+        remaining = count
+        while remaining:
+            chunk = chunks[index]
+            end = min(len(chunk.levels), offset + remaining)
+            del chunk.levels[offset:end]
+            del chunk.triggers[offset:end]
+            del chunk.blanks[offset:end]
+            self._touch(chunk)
+            remaining -= end - offset
+            if chunk.levels:
+                index += 1
+            else:
+                del chunks[index]
+            offset = 0
+        self._count -= count
+        # merge the chunk that lost lines with its neighbour if it got small
+        index = min(first_index, len(chunks) - 1)
+        if len(chunks) > 1 and \
+                len(chunks[index].levels) < self.CHUNK_SIZE // 2:
+            index = min(index, len(chunks) - 2)
+            merged = chunks[index:index + 2]
+            chunks[index:index + 2] = self._split(
+                merged[0].levels + merged[1].levels,
+                merged[0].triggers + merged[1].triggers,
+                merged[0].blanks + merged[1].blanks)
+        self._update_firsts()
+
+    def _split(self, levels, triggers, blanks):
+        """
+        Splits lines in chunks of :attr:`CHUNK_SIZE` lines.
+        """
+        size = self.CHUNK_SIZE
+        chunks = [_FoldChunk(levels[i:i + size], triggers[i:i + size],
+                             blanks[i:i + size])
+                  for i in range(0, max(len(levels), 1), size)]
+        self._dirty += chunks
+        return chunks
+
+    def _touch(self, chunk):
+        """
+        Marks the summary of a chunk as outdated.
+        """
+        if not chunk.dirty:
+            chunk.dirty = True
+            self._dirty.append(chunk)
+
+    def _update_firsts(self):
+        firsts = []
+        line = 0
+        for chunk in self._chunks:
+            firsts.append(line)
+            line += len(chunk.levels)
+        self._firsts = firsts
+
+    def _read_lines(self, first, last):
+        block = self._document.findBlockByNumber(first)
+        chunks = self._chunks
+        index, offset = self._locate(first)
+        for _ in range(first, last + 1):
+            if not block.isValid():
+                break
+            chunk = chunks[index]
+            level = TextBlockHelper.get_fold_lvl(block)
+            trigger = TextBlockHelper.is_fold_trigger(block)
+            blank = not block.text().strip()
+            if (level != chunk.levels[offset] or
+                    trigger != chunk.triggers[offset] or
+                    blank != chunk.blanks[offset]):
+                chunk.levels[offset] = level
+                chunk.triggers[offset] = trigger
+                chunk.blanks[offset] = blank
+                self._touch(chunk)
+            block = block.next()
+            offset += 1
+            if offset == len(chunk.levels):
+                index += 1
+                offset = 0
+
+    def _update(self):
+        """
+        Brings the index up to date.
+        """
+        if self._chunks is None or \
+                self._count != self._document.blockCount():
+            self._build()
+        if self._dirty:
+            for chunk in self._dirty:
+                if chunk.dirty:
+                    chunk.update()
+            self._dirty = []
+
+    def _build(self):
+        """
+        Builds the whole index.
+        """
+        doc = self._document
+        count = doc.blockCount()
+        lines = doc.toPlainText().split('\n')
+        self._dirty = []
+        levels = []
+        triggers = []
+        # read the text of the blocks if the lines are not separated by \n
+        blanks = ([not line.strip() for line in lines]
+                  if len(lines) == count else [])
+        block = doc.firstBlock()
+        while block.isValid():
+            levels.append(TextBlockHelper.get_fold_lvl(block))
+            triggers.append(TextBlockHelper.is_fold_trigger(block))
+            if len(lines) != count:
+                blanks.append(not block.text().strip())
+            block = block.next()
+        self._chunks = self._split(levels, triggers, blanks)
+        self._count = count
+        self._update_firsts()
+        self._pending[:] = []
+
+
 class FoldScope(object):
     """
     Utility class for manipulating fold-able code scope (fold/unfold,
@@ -225,6 +852,7 @@ class FoldScope(object):
         if not TextBlockHelper.is_fold_trigger(block):
             raise ValueError('Not a fold trigger')
         self._trigger = block
+        self._index = FoldIndex.get(block.document())
 
     def get_range(self, ignore_blank_lines=True):
         """
@@ -237,25 +865,8 @@ class FoldScope(object):
             that is part of the fold scope).
         :returns: tuple(int, int)
         """
-        ref_lvl = self.trigger_level
-        first_line = self._trigger.blockNumber()
-        block = self._trigger.next()
-        last_line = block.blockNumber()
-        lvl = self.scope_level
-        if ref_lvl == lvl:  # for zone set programmatically such as imports
-                            # in pyqode.python
-            ref_lvl -= 1
-        while (block.isValid() and
-                TextBlockHelper.get_fold_lvl(block) > ref_lvl):
-            last_line = block.blockNumber()
-            block = block.next()
-
-        if ignore_blank_lines and last_line:
-            block = block.document().findBlockByNumber(last_line)
-            while block.blockNumber() and block.text().strip() == '':
-                block = block.previous()
-                last_line = block.blockNumber()
-        return first_line, last_line
+        return self._index.get_range(
+            self._trigger.blockNumber(), ignore_blank_lines)
 
     def fold(self):
         """
@@ -297,15 +908,9 @@ class FoldScope(object):
         """
         This generator generates the list of direct child regions.
         """
-        start, end = self.get_range()
-        block = self._trigger.next()
-        ref_lvl = self.scope_level
-        while block.blockNumber() <= end and block.isValid():
-            lvl = TextBlockHelper.get_fold_lvl(block)
-            trigger = TextBlockHelper.is_fold_trigger(block)
-            if lvl == ref_lvl and trigger:
-                yield FoldScope(block)
-            block = block.next()
+        doc = self._trigger.document()
+        for line in self._index.child_regions(self._trigger.blockNumber()):
+            yield FoldScope(doc.findBlockByNumber(line))
 
     def parent(self):
         """
@@ -313,19 +918,10 @@ class FoldScope(object):
 
         :return: FoldScope or None
         """
-        if TextBlockHelper.get_fold_lvl(self._trigger) > 0 and \
-                self._trigger.blockNumber():
-            block = self._trigger.previous()
-            ref_lvl = self.trigger_level - 1
-            while (block.blockNumber() and
-                    (not TextBlockHelper.is_fold_trigger(block) or
-                     TextBlockHelper.get_fold_lvl(block) > ref_lvl)):
-                block = block.previous()
-            try:
-                return FoldScope(block)
-            except ValueError:
-                return None
-        return None
+        line = self._index.parent(self._trigger.blockNumber())
+        if line is None:
+            return None
+        return FoldScope(self._trigger.document().findBlockByNumber(line))
 
     def text(self, max_lines=sys.maxsize):
         """
@@ -350,25 +946,11 @@ class FoldScope(object):
 
         :param block: block from which the research will start
         """
-        # if we moved up for more than n lines, just give up otherwise this
-        # would take too much time.
-        limit = 5000
-        counter = 0
-        original = block
-        if not TextBlockHelper.is_fold_trigger(block):
-            # search level of next non blank line
-            while block.text().strip() == '' and block.isValid():
-                block = block.next()
-            ref_lvl = TextBlockHelper.get_fold_lvl(block) - 1
-            block = original
-            while (block.blockNumber() and counter < limit and
-                   (not TextBlockHelper.is_fold_trigger(block) or
-                    TextBlockHelper.get_fold_lvl(block) > ref_lvl)):
-                counter += 1
-                block = block.previous()
-        if counter < limit:
+        if TextBlockHelper.is_fold_trigger(block):
             return block
-        return None
+        index = FoldIndex.get(block.document())
+        return block.document().findBlockByNumber(
+            index.find_parent_scope(block.blockNumber()))
 
     def __repr__(self):
         return 'FoldScope(start=%r, end=%d)' % self.get_range()
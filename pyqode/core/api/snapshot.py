@@ -0,0 +1,178 @@
+"""
+This module contains the document snapshot API: an immutable copy of the text
+of a document, shared by all the code that needs the whole text for the same
+revision of the document (checkers, outline, occurrences, completion,
+search,...).
+"""
+import bisect
+from pyqode.qt import QtCore
+
+
+class DocumentSnapshot(object):
+    """
+    Immutable snapshot of the text of a document.
+
+    A snapshot is cheap to pass around: the text is copied once per revision
+    of the document and the line index is computed on first use.
+
+    Use :meth:`pyqode.core.api.CodeEdit.snapshot` (or
+    :meth:`SnapshotCache.snapshot`) to get the snapshot of the current
+    revision.
+    """
+    __slots__ = ('_revision', '_text', '_line_offsets')
+
+    def __init__(self, revision, text):
+        self._revision = revision
+        self._text = text
+        self._line_offsets = None
+
+    @property
+    def revision(self):
+        """
+        Revision of the text. The revision changes each time the text of the
+        document changes (but not when only its formats change, e.g. when it
+        is highlighted).
+        """
+        return self._revision
+
+    @property
+    def text(self):
+        """
+        The plain text of the document (lines are separated by ``\\n``).
+        """
+        return self._text
+
+    @property
+    def line_offsets(self):
+        """
+        Tuple of the positions where each line starts.
+        """
+        if self._line_offsets is None:
+            text = self._text
+            offsets = [0]
+            append = offsets.append
+            find = text.find
+            index = find('\n')
+            while index != -1:
+                append(index + 1)
+                index = find('\n', index + 1)
+            self._line_offsets = tuple(offsets)
+        return self._line_offsets
+
+    @property
+    def line_count(self):
+        """
+        Number of lines of the text.
+        """
+        return len(self.line_offsets)
+
+    def line(self, line_nbr):
+        """
+        Returns the text of a line (without the line separator).
+
+        :param line_nbr: 0 based line number.
+        """
+        offsets = self.line_offsets
+        start = offsets[line_nbr]
+        try:
+            end = offsets[line_nbr + 1] - 1
+        except IndexError:
+            end = len(self._text)
+        return self._text[start:end]
+
+    def position(self, line_nbr, column=0):
+        """
+        Converts a line number and a column to a position in the text.
+
+        :param line_nbr: 0 based line number.
+        :param column: 0 based column.
+        """
+        return self.line_offsets[line_nbr] + column
+
+    def line_and_column(self, position):
+        """
+        Converts a position in the text to a (line, column) tuple (0 based).
+        """
+        offsets = self.line_offsets
+        line_nbr = bisect.bisect_right(offsets, position) - 1
+        return line_nbr, position - offsets[line_nbr]
+
+
+class SnapshotCache(QtCore.QObject):
+    """
+    Caches the :class:`DocumentSnapshot` of the current revision of a
+    document.
+
+    The snapshot is created on demand and kept until the text of the document
+    changes (changes that only affect the formats, e.g. syntax highlighting,
+    do not invalidate it).
+
+    There is one cache per document, use :meth:`SnapshotCache.get` to get it.
+    """
+    @staticmethod
+    def get(document):
+        """
+        Gets the snapshot cache of a document, the cache is created if needed.
+
+        :param document: QTextDocument
+        :rtype: SnapshotCache
+        """
+        cache = document.findChild(SnapshotCache)
+        if cache is None:
+            cache = SnapshotCache(document)
+        return cache
+
+    def __init__(self, document):
+        super(SnapshotCache, self).__init__(document)
+        self._document = document
+        self._snapshot = None
+        self._revision = 0
+        # revision of the document (QTextDocument.revision) the snapshot was
+        # checked against
+        self._document_revision = -1
+        document.contentsChange.connect(self._on_contents_change)
+
+    def snapshot(self):
+        """
+        Returns the snapshot of the current revision of the document.
+
+        :rtype: DocumentSnapshot
+        """
+        document_revision = self._document.revision()
+        if (self._snapshot is None or
+                document_revision != self._document_revision):
+            # no snapshot yet, or the document changed since the snapshot was
+            # checked (contentsChange not received yet)
+            text = self._document.toPlainText()
+            if self._snapshot is None or text != self._snapshot.text:
+                self._revision += 1
+                self._snapshot = DocumentSnapshot(self._revision, text)
+            self._document_revision = document_revision
+        return self._snapshot
+
+    def _on_contents_change(self, position, removed, added):
+        if self._snapshot is None:
+            return
+        if removed == added and self._same_text(position, added):
+            # format change, the snapshot still applies
+            self._document_revision = self._document.revision()
+        else:
+            self._snapshot = None
+
+    def _same_text(self, position, length):
+        """
+        Checks if the text of the blocks in the changed range is the same as
+        in the snapshot.
+        """
+        text = self._snapshot.text
+        if self._document.characterCount() != len(text) + 1:
+            return False
+        block = self._document.findBlock(position)
+        end = position + length
+        while block.isValid() and block.position() <= end:
+            start = block.position()
+            block_text = block.text()
+            if text[start:start + len(block_text)] != block_text:
+                return False
+            block = block.next()
+        return True
@@ -5,11 +5,16 @@ import logging
 import sys
 import time
 import weakref
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
 from pygments.styles import get_style_by_name, get_all_styles
 from pygments.token import Token, Punctuation
 from pygments.util import ClassNotFound
 from pyqode.core.api.mode import Mode
-from pyqode.core.api.utils import drift_color
+from pyqode.core.api.utils import drift_color, TextBlockHelper
+from pyqode.core.api.utils import is_format_change
 from pyqode.qt import QtGui, QtCore, QtWidgets
 
 
@@ -17,8 +22,46 @@ def _logger():
     return logging.getLogger(__name__)
 
 
+class _PygmentsStyles(Sequence):
+    """
+    Sorted list of the available pygments styles. The styles are enumerated
+    the first time the list is accessed (enumerating the styles means
+    scanning the pygments plugins).
+    """
+    def __init__(self, extra_styles=()):
+        self._extra_styles = list(extra_styles)
+        self._styles = None
+
+    def _get_styles(self):
+        if self._styles is None:
+            self._styles = sorted(set(
+                list(get_all_styles()) + self._extra_styles))
+        return self._styles
+
+    def __getitem__(self, index):
+        return self._get_styles()[index]
+
+    def __len__(self):
+        return len(self._get_styles())
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(self._get_styles())
+
+
 #: A sorted list of available pygments styles, for convenience
-PYGMENTS_STYLES = sorted(set(list(get_all_styles()) + ['darcula', 'qt']))
+PYGMENTS_STYLES = _PygmentsStyles(['darcula', 'qt'])
 
 
 #: The list of color schemes keys (and their associated pygments token)
@@ -72,6 +115,44 @@ COLOR_SCHEME_KEYS = {
 }
 
 
+#: Process wide caches shared by all color schemes and highlighters: pygments
+#: styles by name, brushes by color and color scheme formats by style name.
+#: The cached formats are never handed out, each color scheme gets copies
+#: (see :func:`_copy_formats`).
+_STYLES = {}
+_BRUSHES = {}
+_COLOR_SCHEME_FORMATS = {}
+
+
+def _copy_formats(formats):
+    """
+    Copies a dictionary of formats. QTextCharFormat is implicitly shared, the
+    copies are cheap until one of them is modified.
+    """
+    return dict((key, QtGui.QTextCharFormat(fmt))
+                for key, fmt in formats.items())
+
+
+def _get_style_by_name(name):
+    """
+    Gets a pygments style by name, styles are looked up once per process.
+
+    :param name: name of the pygments style.
+    :raise: pygments.util.ClassNotFound if there is no style with that name.
+    """
+    try:
+        style = _STYLES[name]
+    except KeyError:
+        try:
+            style = get_style_by_name(name)
+        except ClassNotFound:
+            style = None
+        _STYLES[name] = style
+    if style is None:
+        raise ClassNotFound('Could not find style module %r.' % name)
+    return style
+
+
 class ColorScheme(object):
     """
     Translates a pygments style into a dictionary of colors associated with a
@@ -110,12 +191,18 @@ class ColorScheme(object):
         :param style: name of the pygments style to load
         """
         self._name = style
-        self._brushes = {}
+        self._brushes = _BRUSHES
         #: Dictionary of formats colors (keys are the same as for
         #: :attr:`pyqode.core.api.COLOR_SCHEME_KEYS`
         self.formats = {}
         try:
-            style = get_style_by_name(style)
+            # the formats of a style are only loaded once per process
+            self.formats.update(_copy_formats(_COLOR_SCHEME_FORMATS[style]))
+            return
+        except KeyError:
+            pass
+        try:
+            style = _get_style_by_name(style)
         except ClassNotFound:
             if style == 'darcula':
                 from pyqode.core.styles.darcula import DarculaStyle
@@ -124,6 +211,7 @@ class ColorScheme(object):
                 from pyqode.core.styles.qt import QtStyle
                 style = QtStyle
         self._load_formats_from_style(style)
+        _COLOR_SCHEME_FORMATS[self._name] = _copy_formats(self.formats)
 
     def _load_formats_from_style(self, style):
         # background
@@ -214,6 +302,18 @@ class SyntaxHighlighter(QtGui.QSyntaxHighlighter, Mode):
         our data in the block user state as a bit-mask. You should always
         use :class:`pyqode.core.api.TextBlockHelper` to retrieve or modify
         those data.
+
+    Big documents are rehighlighted in the background: the visible blocks
+    are highlighted first, the other blocks are then highlighted by slices of
+    :attr:`REHIGHLIGHT_SLICE_DURATION` seconds, from the event loop (see
+    :meth:`rehighlight`).
+
+    When a big text is set on the editor (e.g. when a file is opened), only
+    the first :attr:`LAZY_HIGHLIGHT_BLOCKS` blocks are highlighted
+    immediately, the rest of the document is highlighted in the background
+    (see :attr:`lazy_highlighting`). During a background rehighlight, the
+    blocks that become visible are highlighted as soon as the user scrolls
+    to them.
     """
     #: Signal emitted at the start of highlightBlock. Parameters are the
     #: highlighter instance and the current text block
@@ -223,6 +323,29 @@ class SyntaxHighlighter(QtGui.QSyntaxHighlighter, Mode):
     #: highlighter instance and the current text block
     block_highlight_finished = QtCore.Signal(object, object)
 
+    #: Signal emitted during a background rehighlight. Parameters are the
+    #: number of blocks that have been highlighted and the total number of
+    #: blocks.
+    rehighlight_progress = QtCore.Signal(int, int)
+
+    #: Signal emitted when a background rehighlight finished.
+    rehighlight_finished = QtCore.Signal()
+
+    #: Signal emitted when a background rehighlight is cancelled before it
+    #: finished (see :meth:`cancel_rehighlight`).
+    rehighlight_cancelled = QtCore.Signal()
+
+    #: Documents that have more blocks than this value are rehighlighted in
+    #: the background.
+    BACKGROUND_REHIGHLIGHT_THRESHOLD = 5000
+
+    #: Maximum duration (in seconds) of a background rehighlight slice.
+    REHIGHLIGHT_SLICE_DURATION = 0.02
+
+    #: Number of blocks that are highlighted immediately when a big text is
+    #: set on the editor (lazy highlighting).
+    LAZY_HIGHLIGHT_BLOCKS = 200
+
     @property
     def formats(self):
         """
@@ -289,14 +412,58 @@ class SyntaxHighlighter(QtGui.QSyntaxHighlighter, Mode):
         #: to work. Default is None
         self.fold_detector = None
         self.WHITESPACES = QtCore.QRegExp(r'\s+')
+        #: Highlights big texts lazily when they are set on the editor: only
+        #: the first blocks are highlighted by setPlainText, the other blocks
+        #: are highlighted in the background. Default is True.
+        self.lazy_highlighting = True
+        # number of blocks to highlight before skipping the syntax
+        # highlighting of the next ones (lazy highlighting), None to
+        # highlight all blocks.
+        self._lazy_limit = None
+        # set by highlightBlock, tells set_plain_text if Qt highlighted the
+        # new text.
+        self._block_highlighted = False
+        # numbers of the blocks that have been highlighted ahead of the
+        # background rehighlight, because they became visible.
+        self._highlighted_blocks = set()
+        # number of blocks of the document when it last changed, used to
+        # renumber the highlighted blocks.
+        self._block_count = 0
+        # True while the visible blocks are being highlighted, highlighting a
+        # block may trigger a synchronous update request.
+        self._highlighting_visible_blocks = False
+        # background rehighlight: cursor on the next block to highlight (Qt
+        # keeps it up to date when the text is edited).
+        self._rehighlight_cursor = None
+        self._rehighlight_count = 0
+        self._rehighlight_timer = QtCore.QTimer()
+        self._rehighlight_timer.setSingleShot(True)
+        self._rehighlight_timer.timeout.connect(self._rehighlight_slice)
 
     def on_state_changed(self, state):
-        if self._on_close:
-            return
-        if state:
+        if state and not self._on_close:
             self.setDocument(self.editor.document())
+            self.document().contentsChange.connect(self._on_contents_change)
+            self.editor.updateRequest.connect(self._on_update_request)
         else:
-            self.setDocument(None)
+            # an uninstalled highlighter must be detached from the document
+            # too, Qt would otherwise keep (re)applying its (empty) formats.
+            self.cancel_rehighlight()
+            try:
+                self.editor.updateRequest.disconnect(self._on_update_request)
+            except (AttributeError, RuntimeError, TypeError):
+                pass
+            try:
+                self.document().contentsChange.disconnect(
+                    self._on_contents_change)
+            except (AttributeError, RuntimeError, TypeError):
+                # document already deleted
+                pass
+            try:
+                self.setDocument(None)
+            except RuntimeError:
+                # highlighter already deleted
+                pass
 
     def _highlight_whitespaces(self, text):
         index = self.WHITESPACES.indexIn(text, 0)
@@ -326,17 +493,35 @@ class SyntaxHighlighter(QtGui.QSyntaxHighlighter, Mode):
         """
         if not self.enabled:
             return
+        self._block_highlighted = True
         current_block = self.currentBlock()
         previous_block = self._find_prev_non_blank_block(current_block)
         if self.editor:
-            self.highlight_block(text, current_block)
-            if self.editor.show_whitespaces:
-                self._highlight_whitespaces(text)
+            if self._lazy_limit is None or \
+                    current_block.blockNumber() < self._lazy_limit:
+                highlighted_text = self._limit_line(text)
+                self.highlight_block(highlighted_text, current_block)
+                if self.editor.show_whitespaces:
+                    self._highlight_whitespaces(highlighted_text)
+            else:
+                # not highlighted yet, assume the initial highlighter state
+                TextBlockHelper.set_state(current_block, 0)
             if self.fold_detector is not None:
                 self.fold_detector._editor = weakref.ref(self.editor)
                 self.fold_detector.process_block(
                     current_block, previous_block, text)
 
+    def _limit_line(self, text):
+        """
+        Returns the part of a line that is highlighted: the end of long lines
+        (e.g. minified files) is rendered as plain text (see
+        :attr:`pyqode.core.api.CodeEdit.long_line_limit`).
+        """
+        limit = self.editor.long_line_limit
+        if limit and len(text) > limit:
+            return text[:limit]
+        return text
+
     def highlight_block(self, text, block):
         """
         Abstract method. Override this to apply syntax highlighting.
@@ -349,7 +534,19 @@ class SyntaxHighlighter(QtGui.QSyntaxHighlighter, Mode):
     def rehighlight(self):
         """
         Rehighlight the entire document, may be slow.
+
+        Documents that have more than
+        :attr:`BACKGROUND_REHIGHLIGHT_THRESHOLD` blocks are rehighlighted in
+        the background: the visible blocks are highlighted immediately, the
+        other blocks are highlighted later, from the event loop (see
+        :attr:`rehighlight_progress` and :attr:`rehighlight_finished`).
         """
+        if self.editor and self.document() and \
+                self.document().blockCount() > \
+                self.BACKGROUND_REHIGHLIGHT_THRESHOLD:
+            self.rehighlight_in_background()
+            return
+        self.cancel_rehighlight()
         start = time.time()
         QtWidgets.QApplication.setOverrideCursor(
             QtGui.QCursor(QtCore.Qt.WaitCursor))
@@ -362,6 +559,211 @@ class SyntaxHighlighter(QtGui.QSyntaxHighlighter, Mode):
         end = time.time()
         _logger().debug('rehighlight duration: %fs' % (end - start))
 
+    def rehighlight_in_background(self):
+        """
+        Rehighlight the entire document without blocking the user interface.
+
+        The visible blocks are highlighted first, the whole document is then
+        rehighlighted by slices of :attr:`REHIGHLIGHT_SLICE_DURATION` seconds,
+        from the event loop.
+        """
+        self._start_rehighlight(self.document().firstBlock())
+
+    def set_plain_text(self, text, set_text):
+        """
+        Sets a new text on the document, lazily if the text is big and
+        :attr:`lazy_highlighting` is enabled: only the first
+        :attr:`LAZY_HIGHLIGHT_BLOCKS` blocks are highlighted by ``set_text``,
+        the rest of the document is highlighted in the background.
+
+        Folding information are always computed for the whole document.
+
+        :param text: the new text.
+        :param set_text: function that actually sets the text on the document
+            (e.g. QPlainTextEdit.setPlainText).
+        """
+        active = (self.enabled and self.editor is not None and
+                  self.document() is not None)
+        lazy = (active and self.lazy_highlighting and
+                text.count('\n') >= self.BACKGROUND_REHIGHLIGHT_THRESHOLD)
+        if lazy:
+            self._lazy_limit = self.LAZY_HIGHLIGHT_BLOCKS
+        try:
+            self._block_highlighted = False
+            set_text(text)
+            if active and not self._block_highlighted:
+                # Qt ignores the document changes while it has a rehighlight
+                # of the whole document pending (e.g. the mode has just been
+                # enabled): highlight the new text now (lazily if the text is
+                # big) instead of letting Qt rehighlight the whole document
+                # later, so that the fold levels are known on return.
+                QtGui.QSyntaxHighlighter.rehighlight(self)
+        finally:
+            self._lazy_limit = None
+        if lazy:
+            # the visible blocks are highlighted from the first slice, i.e.
+            # once the caller had a chance to restore the cursor position.
+            block = self.document().findBlockByNumber(
+                self.LAZY_HIGHLIGHT_BLOCKS)
+            if block.isValid():
+                self._start_rehighlight(block)
+
+    def cancel_rehighlight(self):
+        """
+        Cancels the background rehighlight (if any),
+        :attr:`rehighlight_cancelled` is emitted if a rehighlight was in
+        progress.
+        """
+        rehighlighting = self._rehighlight_cursor is not None
+        self._stop_rehighlight()
+        if rehighlighting:
+            _logger().debug('background rehighlight cancelled')
+            self.rehighlight_cancelled.emit()
+
+    def _stop_rehighlight(self):
+        self._rehighlight_timer.stop()
+        self._rehighlight_cursor = None
+        self._highlighted_blocks.clear()
+
+    def is_rehighlighting(self):
+        """
+        Checks if a background rehighlight is in progress.
+        """
+        return self._rehighlight_cursor is not None
+
+    def _start_rehighlight(self, block):
+        """
+        Starts a background rehighlight from ``block``, the visible blocks
+        are highlighted immediately.
+        """
+        # a rehighlight in progress is restarted, not cancelled
+        self._stop_rehighlight()
+        self._rehighlight_cursor = QtGui.QTextCursor(block)
+        self._rehighlight_count = block.blockNumber()
+        self._block_count = self.document().blockCount()
+        self._highlight_visible_blocks()
+        if self._rehighlight_cursor is not None:
+            self._rehighlight_timer.start(0)
+
+    def _highlight_visible_blocks(self):
+        """
+        Highlights the visible blocks that the background rehighlight did not
+        reach yet.
+        """
+        if self._highlighting_visible_blocks:
+            return
+        self._highlighting_visible_blocks = True
+        try:
+            editor = self.editor
+            first = self._rehighlight_cursor.blockNumber()
+            block = editor.firstVisibleBlock()
+            top = editor.blockBoundingGeometry(block).translated(
+                editor.contentOffset()).top()
+            bottom = editor.viewport().height()
+            while block.isValid() and top <= bottom:
+                # blocks hidden by a collapsed fold region are left to the
+                # background rehighlight
+                if block.isVisible():
+                    number = block.blockNumber()
+                    if number >= first and \
+                            number not in self._highlighted_blocks:
+                        self._highlighted_blocks.add(number)
+                        if not self._rehighlight_block(block):
+                            return
+                    top += editor.blockBoundingRect(block).height()
+                block = block.next()
+        finally:
+            self._highlighting_visible_blocks = False
+
+    def _on_update_request(self, *args):
+        if self._rehighlight_cursor is not None:
+            self._highlight_visible_blocks()
+
+    def _rehighlight_block(self, block):
+        try:
+            self.rehighlightBlock(block)
+        except RuntimeError:
+            # cloned widget, no need to rehighlight the same document twice ;)
+            self.cancel_rehighlight()
+            return False
+        return True
+
+    def _rehighlight_slice(self):
+        """
+        Rehighlight the next blocks, until the slice duration elapsed.
+        """
+        if self._rehighlight_cursor is None:
+            return
+        self._highlight_visible_blocks()
+        if self._rehighlight_cursor is None:
+            return
+        deadline = time.time() + self.REHIGHLIGHT_SLICE_DURATION
+        block = self._rehighlight_cursor.block()
+        suspended = False
+        while block.isValid() and time.time() < deadline:
+            if not self._prepare_block(block):
+                suspended = True
+                break
+            if not self._rehighlight_block(block):
+                return
+            self._rehighlight_count += 1
+            block = block.next()
+        self.rehighlight_progress.emit(
+            self._rehighlight_count, self.document().blockCount())
+        if block.isValid():
+            self._rehighlight_cursor.setPosition(block.position())
+            if not suspended:
+                self._rehighlight_timer.start(0)
+        else:
+            self._rehighlight_cursor = None
+            _logger().debug('background rehighlight finished')
+            self.rehighlight_finished.emit()
+
+    def _prepare_block(self, block):
+        """
+        Prepares a block before it gets highlighted by the background
+        rehighlight.
+
+        The default implementation does nothing. Subclasses may return False
+        to suspend the background rehighlight until the block is ready to be
+        highlighted, they must then call :meth:`_resume_rehighlight`.
+
+        :param block: block that is about to be highlighted.
+        :return: True if the block can be highlighted right now.
+        """
+        return True
+
+    def _resume_rehighlight(self):
+        """
+        Resumes a background rehighlight that was suspended by
+        :meth:`_prepare_block`.
+        """
+        if self._rehighlight_cursor is not None:
+            self._rehighlight_timer.start(0)
+
+    def _on_contents_change(self, position, chars_removed, chars_added):
+        doc = self.document()
+        if is_format_change(doc, position, chars_removed, chars_added):
+            return
+        if self._rehighlight_cursor is not None and position == 0 and \
+                chars_added >= doc.characterCount() - 1:
+            # the whole text has been replaced (and highlighted by Qt), there
+            # is no need to continue the background rehighlight.
+            self.cancel_rehighlight()
+        block_count = doc.blockCount()
+        if self._highlighted_blocks:
+            # forget the edited blocks and renumber the next ones
+            delta = block_count - self._block_count
+            first = doc.findBlock(position).blockNumber()
+            last = doc.findBlock(min(
+                position + chars_added,
+                doc.characterCount() - 1)).blockNumber() - delta
+            self._highlighted_blocks = set(
+                number if number < first else number + delta
+                for number in self._highlighted_blocks
+                if number < first or number > last)
+        self._block_count = block_count
+
     def on_install(self, editor):
         super(SyntaxHighlighter, self).on_install(editor)
         self.refresh_editor(self.color_scheme)
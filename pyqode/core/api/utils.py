@@ -2,6 +2,7 @@
 """
 This module contains utility functions/classes.
 """
+import bisect
 import functools
 import logging
 import weakref
@@ -65,6 +66,31 @@ def drift_color(base_color, factor=110):
             return base_color.lighter(factor + 10)
 
 
+def is_format_change(document, position, chars_removed, chars_added):
+    """
+    Checks if a change of a document (see QTextDocument.contentsChange) only
+    changed the formats of the text, not the text itself.
+
+    Qt sets the revision of the blocks whose text changed to the revision of
+    the document, a format change does not touch the block revisions.
+
+    :param document: QTextDocument
+    :param position: position of the change
+    :param chars_removed: number of characters removed at ``position``
+    :param chars_added: number of characters added at ``position``
+    """
+    if chars_removed != chars_added:
+        return False
+    revision = document.revision()
+    end = position + chars_added
+    block = document.findBlock(position)
+    while block.isValid() and block.position() <= end:
+        if block.revision() == revision:
+            return False
+        block = block.next()
+    return True
+
+
 class DelayJobRunner(object):
     """
     Utility class for running job after a certain delay. If a new request is
@@ -1020,39 +1046,64 @@ def get_block_symbol_data(editor, block):
     :param editor: Code edit instance
     :param block: block to parse
     """
-    def list_symbols(editor, block, character):
+    def comment_or_string_ranges(editor, block):
         """
-        Retuns  a list of symbols found in the block text
+        Returns the sorted list of the (start, end) ranges of the block that
+        are highlighted as a comment or a string.
 
         :param editor: code edit instance
         :param block: block to parse
+        """
+        sh = editor.syntax_highlighter
+        if not sh:
+            return []
+        ref_formats = [sh.color_scheme.formats[fmt_type]
+                       for fmt_type in ["comment", "string", "docstring"]]
+        ranges = []
+        for start, end in sorted(
+                (r.start, r.start + r.length)
+                for r in block.layout().additionalFormats()
+                if r.format.objectType() == r.format.UserObject and
+                r.format in ref_formats):
+            if ranges and start <= ranges[-1][1]:
+                ranges[-1][1] = max(ranges[-1][1], end)
+            else:
+                ranges.append([start, end])
+        return ranges
+
+    def list_symbols(text, ranges, character):
+        """
+        Retuns  a list of symbols found in the block text
+
+        :param text: block text
+        :param ranges: comment or string ranges (symbols in those ranges are
+            skipped)
         :param character: character to look for.
         """
-        text = block.text()
+        starts = [start for start, end in ranges]
         symbols = []
-        cursor = QtGui.QTextCursor(block)
-        cursor.movePosition(cursor.StartOfBlock)
         pos = text.find(character, 0)
-        cursor.movePosition(cursor.Right, cursor.MoveAnchor, pos)
-
         while pos != -1:
-            if not TextHelper(editor).is_comment_or_string(cursor):
+            i = bisect.bisect_right(starts, pos) - 1
+            if i < 0 or pos >= ranges[i][1]:
                 # skips symbols in string literal or comment
                 info = ParenthesisInfo(pos, character)
                 symbols.append(info)
             pos = text.find(character, pos + 1)
-            cursor.movePosition(cursor.StartOfBlock)
-            cursor.movePosition(cursor.Right, cursor.MoveAnchor, pos)
         return symbols
 
+    text = block.text()
+    if editor.long_line_limit:
+        text = text[:editor.long_line_limit]
+    ranges = comment_or_string_ranges(editor, block)
     parentheses = sorted(
-        list_symbols(editor, block, '(') + list_symbols(editor, block, ')'),
+        list_symbols(text, ranges, '(') + list_symbols(text, ranges, ')'),
         key=lambda x: x.position)
     square_brackets = sorted(
-        list_symbols(editor, block, '[') + list_symbols(editor, block, ']'),
+        list_symbols(text, ranges, '[') + list_symbols(text, ranges, ']'),
         key=lambda x: x.position)
     braces = sorted(
-        list_symbols(editor, block, '{') + list_symbols(editor, block, '}'),
+        list_symbols(text, ranges, '{') + list_symbols(text, ranges, '}'),
         key=lambda x: x.position)
     return parentheses, square_brackets, braces
 
@@ -168,15 +168,15 @@ class DocumentWordsProvider(object):
         return completions
 
 
-def finditer_noregex(string, sub, whole_word):
+def finditer_noregex(string, sub, whole_word, start=0):
     """
     Search occurrences using str.find instead of regular expressions.
 
     :param string: string to parse
     :param sub: search string
     :param whole_word: True to select whole words only
+    :param start: position where the search starts
     """
-    start = 0
     while True:
         start = string.find(sub, start)
         if start == -1:
@@ -200,7 +200,7 @@ def finditer_noregex(string, sub, whole_word):
 
 
 def findalliter(string, sub, regex=False, case_sensitive=False,
-                whole_word=False):
+                whole_word=False, start=0):
     """
     Generator that finds all occurrences of ``sub`` in  ``string``
     :param string: string to parse
@@ -208,6 +208,9 @@ def findalliter(string, sub, regex=False, case_sensitive=False,
     :param regex: True to search using regex
     :param case_sensitive: True to match case, False to ignore case
     :param whole_word: True to returns only whole words
+    :param start: position where the search starts. Occurrences found from
+        there are the same as the ones a search of the whole string would
+        find after ``start``.
     :return:
     """
     if not sub:
@@ -216,13 +219,13 @@ def findalliter(string, sub, regex=False, case_sensitive=False,
         flags = re.MULTILINE
         if not case_sensitive:
             flags |= re.IGNORECASE
-        for val in re.finditer(sub, string, flags):
+        for val in re.compile(sub, flags).finditer(string, start):
             yield val.span()
     else:
         if not case_sensitive:
             string = string.lower()
             sub = sub.lower()
-        for val in finditer_noregex(string, sub, whole_word):
+        for val in finditer_noregex(string, sub, whole_word, start=start):
             yield val, val + len(sub)
 
 
@@ -11,7 +11,7 @@ file so that we can reuse it automatically next time the user want to
 open the same file.
 
 We also use this to cache some editor states (such as the last cursor position
-for a specific file path)
+or the collapsed fold triggers for a specific file path)
 
 We do not store editor styles and settings here. Those kind of settings are
 better handled at the application level.
@@ -150,6 +150,75 @@ class Cache(object):
         map[path] = position
         self._settings.setValue('cachedCursorPosition', json.dumps(map))
 
+    def get_fold_state(self, file_path):
+        """
+        Gets the cached fold state of file_path.
+
+        :param file_path: path of the file in the cache
+        :return: tuple(list of collapsed fold trigger lines, fingerprint of
+            the content the lines refer to) or ([], None)
+        """
+        try:
+            map = json.loads(self._settings.value('cachedFoldState'))
+        except TypeError:
+            map = {}
+        try:
+            lines, fingerprint = map[file_path]
+        except (KeyError, ValueError):
+            return [], None
+        return lines, fingerprint
+
+    def set_fold_state(self, path, lines, fingerprint):
+        """
+        Cache the fold state of the specified file path.
+
+        :param path: path of the file to cache
+        :param lines: line numbers of the collapsed fold triggers. An empty
+            list removes the file from the cache.
+        :param fingerprint: fingerprint of the file content (the fold state
+            is not restored if the content changed).
+        """
+        try:
+            map = json.loads(self._settings.value('cachedFoldState'))
+        except TypeError:
+            map = {}
+        if lines:
+            map[path] = [list(lines), fingerprint]
+        elif path in map:
+            del map[path]
+        else:
+            return
+        self._settings.setValue('cachedFoldState', json.dumps(map))
+
+    def get_lexer_class(self, key):
+        """
+        Gets the cached pygments lexer class for a file name pattern or a
+        mimetype.
+
+        :param key: lexer key (e.g. 'filename:*.py' or
+            'mimetype:text/x-python')
+        :return: 'module:class_name' or None if no lexer class was cached.
+        """
+        try:
+            map = json.loads(self._settings.value('cachedLexerClasses'))
+        except TypeError:
+            map = {}
+        return map.get(key)
+
+    def set_lexer_class(self, key, lexer_class):
+        """
+        Cache the pygments lexer class of a file name pattern or a mimetype.
+
+        :param key: lexer key
+        :param lexer_class: lexer class ('module:class_name')
+        """
+        try:
+            map = json.loads(self._settings.value('cachedLexerClasses'))
+        except TypeError:
+            map = {}
+        map[key] = lexer_class
+        self._settings.setValue('cachedLexerClasses', json.dumps(map))
+
 
 def _logger():
     return logging.getLogger(__name__)
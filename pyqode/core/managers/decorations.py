@@ -1,8 +1,11 @@
 """
 Contains the text decorations manager
 """
+import bisect
+import contextlib
 import logging
 from pyqode.core.api.manager import Manager
+from pyqode.qt import QtCore
 
 
 def _logger():
@@ -13,10 +16,62 @@ class TextDecorationsManager(Manager):
     """
     Manages the collection of TextDecoration that have been set on the editor
     widget.
+
+    The decorations are kept sorted by draw order (decorations that have the
+    same draw order are kept in insertion order).
+
+    Use :meth:`append_many`/:meth:`remove_many` or a :meth:`transaction` to
+    add/remove a lot of decorations at once, the editor extra selections are
+    then updated only once::
+
+        with editor.decorations.transaction():
+            for deco in decorations:
+                editor.decorations.append(deco)
+
+    When there are a lot of decorations (see :attr:`CULLING_THRESHOLD`), the
+    decorations are culled: only the decorations of the visible lines (plus
+    :attr:`CULLING_MARGIN` lines before and after) are handed to the editor,
+    the other ones are set when the editor is scrolled.
     """
+    #: Number of decorations above which the decorations are culled.
+    CULLING_THRESHOLD = 1000
+
+    #: Number of lines before and after the visible lines whose decorations
+    #: are handed to the editor when decorations are culled.
+    CULLING_MARGIN = 50
+
     def __init__(self, editor):
         super(TextDecorationsManager, self).__init__(editor)
+        #: True to cull the decorations when there are more than
+        #: :attr:`CULLING_THRESHOLD` decorations (always False for editors
+        #: that do not have an ``updateRequest`` signal, e.g. QTextEdit).
+        self.culling = hasattr(editor, 'updateRequest')
         self._decorations = []
+        # single line decorations, sorted by start position (edits do not
+        # change the relative order of the decoration cursors)
+        self._by_position = []
+        # multiline decorations (by id), they are never culled
+        self._multiline = {}
+        # insertion order of the decorations (used to sort the culled
+        # decorations)
+        self._sequence = {}
+        self._counter = 0
+        # ids of the decorations that were handed to the editor
+        self._selections = []
+        if self.culling:
+            editor.updateRequest.connect(self._on_update_request)
+        # draw order of each decoration of _decorations, used for bisect
+        # insertion
+        self._draw_orders = []
+        # ids of the decorations, for fast membership tests
+        self._ids = set()
+        # transaction nesting level
+        self._transaction = 0
+        # True if the list changed during the transaction
+        self._dirty = False
+        # False if decorations were appended (but not sorted) during the
+        # transaction
+        self._sorted = True
 
     def append(self, decoration):
         """
@@ -25,13 +80,31 @@ class TextDecorationsManager(Manager):
         :param decoration: Text decoration to add
         :type decoration: pyqode.core.api.TextDecoration
         """
-        if decoration not in self._decorations:
+        if id(decoration) in self._ids:
+            return False
+        self._ids.add(id(decoration))
+        self._index_position(decoration)
+        if self._transaction:
+            # sorted when the transaction is committed
             self._decorations.append(decoration)
-            self._decorations = sorted(
-                self._decorations, key=lambda sel: sel.draw_order)
-            self.editor.setExtraSelections(self._decorations)
-            return True
-        return False
+            self._sorted = False
+        else:
+            index = bisect.bisect_right(
+                self._draw_orders, decoration.draw_order)
+            self._decorations.insert(index, decoration)
+            self._draw_orders.insert(index, decoration.draw_order)
+        self._update()
+        return True
+
+    def append_many(self, decorations):
+        """
+        Adds a list of text decorations, the editor is updated once.
+
+        :param decorations: list of pyqode.core.api.TextDecoration
+        :returns: the number of decorations that have been added.
+        """
+        with self.transaction():
+            return len([deco for deco in decorations if self.append(deco)])
 
     def remove(self, decoration):
         """
@@ -40,12 +113,39 @@ class TextDecorationsManager(Manager):
         :param decoration: Text decoration to remove
         :type decoration: pyqode.core.api.TextDecoration
         """
-        try:
-            self._decorations.remove(decoration)
-            self.editor.setExtraSelections(self._decorations)
-            return True
-        except ValueError:
+        if id(decoration) not in self._ids:
             return False
+        self._ids.remove(id(decoration))
+        self._remove_position(decoration)
+        index = self._index(decoration)
+        del self._decorations[index]
+        if self._sorted:
+            del self._draw_orders[index]
+        self._update()
+        return True
+
+    def remove_many(self, decorations):
+        """
+        Removes a list of text decorations, the editor is updated once.
+
+        :param decorations: list of pyqode.core.api.TextDecoration
+        :returns: the number of decorations that have been removed.
+        """
+        ids = set(id(deco) for deco in decorations) & self._ids
+        if not ids:
+            return 0
+        self._ids -= ids
+        self._decorations = [
+            deco for deco in self._decorations if id(deco) not in ids]
+        self._by_position = [
+            deco for deco in self._by_position if id(deco) not in ids]
+        for key in ids:
+            self._multiline.pop(key, None)
+            del self._sequence[key]
+        if self._sorted:
+            self._draw_orders = [deco.draw_order for deco in self._decorations]
+        self._update()
+        return len(ids)
 
     def clear(self):
         """
@@ -53,11 +153,159 @@ class TextDecorationsManager(Manager):
 
         """
         self._decorations[:] = []
+        self._draw_orders[:] = []
+        self._ids.clear()
+        self._by_position[:] = []
+        self._multiline.clear()
+        self._sequence.clear()
+        self._sorted = True
+        if self._transaction:
+            self._dirty = True
+            return
         try:
-            self.editor.setExtraSelections(self._decorations)
+            self._set_extra_selections()
         except RuntimeError:
             pass
 
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Context manager that defers the sorting of the decorations and the
+        update of the editor extra selections until the end of the
+        transaction. Transactions can be nested, the editor is updated when
+        the outermost transaction ends.
+        """
+        self._transaction += 1
+        try:
+            yield self
+        finally:
+            self._transaction -= 1
+            if not self._transaction:
+                self._commit()
+
+    def _index(self, decoration):
+        if self._sorted:
+            # look between the decorations that have the same draw order
+            lo = bisect.bisect_left(self._draw_orders, decoration.draw_order)
+            hi = bisect.bisect_right(self._draw_orders, decoration.draw_order)
+            for index in range(lo, hi):
+                if self._decorations[index] is decoration:
+                    return index
+        # draw order changed after the decoration was added
+        for index, deco in enumerate(self._decorations):
+            if deco is decoration:
+                return index
+
+    def _index_position(self, decoration):
+        self._sequence[id(decoration)] = self._counter
+        self._counter += 1
+        cursor = decoration.cursor
+        doc = cursor.document()
+        start = cursor.selectionStart()
+        if doc is not None and doc.findBlock(start) != doc.findBlock(
+                cursor.selectionEnd()):
+            self._multiline[id(decoration)] = decoration
+        else:
+            self._by_position.insert(self._bisect(start), decoration)
+
+    def _remove_position(self, decoration):
+        del self._sequence[id(decoration)]
+        if self._multiline.pop(id(decoration), None) is not None:
+            return
+        decorations = self._by_position
+        index = self._bisect(decoration.cursor.selectionStart())
+        while index < len(decorations) and \
+                decorations[index] is not decoration and \
+                decorations[index].cursor.selectionStart() == \
+                decoration.cursor.selectionStart():
+            index += 1
+        if index < len(decorations) and decorations[index] is decoration:
+            del decorations[index]
+        else:
+            # the order of the cursors changed (e.g. cursors of another
+            # document)
+            decorations.remove(decoration)
+
+    def _bisect(self, position):
+        """
+        Returns the index of the first single line decoration that starts at
+        or after ``position``.
+        """
+        decorations = self._by_position
+        lo, hi = 0, len(decorations)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if decorations[mid].cursor.selectionStart() < position:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _is_culling(self):
+        return self.culling and len(self._decorations) > self.CULLING_THRESHOLD
+
+    def _visible_decorations(self):
+        """
+        Returns the decorations of the visible lines (plus
+        :attr:`CULLING_MARGIN` lines), sorted by draw order.
+        """
+        editor = self.editor
+        doc = editor.document()
+        first = editor.firstVisibleBlock().blockNumber()
+        last = editor.cursorForPosition(QtCore.QPoint(
+            0, editor.viewport().height())).blockNumber()
+        start = doc.findBlockByNumber(
+            max(0, first - self.CULLING_MARGIN)).position()
+        block = doc.findBlockByNumber(last + self.CULLING_MARGIN)
+        if block.isValid():
+            end = block.position() + block.length()
+        else:
+            end = doc.characterCount()
+        decorations = self._by_position[
+            self._bisect(start):self._bisect(end + 1)]
+        decorations += self._multiline.values()
+        sequence = self._sequence
+        decorations.sort(key=lambda sel: (sel.draw_order, sequence[id(sel)]))
+        return decorations
+
+    def _set_extra_selections(self, force=True):
+        if self._is_culling():
+            selections = self._visible_decorations()
+        else:
+            selections = self._decorations
+        ids = [id(sel) for sel in selections]
+        if force or ids != self._selections:
+            self._selections = ids
+            self.editor.setExtraSelections(selections)
+
+    def _on_update_request(self, rect, dy):
+        editor = self.editor
+        if editor is None or not self._is_culling() or self._transaction:
+            return
+        if dy or rect.contains(editor.viewport().rect()):
+            self._set_extra_selections(force=False)
+
+    def _update(self):
+        if self._transaction:
+            self._dirty = True
+        else:
+            self._set_extra_selections()
+
+    def _commit(self):
+        if not self._sorted:
+            self._decorations.sort(key=lambda sel: sel.draw_order)
+            self._draw_orders = [deco.draw_order for deco in self._decorations]
+            self._sorted = True
+        if self._dirty:
+            self._dirty = False
+            try:
+                self._set_extra_selections()
+            except RuntimeError:
+                pass
+
+    def __contains__(self, decoration):
+        return id(decoration) in self._ids
+
     def __iter__(self):
         return iter(self._decorations)
 
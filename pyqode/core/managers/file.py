@@ -11,6 +11,8 @@ import locale
 import logging
 import mimetypes
 import os
+import zlib
+from pyqode.core.api.folding import FoldIndex
 from pyqode.core.api.manager import Manager
 from pyqode.core.api.utils import TextHelper
 from pyqode.qt import QtCore, QtWidgets
@@ -174,6 +176,12 @@ class FileManager(Manager):
         #: True to restore cursor position (if the document has already been
         # opened once).
         self.restore_cursor = True
+        #: True to restore the collapsed fold triggers (if the document has
+        #: already been opened once and did not change since then).
+        self.restore_folding = True
+        # fold state that will be restored once the highlighter has finished
+        # computing the fold levels
+        self._fold_state = None
         #: Preferred EOL convention. This setting will be used for saving the
         #: document unles autodetect_eol is True.
         self._preferred_eol = self.EOL.System
@@ -227,6 +235,7 @@ class FileManager(Manager):
         self.opening = True
         settings = Cache()
         self._path = path
+        self._discard_fold_state()
         # get encoding from cache
         if use_cached_encoding:
             try:
@@ -279,6 +288,8 @@ class FileManager(Manager):
         self.opening = False
         if self.restore_cursor:
             self._restore_cached_pos()
+        if ret_val and self.restore_folding:
+            self._restore_fold_state()
         self._check_for_readonly()
         return ret_val
 
@@ -296,6 +307,86 @@ class FileManager(Manager):
         self.editor.setTextCursor(tc)
         QtCore.QTimer.singleShot(1, self.editor.centerCursor)
 
+    def _fingerprint(self):
+        """
+        Returns the fingerprint of the editor content, used to check that a
+        cached fold state still applies to the document.
+        """
+        text = self.editor.snapshot().text.encode('utf-8')
+        return '%08x' % (zlib.crc32(text) & 0xffffffff)
+
+    def _folding_panel(self):
+        try:
+            from pyqode.core.panels import FoldingPanel
+            return self.editor.panels.get(FoldingPanel)
+        except KeyError:
+            return None
+
+    def _cache_fold_state(self):
+        """
+        Caches the collapsed fold triggers of the file.
+        """
+        if not self.path or self._folding_panel() is None:
+            return
+        if self._fold_state is not None:
+            # the cached fold state has not been restored yet
+            lines, fingerprint = self._fold_state
+        else:
+            lines = FoldIndex.get(self.editor.document()).collapsed_triggers()
+            fingerprint = self._fingerprint() if lines else None
+        Cache().set_fold_state(self.path, lines, fingerprint)
+
+    def _restore_fold_state(self):
+        """
+        Restores the cached fold state, once the syntax highlighter has
+        computed the fold levels of the whole document.
+        """
+        lines, fingerprint = Cache().get_fold_state(self.path)
+        highlighter = self.editor.syntax_highlighter
+        if not lines or highlighter is None or \
+                highlighter.fold_detector is None or \
+                self._folding_panel() is None:
+            return
+        self._fold_state = lines, fingerprint
+        if highlighter.is_rehighlighting() and \
+                self.editor.document().lastBlock().userState() == -1:
+            # the fold levels are not known yet, they will be computed by
+            # the background rehighlight (the lazy and synchronous paths of
+            # set_plain_text compute them for the whole document)
+            highlighter.rehighlight_finished.connect(self._apply_fold_state)
+            highlighter.rehighlight_cancelled.connect(
+                self._discard_fold_state)
+        else:
+            self._apply_fold_state()
+
+    def _disconnect_fold_state(self):
+        highlighter = self.editor.syntax_highlighter
+        for signal, slot in (
+                ('rehighlight_finished', self._apply_fold_state),
+                ('rehighlight_cancelled', self._discard_fold_state)):
+            try:
+                getattr(highlighter, signal).disconnect(slot)
+            except (AttributeError, TypeError, RuntimeError):
+                pass  # not connected
+
+    def _discard_fold_state(self):
+        """
+        Forgets the fold state that has not been restored yet (e.g. the
+        rehighlight that was computing the fold levels has been cancelled).
+        """
+        self._disconnect_fold_state()
+        self._fold_state = None
+
+    def _apply_fold_state(self):
+        self._disconnect_fold_state()
+        state, self._fold_state = self._fold_state, None
+        panel = self._folding_panel()
+        if state is None or panel is None:
+            return
+        lines, fingerprint = state
+        if fingerprint == self._fingerprint():
+            panel.fold_triggers(lines)
+
     def reload(self, encoding):
         """
         Reload the file with another encoding.
@@ -323,7 +414,7 @@ class FileManager(Manager):
         return sel_end, sel_start
 
     def _get_text(self, encoding):
-        lines = self.editor.toPlainText().splitlines()
+        lines = self.editor.snapshot().text.splitlines()
         if self.clean_trailing_whitespaces:
             lines = [l.rstrip() for l in lines]
         # remove emtpy ending lines
@@ -437,6 +528,8 @@ class FileManager(Manager):
         """
         Cache().set_cursor_position(
             self.path, self.editor.textCursor().position())
+        self._cache_fold_state()
+        self._discard_fold_state()
         self.editor._original_text = ''
         if clear:
             self.editor.clear()
@@ -449,3 +542,4 @@ class FileManager(Manager):
         self.safe_save = original.replace_tabs_by_spaces
         self.clean_trailing_whitespaces = original.clean_trailing_whitespaces
         self.restore_cursor = original.restore_cursor
+        self.restore_folding = original.restore_folding
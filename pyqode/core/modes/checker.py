@@ -90,6 +90,8 @@ class CheckerMessage(object):
         self.path = path
         #: store a reference to the associated QTextBlock, for quick acces
         self.block = None
+        # user data of the block the message is attached to
+        self._user_data = None
 
     def __str__(self):
         return "{0} l{1}".format(self.description, self.line)
@@ -120,7 +122,7 @@ class CheckerMode(Mode, QtCore.QObject):
     .. code-block:: python
 
         request_data = {
-                'code': self.editor.toPlainText(),
+                'code': self.editor.snapshot().text,
                 'path': self.editor.file.path,
                 'encoding': self.editor.file.encoding
             }
@@ -145,6 +147,15 @@ class CheckerMode(Mode, QtCore.QObject):
         """
         return self._messages
 
+    @property
+    def messages_revision(self):
+        """
+        Returns a number that is incremented each time the messages (or their
+        lines) change. Panels use it to know when they have to draw the
+        messages again.
+        """
+        return self._messages_revision
+
     def __init__(self, worker,
                  delay=500,
                  show_tooltip=True):
@@ -166,8 +177,17 @@ class CheckerMode(Mode, QtCore.QObject):
         self._worker = worker
         self._mutex = QtCore.QMutex()
         self._show_tooltip = show_tooltip
-        self._pending_msg = []
+        # True if no analysis is running
         self._finished = True
+        # True if an analysis was requested while another one was running
+        self._pending = False
+        # lines inserted (or removed) while the analysis is running, used to
+        # remap the lines of its results: list of (line, delta)
+        self._line_shifts = []
+        self._block_count = 0
+        # incremented each time the messages (or their lines) change, used
+        # by the panels to know when they have to be redrawn
+        self._messages_revision = 0
 
     def set_ignore_rules(self, rules):
         """
@@ -182,76 +202,74 @@ class CheckerMode(Mode, QtCore.QObject):
         """
         Adds a message or a list of message.
 
+        The new list of messages replaces the current one: the messages that
+        are not in the new list are removed, the messages that are not
+        displayed yet are added (messages are compared by line, column,
+        description and status). The differences are applied at once and the
+        editor is repainted only once.
+
         :param messages: A list of messages or a single message
         """
-        # remove old messages
+        if isinstance(messages, CheckerMessage):
+            messages = [messages]
         if len(messages) > self.limit:
             messages = messages[:self.limit]
         _logger(self.__class__).log(5, 'adding %s messages' % len(messages))
-        self._finished = False
-        self._new_messages = messages
-        self._to_check = list(self._messages)
-        self._pending_msg = messages
-        # start removing messages, new message won't be added until we
-        # checked all message that need to be removed
-        QtCore.QTimer.singleShot(1, self._remove_batch)
-
-    def _remove_batch(self):
-        if self.editor is None:
-            return
-        for i in range(100):
-            if not len(self._to_check):
-                # all messages checker, start adding messages now
-                QtCore.QTimer.singleShot(1, self._add_batch)
-                self.editor.repaint()
-                return False
-            msg = self._to_check.pop(0)
-            if msg.block is None:
-                msg.block = self.editor.document().findBlockByNumber(msg.line)
-            if msg not in self._new_messages:
-                self.remove_message(msg)
+        new_keys = set(self._message_key(msg) for msg in messages)
+        to_remove = [msg for msg in self._messages
+                     if self._message_key(msg) not in new_keys]
+        old_keys = set(self._message_key(msg) for msg in self._messages)
+        with self.editor.decorations.transaction():
+            self._remove_messages(to_remove)
+            for msg in messages:
+                key = self._message_key(msg)
+                if key not in old_keys:
+                    # also skips duplicates of the new list
+                    old_keys.add(key)
+                    self._add_message(msg)
+        self._messages_revision += 1
+        _logger(self.__class__).log(
+            5, 'finished (%d removed)' % len(to_remove))
         self.editor.repaint()
-        QtCore.QTimer.singleShot(1, self._remove_batch)
 
-    def _add_batch(self):
-        if self.editor is None:
+    @staticmethod
+    def _message_key(message):
+        return (message.line, message.col, message.description,
+                message.status)
+
+    def _remove_messages(self, messages):
+        if not messages:
             return
-        for i in range(10):
-            if not len(self._pending_msg):
-                # all pending message added
-                self._finished = True
-                _logger(self.__class__).log(5, 'finished')
-                self.editor.repaint()
-                return False
-            message = self._pending_msg.pop(0)
-            if message.line >= 0:
-                try:
-                    usd = message.block.userData()
-                except AttributeError:
-                    message.block = self.editor.document().findBlockByNumber(
-                        message.line)
-                    usd = message.block.userData()
-                if usd is None:
-                    usd = TextBlockUserData()
-                    message.block.setUserData(usd)
-                # check if the same message already exists
-                if message in usd.messages:
-                    continue
-                self._messages.append(message)
-                usd.messages.append(message)
-                tooltip = None
-                if self._show_tooltip:
-                    tooltip = message.description
-                message.decoration = TextDecoration(
-                    self.editor.textCursor(), start_line=message.line,
-                    tooltip=tooltip, draw_order=3)
-                message.decoration.set_full_width()
-                message.decoration.set_as_error(color=QtGui.QColor(
-                    message.color))
-                self.editor.decorations.append(message.decoration)
-        QtCore.QTimer.singleShot(1, self._add_batch)
-        self.editor.repaint()
-        return True
+        self.editor.decorations.remove_many(
+            msg.decoration for msg in messages if msg.decoration)
+        for msg in messages:
+            self._detach_message(msg)
+        ids = set(id(msg) for msg in messages)
+        self._messages[:] = [
+            msg for msg in self._messages if id(msg) not in ids]
+
+    def _add_message(self, message):
+        if message.line >= 0:
+            if message.block is None:
+                message.block = self.editor.document().findBlockByNumber(
+                    message.line)
+            usd = self._get_user_data(message.block)
+            # check if the same message already exists
+            if message in usd.messages:
+                return
+            self._messages.append(message)
+            usd.messages.append(message)
+            message._user_data = usd
+            tooltip = None
+            if self._show_tooltip:
+                tooltip = message.description
+            message.decoration = TextDecoration(
+                self.editor.textCursor(), start_line=message.line,
+                tooltip=tooltip, draw_order=3)
+            message.decoration.set_full_width()
+            message.decoration.set_as_error(color=QtGui.QColor(
+                message.color))
+            self.editor.decorations.append(message.decoration)
 
     def remove_message(self, message):
         """
@@ -259,39 +277,118 @@ class CheckerMode(Mode, QtCore.QObject):
 
         :param message: Message to remove
         """
-        import time
         _logger(self.__class__).log(5, 'removing message %s' % message)
-        t = time.time()
-        usd = message.block.userData()
-        if usd:
-            try:
-                usd.messages.remove(message)
-            except (AttributeError, ValueError):
-                pass
+        self._detach_message(message)
         if message.decoration:
             self.editor.decorations.remove(message.decoration)
         self._messages.remove(message)
+        self._messages_revision += 1
 
     def clear_messages(self):
         """
         Clears all messages.
         """
+        self.editor.decorations.remove_many(
+            msg.decoration for msg in self._messages if msg.decoration)
         while len(self._messages):
             msg = self._messages.pop(0)
-            usd = msg.block.userData()
+            usd = msg._user_data
             if usd and hasattr(usd, 'messages'):
                 usd.messages[:] = []
-            if msg.decoration:
-                self.editor.decorations.remove(msg.decoration)
+            msg._user_data = None
+        self._messages_revision += 1
+
+    @staticmethod
+    def _get_user_data(block):
+        """
+        Returns the user data of ``block``, creates it if needed.
+        """
+        usd = block.userData()
+        if usd is None:
+            usd = TextBlockUserData()
+            block.setUserData(usd)
+        return usd
+
+    @staticmethod
+    def _detach_message(message):
+        """
+        Removes the message from the user data of its block.
+
+        The user data is kept on the message: the block handle of a message
+        may be invalid if its block has been removed.
+        """
+        usd = message._user_data
+        if usd is not None:
+            usd.messages[:] = [m for m in usd.messages if m is not message]
+        message._user_data = None
+
+    def _on_contents_change(self, position, *_):
+        """
+        Remaps the lines of the messages (and of the results of the running
+        analysis) when lines are inserted or removed, so that the messages
+        stay on their line until the next analysis results are displayed.
+        """
+        doc = self.editor.document()
+        count = doc.blockCount()
+        delta = count - self._block_count
+        if not delta:
+            return
+        self._block_count = count
+        if not self._finished:
+            self._line_shifts.append(
+                (doc.findBlock(position).blockNumber(), delta))
+        self._remap_messages()
+
+    def _remap_messages(self):
+        """
+        Moves the messages to the block of their decoration (decorations are
+        tracked by a QTextCursor, which is updated by the document).
+
+        Qt keeps the user data of a block that is split on the first block,
+        the message of a line where a line break was inserted at the start
+        would stay on the new empty line otherwise.
+        """
+        doc = self.editor.document()
+        self._messages_revision += 1
+        for msg in self._messages:
+            if msg.decoration is None:
+                continue
+            block = doc.findBlock(msg.decoration.cursor.selectionStart())
+            msg.block = block
+            msg.line = block.blockNumber()
+            usd = block.userData()
+            if usd is None or usd is not msg._user_data:
+                self._detach_message(msg)
+                usd = self._get_user_data(block)
+                usd.messages.append(msg)
+                msg._user_data = usd
+
+    def _remap_line(self, line):
+        """
+        Maps a line of the analysed text to the current text.
+        """
+        for start, delta in self._line_shifts:
+            if line > start:
+                line = max(start, line + delta)
+        return line
 
     def on_state_changed(self, state):
         if state:
+            self._block_count = self.editor.document().blockCount()
             self.editor.textChanged.connect(self.request_analysis)
             self.editor.new_text_set.connect(self.clear_messages)
+            self.editor.document().contentsChange.connect(
+                self._on_contents_change)
             self.request_analysis()
         else:
             self.editor.textChanged.disconnect(self.request_analysis)
             self.editor.new_text_set.disconnect(self.clear_messages)
+            try:
+                self.editor.document().contentsChange.disconnect(
+                    self._on_contents_change)
+            except (RuntimeError, TypeError):
+                # document already deleted
+                pass
             self._job_runner.cancel_requests()
             self.clear_messages()
 
@@ -299,34 +396,54 @@ class CheckerMode(Mode, QtCore.QObject):
         """
         Display results.
 
+        The lines of the messages are remapped if lines were inserted or
+        removed while the analysis was running. If the analysis was
+        superseded (a new analysis was requested while it was running), its
+        results are discarded and the new analysis is run right away.
+
         :param status: Response status
         :param results: Response data, messages.
         """
+        self._finished = True
+        if self.editor is None:
+            return
+        if self._pending:
+            self._pending = False
+            self._line_shifts = []
+            self._request()
+            return
         messages = []
         for msg in results:
             msg = CheckerMessage(*msg)
+            if msg.line >= 0:
+                msg.line = self._remap_line(msg.line)
             block = self.editor.document().findBlockByNumber(msg.line)
             msg.block = block
             messages.append(msg)
+        self._line_shifts = []
         self.add_messages(messages)
 
     def request_analysis(self):
         """
         Requests an analysis.
+
+        The analysis is run when the editor has been idle for a while. If an
+        analysis is already running, a new one is run as soon as the running
+        one finishes (no matter how many analysis were requested meanwhile).
         """
-        if self._finished:
-            _logger(self.__class__).log(5, 'running analysis')
-            self._job_runner.request_job(self._request)
-        elif self.editor:
-            # retry later
-            _logger(self.__class__).log(
-                5, 'delaying analysis (previous analysis not finished)')
-            QtCore.QTimer.singleShot(500, self.request_analysis)
+        self._job_runner.request_job(self._request)
 
     def _request(self):
         """ Requests a checking of the editor content. """
+        if not self._finished:
+            # the running analysis is superseded, run a new one when it
+            # finishes
+            _logger(self.__class__).log(
+                5, 'delaying analysis (previous analysis not finished)')
+            self._pending = True
+            return
         try:
-            self.editor.toPlainText()
+            snapshot = self.editor.snapshot()
         except (TypeError, RuntimeError):
             return
         try:
@@ -335,7 +452,7 @@ class CheckerMode(Mode, QtCore.QObject):
         except KeyError:
             max_line_length = 79
         request_data = {
-            'code': self.editor.toPlainText(),
+            'code': snapshot.text,
             'path': self.editor.file.path,
             'encoding': self.editor.file.encoding,
             'ignore_rules': self.ignore_rules,
@@ -344,7 +461,9 @@ class CheckerMode(Mode, QtCore.QObject):
         try:
             self.editor.backend.send_request(
                 self._worker, request_data, on_receive=self._on_work_finished)
+            _logger(self.__class__).log(5, 'running analysis')
             self._finished = False
+            self._line_shifts = []
         except NotRunning:
             # retry later
             QtCore.QTimer.singleShot(100, self._request)
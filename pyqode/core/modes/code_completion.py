@@ -491,7 +491,7 @@ class CodeCompletionMode(Mode, QtCore.QObject):
         else:
             debug('requesting completion')
             data = {
-                'code': self.editor.toPlainText(),
+                'code': self.editor.snapshot().text,
                 'line': line,
                 'column': column,
                 'path': self.editor.file.path,
@@ -161,6 +161,7 @@ class FileWatcherMode(Mode, QtCore.QObject):
             Cache().set_cursor_position(
                 self.editor.file.path,
                 self.editor.textCursor().position())
+            self.editor.file._cache_fold_state()
             self.editor.file.open(self.editor.file.path)
             self.file_reloaded.emit()
 
@@ -3,7 +3,7 @@
 This module contains the symbol matcher mode
 """
 from pyqode.core.api import get_block_symbol_data
-from pyqode.core.api.decoration import TextDecoration
+from pyqode.core.api.decoration import DecorationPool
 from pyqode.core.api.mode import Mode
 from pyqode.qt import QtGui
 
@@ -114,14 +114,16 @@ class SymbolMatcherMode(Mode):
     def __init__(self):
         super(SymbolMatcherMode, self).__init__()
         self._decorations = []
+        # matching decorations are replaced each time the cursor moves
+        self._pool = DecorationPool(max_size=10)
         self._match_background = QtGui.QBrush(QtGui.QColor('#B4EEB4'))
         self._match_foreground = QtGui.QColor('red')
         self._unmatch_background = QtGui.QBrush(QtGui.QColor('transparent'))
         self._unmatch_foreground = QtGui.QColor('red')
 
     def _clear_decorations(self):
-        for deco in self._decorations:
-            self.editor.decorations.remove(deco)
+        self.editor.decorations.remove_many(self._decorations)
+        self._pool.release(self._decorations)
         self._decorations[:] = []
 
     def symbol_pos(self, cursor, character_type=OPEN, symbol_type=PAREN):
@@ -149,15 +151,15 @@ class SymbolMatcherMode(Mode):
         return retval
 
     def _refresh_decorations(self):
+        self.editor.decorations.remove_many(self._decorations)
         for deco in self._decorations:
-            self.editor.decorations.remove(deco)
             if deco.match:
                 deco.set_foreground(self._match_foreground)
                 deco.set_background(self._match_background)
             else:
                 deco.set_foreground(self._unmatch_foreground)
                 deco.set_background(self._unmatch_background)
-            self.editor.decorations.append(deco)
+        self.editor.decorations.append_many(self._decorations)
 
     def on_state_changed(self, state):
         if state:
@@ -241,7 +243,9 @@ class SymbolMatcherMode(Mode):
         cursor = self.editor.textCursor()
         cursor.setPosition(pos)
         cursor.movePosition(cursor.NextCharacter, cursor.KeepAnchor)
-        deco = TextDecoration(cursor, draw_order=10)
+        deco = self._pool.acquire(
+            self.editor.document(), cursor.selectionStart(),
+            cursor.selectionEnd(), draw_order=10)
         deco.line = cursor.blockNumber()
         deco.column = cursor.columnNumber()
         deco.character = cursor.selectedText()
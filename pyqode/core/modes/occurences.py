@@ -2,15 +2,24 @@
 This module contains the occurrences highlighter mode.
 """
 from pyqode.qt import QtGui
-from pyqode.core.api import Mode, DelayJobRunner, TextHelper, TextDecoration
+from pyqode.core.api import Mode, DelayJobRunner, TextHelper
+from pyqode.core.api import DecorationPool, ViewportDecorations
+from pyqode.core.api import is_format_change
 from pyqode.core.backend import NotRunning
-from pyqode.core.backend.workers import findall
+from pyqode.core.backend.workers import findall, findalliter
 
 
 class OccurrencesHighlighterMode(Mode):
     """ Highlights occurrences of the word under the text text cursor.
 
     The ``delay`` before searching for occurrences is configurable.
+
+    All the occurrences are highlighted but text decorations are only created
+    for the visible ones (see :class:`pyqode.core.api.ViewportDecorations`).
+
+    The visible part of the document is searched directly for an instant
+    feedback, the whole document is then searched by the backend (unless the
+    whole document is visible).
     """
     @property
     def delay(self):
@@ -92,7 +101,7 @@ class OccurrencesHighlighterMode(Mode):
 
     def __init__(self):
         super(OccurrencesHighlighterMode, self).__init__()
-        self._decorations = []
+        self._decorations = None
         #: Timer used to run the search request with a specific delay
         self.timer = DelayJobRunner(delay=1000)
         self._sub = None
@@ -100,18 +109,41 @@ class OccurrencesHighlighterMode(Mode):
         self._foreground = None
         self._underlined = False
 
+    def on_install(self, editor):
+        self._decorations = ViewportDecorations(
+            editor, self._create_decoration, pool=DecorationPool())
+        super(OccurrencesHighlighterMode, self).on_install(editor)
+
+    def on_uninstall(self):
+        super(OccurrencesHighlighterMode, self).on_uninstall()
+        self._decorations.editor = None
+
     def on_state_changed(self, state):
         if state:
             self.editor.cursorPositionChanged.connect(self._request_highlight)
+            if hasattr(self.editor, 'updateRequest'):
+                self.editor.updateRequest.connect(self._decorations.update)
+            self.editor.document().contentsChange.connect(
+                self._on_contents_change)
         else:
             self.editor.cursorPositionChanged.disconnect(
                 self._request_highlight)
+            if hasattr(self.editor, 'updateRequest'):
+                self.editor.updateRequest.disconnect(self._decorations.update)
+            self.editor.document().contentsChange.disconnect(
+                self._on_contents_change)
             self.timer.cancel_requests()
 
+    def _on_contents_change(self, position, chars_removed, chars_added):
+        if is_format_change(self.editor.document(), position, chars_removed,
+                            chars_added):
+            return
+        # occurrences have to be searched again
+        self._decorations.invalidate()
+        self._sub = None
+
     def _clear_decos(self):
-        for d in self._decorations:
-            self.editor.decorations.remove(d)
-        self._decorations[:] = []
+        self._decorations.clear()
 
     def _request_highlight(self):
         if self.editor is not None:
@@ -126,11 +158,21 @@ class OccurrencesHighlighterMode(Mode):
         if self.editor is None:
             return
         cursor = self.editor.textCursor()
+        limit = self.editor.long_line_limit
+        if limit and cursor.positionInBlock() >= limit:
+            # end of a long line (e.g. minified file), see
+            # CodeEdit.long_line_limit
+            return
         self._sub = TextHelper(self.editor).word_under_cursor(
             select_whole_word=True).selectedText()
         if not cursor.hasSelection() or cursor.selectedText() == self._sub:
+            start, end = self._decorations.visible_range()
+            self._on_results_available(self._find_occurrences(start, end))
+            if start == 0 and end >= self.editor.document().characterCount():
+                # the whole document has already been searched
+                return
             request_data = {
-                'string': self.editor.toPlainText(),
+                'string': self.editor.snapshot().text,
                 'sub': self._sub,
                 'regex': False,
                 'whole_word': True,
@@ -142,29 +184,45 @@ class OccurrencesHighlighterMode(Mode):
             except NotRunning:
                 self._request_highlight()
 
+    def _find_occurrences(self, start, end):
+        """
+        Finds the occurrences of the word under cursor in the specified
+        range of the document (which must start and end on a block
+        boundary).
+        """
+        cursor = self.editor.textCursor()
+        cursor.setPosition(start)
+        cursor.setPosition(
+            min(end, self.editor.document().characterCount() - 1),
+            cursor.KeepAnchor)
+        text = cursor.selectedText().replace(u'\u2029', '\n')
+        return [(start + s, start + e) for s, e in findalliter(
+            text, self._sub, whole_word=True, case_sensitive=True)]
+
     def _on_results_available(self, results):
-        if len(results) > 500:
-            # limit number of results (on very big file where a lots of
-            # occurrences can be found, this would totally freeze the editor
-            # during a few seconds, with a limit of 500 we can make sure
-            # the editor will always remain responsive).
-            results = results[:500]
+        if self.editor is None:
+            return
+        if TextHelper(self.editor).word_under_cursor(
+                select_whole_word=True).selectedText() != self._sub:
+            # outdated results
+            return
         current = self.editor.textCursor().position()
         if len(results) > 1:
-            for start, end in results:
-                if start <= current <= end:
-                    continue
-                deco = TextDecoration(self.editor.textCursor(),
-                                      start_pos=start, end_pos=end)
-                if self.underlined:
-                    deco.set_as_underlined(self._background)
-                else:
-                    deco.set_background(QtGui.QBrush(self._background))
-                    if self._foreground is not None:
-                        deco.set_foreground(self._foreground)
-                deco.draw_order = 3
-                self.editor.decorations.append(deco)
-                self._decorations.append(deco)
+            self._decorations.set_ranges([
+                (start, end) for start, end in results
+                if not start <= current <= end])
+
+    def _create_decoration(self, start, end):
+        deco = self._decorations.pool.acquire(
+            self.editor.document(), start, end)
+        if self.underlined:
+            deco.set_as_underlined(self._background)
+        else:
+            deco.set_background(QtGui.QBrush(self._background))
+            if self._foreground is not None:
+                deco.set_foreground(self._foreground)
+        deco.draw_order = 3
+        return deco
 
     def clone_settings(self, original):
         self.delay = original.delay
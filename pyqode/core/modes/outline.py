@@ -55,13 +55,13 @@ class OutlineMode(Mode, QtCore.QObject):
     def _run_analysis(self):
         try:
             self.editor.file
-            self.editor.toPlainText()
+            snapshot = self.editor.snapshot()
         except (RuntimeError, AttributeError):
             # called by the timer after the editor got deleted
             return
         if self.enabled:
             request_data = {
-                'code': self.editor.toPlainText(),
+                'code': snapshot.text,
                 'path': self.editor.file.path,
                 'encoding': self.editor.file.encoding
             }
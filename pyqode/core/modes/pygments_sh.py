@@ -5,25 +5,43 @@ on pygments.
 
 .. note: This code is taken and adapted from the IPython project.
 """
+import fnmatch
+import functools
+import importlib
 import logging
 import mimetypes
+import os
 import sys
+import threading
+from collections import OrderedDict
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 from pygments.formatters.html import HtmlFormatter
 from pygments.lexer import Error, RegexLexer, Text, _TokenType
-from pygments.lexers import get_lexer_for_filename, get_lexer_for_mimetype
-from pygments.lexers.agile import PythonLexer
-from pygments.lexers.compiled import CLexer, CppLexer
+from pygments.lexers import (
+    get_all_lexers, get_lexer_for_filename, get_lexer_for_mimetype)
+try:
+    from pygments.lexers.python import PythonLexer
+    from pygments.lexers.c_cpp import CLexer, CppLexer
+except ImportError:
+    # pygments < 2.0
+    from pygments.lexers.agile import PythonLexer
+    from pygments.lexers.compiled import CLexer, CppLexer
 from pygments.lexers.dotnet import CSharpLexer
 from pygments.lexers.special import TextLexer
-from pygments.styles import get_style_by_name, get_all_styles
 from pygments.token import Whitespace, Comment, Token
 from pygments.util import ClassNotFound
-from pyqode.qt import QtGui
+from pyqode.qt import QtCore, QtGui
 from pyqode.qt.QtCore import QRegExp
 
 from pyqode.core.api.syntax_highlighter import (
-    SyntaxHighlighter, ColorScheme, TextBlockUserData)
+    SyntaxHighlighter, ColorScheme, TextBlockUserData, _get_style_by_name,
+    _BRUSHES, _PygmentsStyles)
+from pyqode.core.api.utils import TextBlockHelper
+from pyqode.core.cache import Cache
 
 
 def _logger():
@@ -32,10 +50,8 @@ def _logger():
 
 
 #: A sorted list of available pygments styles, for convenience
-PYGMENTS_STYLES = sorted(list(get_all_styles()))
-
-if hasattr(sys, 'frozen'):
-    PYGMENTS_STYLES += ['darcula', 'qt']
+PYGMENTS_STYLES = _PygmentsStyles(
+    ['darcula', 'qt'] if hasattr(sys, 'frozen') else [])
 
 
 def get_tokens_unprocessed(self, text, stack=('root',)):
@@ -127,6 +143,225 @@ CppLexer.tokens['comment'] = COMMENT_STATE
 CSharpLexer.tokens['comment'] = COMMENT_STATE
 
 
+#: Interned lexer state stacks (stack -> state id). The initial lexer state
+#: is always 0. State ids are stored in the 16 bits of the block user state
+#: reserved for syntax highlighting (see TextBlockHelper), stacks that could
+#: not be interned all share the last id.
+_STATE_IDS = {('root',): 0}
+_MAX_STATE_ID = 0xFFFF
+
+
+def _get_state_id(stack):
+    """
+    Returns the interned id of a lexer state stack.
+
+    :param stack: state stack (tuple) or None for the initial state.
+    """
+    if stack is None:
+        return 0
+    try:
+        return _STATE_IDS[stack]
+    except KeyError:
+        state_id = len(_STATE_IDS)
+        if state_id >= _MAX_STATE_ID:
+            return _MAX_STATE_ID
+        _STATE_IDS[stack] = state_id
+        return state_id
+
+
+def _lex(lexer, text, stack):
+    """
+    Lexes a line of text.
+
+    :param lexer: pygments lexer.
+    :param text: line of text to lex.
+    :param stack: lexer state stack at the start of the line (tuple), None
+        to use the lexer initial state.
+
+    :return: a tuple made up of the token runs (a tuple of
+        (index, length, token)) and of the lexer state stack at the end
+        of the line (None if the lexer does not expose its state).
+    """
+    if stack is not None:
+        lexer._saved_state_stack = list(stack)
+    elif hasattr(lexer, '_saved_state_stack'):
+        del lexer._saved_state_stack
+    # lex the line the way lexer.get_tokens would do (i.e. with a trailing
+    # newline) but skip its preprocessing (line endings normalisation, tab
+    # expansion,...): there is nothing to preprocess in a text block.
+    end = len(text)
+    runs = []
+    for index, token, value in lexer.get_tokens_unprocessed(text + '\n'):
+        if index < end and value:
+            runs.append((index, min(len(value), end - index), token))
+    stack = getattr(lexer, '_saved_state_stack', None)
+    if stack is not None:
+        stack = tuple(stack)
+        # Clean up for the next go-round.
+        del lexer._saved_state_stack
+    return tuple(runs), stack
+
+
+class _Tokenizer(QtCore.QObject):
+    """
+    Lexes lines of text in a worker thread, for the background rehighlights
+    (the edited and visible lines are still lexed in the gui thread). Results
+    are delivered in the gui thread, by calling the request callback.
+
+    The worker thread does not make lexing faster (it holds the GIL while
+    lexing), it lets the gui thread process events meanwhile.
+
+    Lexers are not thread safe, a lexer used by the tokenizer must not be
+    used by the gui thread.
+    """
+    _tokens_available = QtCore.Signal(object, object)
+
+    def __init__(self):
+        super(_Tokenizer, self).__init__()
+        self._requests = queue.Queue()
+        self._tokens_available.connect(self._on_tokens_available)
+        thread = threading.Thread(target=self._run)
+        # the daemon keyword argument is not available on python 2
+        thread.daemon = True
+        thread.start()
+
+    def request(self, lexer, lines, stack, callback):
+        """
+        Requests the tokens of a range of lines.
+
+        :param lexer: lexer to use (owned by the tokenizer).
+        :param lines: list of consecutive lines of text.
+        :param stack: lexer state stack at the start of the first line.
+        :param callback: function called with a list of
+            ((text, stack), (runs, end_stack)), or None if lexing failed.
+        """
+        self._requests.put((lexer, lines, stack, callback))
+
+    def _run(self):
+        while True:
+            lexer, lines, stack, callback = self._requests.get()
+            results = []
+            try:
+                for text in lines:
+                    runs, end_stack = _lex(lexer, text, stack)
+                    results.append(((text, stack), (runs, end_stack)))
+                    stack = end_stack
+            except Exception:
+                _logger().exception('failed to tokenize text')
+                results = None
+            self._tokens_available.emit(callback, results)
+
+    @staticmethod
+    def _on_tokens_available(callback, results):
+        try:
+            callback(results)
+        except RuntimeError:
+            # highlighter deleted
+            pass
+
+
+_tokenizer = None
+
+
+#: Process wide lexer registry: one lexer per lexer class, looked up once per
+#: mimetype/file name. The registry lexers are never handed out, each
+#: highlighter gets its own copy (see :func:`_get_lexer`). The lexer classes
+#: are also persisted in the pyqode cache, so that they don't need to be
+#: looked up in the pygments registry next time.
+_LEXERS = {}
+_LEXER_PROTOTYPES = {}
+
+#: Filename patterns of the pygments lexers (plugins included) that are not
+#: simple extension patterns (e.g. 'Makefile', '*.html.j2'), loaded on first
+#: use.
+_COMPLEX_FILENAME_PATTERNS = None
+
+#: Process wide token formats, by pygments style name. They are shared by
+#: all the highlighters and must not be modified.
+_TOKEN_FORMATS = {}
+
+
+def _get_filename_key(filename):
+    """
+    Gets the lexer registry key of a file name. File names that do not match
+    any complex pygments filename pattern share the key of their extension.
+
+    :param filename: file name or path.
+    """
+    global _COMPLEX_FILENAME_PATTERNS
+    if _COMPLEX_FILENAME_PATTERNS is None:
+        patterns = set()
+        for _, _, filenames, _ in get_all_lexers():
+            for pattern in filenames:
+                ext = os.path.splitext(pattern)[1]
+                if pattern != '*' + ext or '*' in ext or '?' in ext or \
+                        '[' in ext:
+                    patterns.add(pattern)
+        _COMPLEX_FILENAME_PATTERNS = patterns
+    basename = os.path.basename(filename)
+    ext = os.path.splitext(basename)[1]
+    if not ext or any(fnmatch.fnmatchcase(basename, pattern)
+                      for pattern in _COMPLEX_FILENAME_PATTERNS):
+        return 'filename:%s' % basename
+    return 'filename:*%s' % ext
+
+
+def _copy_lexer(lexer):
+    """
+    Copies a lexer (pygments compiles the lexer rules once per class, creating
+    a lexer is cheap).
+    """
+    return lexer.__class__(**lexer.options)
+
+
+def _same_lexer(lexer, other):
+    """
+    Checks if two lexers lex the same way (same class and same options).
+    """
+    return (lexer.__class__ is other.__class__ and
+            lexer.options == other.options)
+
+
+def _get_lexer(key, factory, *args):
+    """
+    Gets a copy of a lexer from the registry.
+
+    :param key: registry key, e.g. 'mimetype:text/x-python'.
+    :param factory: function used to create the lexer if the key is neither
+        in the registry nor in the pyqode cache (called with ``args``),
+        lookup errors are propagated.
+    """
+    try:
+        return _copy_lexer(_LEXERS[key])
+    except KeyError:
+        pass
+    cache = Cache()
+    lexer = None
+    path = cache.get_lexer_class(key)
+    if path:
+        try:
+            module, name = path.split(':')
+            lexer = getattr(importlib.import_module(module), name)()
+        except (ImportError, AttributeError, ValueError):
+            _logger().debug('failed to load cached lexer class %s', path)
+    if lexer is None:
+        lexer = factory(*args)
+        cache.set_lexer_class(key, '%s:%s' % (
+            lexer.__class__.__module__, lexer.__class__.__name__))
+    if not lexer.options:
+        lexer = _LEXER_PROTOTYPES.setdefault(lexer.__class__, lexer)
+    _LEXERS[key] = lexer
+    return _copy_lexer(lexer)
+
+
+def _get_tokenizer():
+    """ Returns the process wide tokenizer, created on first use. """
+    global _tokenizer
+    if _tokenizer is None:
+        _tokenizer = _Tokenizer()
+    return _tokenizer
+
+
 class PygmentsSH(SyntaxHighlighter):
     """ Highlights code using the pygments parser.
 
@@ -137,13 +372,31 @@ class PygmentsSH(SyntaxHighlighter):
     namespace packages to see what other languages are available (at the time
     of writing, only python has specialised support).
 
-    .. warning:: There are some issues with multi-line comments, they are not
-                 properly highlighted until a full re-highlight is triggered.
-                 The text is automatically re-highlighted on save.
+    The lexer state at the end of each block is stored in the block state
+    (as an interned state id), so that an edit that changes the state of a
+    block (e.g. opening a multi-line comment) rehighlights the next blocks,
+    until the first block whose end state is unchanged.
+
+    During a background rehighlight, the lines that are not visible are
+    lexed by a worker thread (see :attr:`threaded_tokenization`). The lines
+    that are edited or visible are always lexed in the gui thread.
     """
     #: Mode description
     DESCRIPTION = "Apply syntax highlighting to the editor using pygments"
 
+    #: Number of lines whose tokens are kept in the token cache, in addition
+    #: to the :attr:`TOKEN_CACHE_RATIO` lines per line of the document.
+    TOKEN_CACHE_SIZE = 5000
+
+    #: The token cache grows with the document, so that the tokens of every
+    #: line, in the two states of an edit that toggles a multi-line comment,
+    #: stay in cache. (An LRU cache that is smaller than the lines that are
+    #: rehighlighted evicts every line before it is reused.)
+    TOKEN_CACHE_RATIO = 2
+
+    #: Number of lines lexed at once by the tokenizer thread.
+    TOKENIZER_CHUNK_SIZE = 1000
+
     @property
     def pygments_style(self):
         """
@@ -165,10 +418,24 @@ class PygmentsSH(SyntaxHighlighter):
         self._formatter = HtmlFormatter(nowrap=True)
         self._lexer = lexer if lexer else PythonLexer()
 
-        self._brushes = {}
+        self._brushes = _BRUSHES
         self._formats = {}
+        # LRU cache of the lexer results: (line text, entry state stack) ->
+        # (token runs, exit state stack). Only valid for _token_cache_lexer.
+        self._token_cache = OrderedDict()
+        self._token_cache_lexer = None
+        #: Lexes the lines highlighted by the background rehighlights in a
+        #: worker thread (the edited and visible lines are always lexed in
+        #: the gui thread). Default is True.
+        self.threaded_tokenization = True
+        # copy of the lexer owned by the tokenizer thread
+        self._tokenizer_lexer = None
+        # tokenizer results are keyed by (line text, entry state stack): the
+        # results computed for lines that have been edited in the meantime
+        # are never used to highlight them.
+        self._tokens_request = 0
+        self._awaited_tokens_request = None
         self._init_style()
-        self._prev_block = None
 
     def _init_style(self):
         """ Init pygments style """
@@ -211,23 +478,36 @@ class PygmentsSH(SyntaxHighlighter):
 
         :param filename: Filename or extension
         """
-        self._lexer = None
         if filename.endswith("~"):
             filename = filename[0:len(filename) - 1]
+        self._lexer = _get_lexer(
+            _get_filename_key(filename), self._find_lexer_for_filename,
+            filename)
+
+    @staticmethod
+    def _find_lexer_for_filename(filename):
+        """
+        Finds the lexer for a filename, falls back to the mimetype lexer and
+        to the plain text lexer.
+
+        :param filename: Filename or extension
+        """
+        lexer = None
         try:
-            self._lexer = get_lexer_for_filename(filename)
+            lexer = get_lexer_for_filename(filename)
         except (ClassNotFound, ImportError):
             print('class not found for url', filename)
             try:
                 m = mimetypes.guess_type(filename)
                 print(m)
-                self._lexer = get_lexer_for_mimetype(m[0])
+                lexer = get_lexer_for_mimetype(m[0])
             except (ClassNotFound, IndexError, ImportError):
-                self._lexer = get_lexer_for_mimetype('text/plain')
-        if self._lexer is None:
+                lexer = get_lexer_for_mimetype('text/plain')
+        if lexer is None:
             _logger().warning('failed to get lexer from filename: %s, using '
                               'plain text instead...', filename)
-            self._lexer = TextLexer()
+            lexer = TextLexer()
+        return lexer
 
     def set_lexer_from_mime_type(self, mime, **options):
         """
@@ -236,7 +516,11 @@ class PygmentsSH(SyntaxHighlighter):
         :param mime: mime type
         :param options: optional addtional options.
         """
-        self._lexer = get_lexer_for_mimetype(mime, **options)
+        if options:
+            self._lexer = get_lexer_for_mimetype(mime, **options)
+        else:
+            self._lexer = _get_lexer(
+                'mimetype:%s' % mime, get_lexer_for_mimetype, mime)
         _logger().debug('lexer for mimetype (%s): %r', mime, self._lexer)
 
     def highlight_block(self, text, block):
@@ -251,34 +535,18 @@ class PygmentsSH(SyntaxHighlighter):
             self._update_style()
         original_text = text
         if self.editor and self._lexer and self.enabled:
-            if block.blockNumber():
-                prev_data = self._prev_block.userData()
-                if prev_data:
-                    if hasattr(prev_data, "syntax_stack"):
-                        self._lexer._saved_state_stack = prev_data.syntax_stack
-                    elif hasattr(self._lexer, '_saved_state_stack'):
-                        del self._lexer._saved_state_stack
-
-            # Lex the text using Pygments
-            index = 0
+            stack = self._get_entry_stack(block)
             usd = block.userData()
             if usd is None:
                 usd = TextBlockUserData()
                 block.setUserData(usd)
-            tokens = list(self._lexer.get_tokens(text))
-            for token, text in tokens:
-                length = len(text)
-                fmt = self._get_format(token)
-                if token in [Token.Literal.String, Token.Literal.String.Doc,
-                             Token.Comment]:
-                    fmt.setObjectType(fmt.UserObject)
-                self.setFormat(index, length, fmt)
-                index += length
-
-            if hasattr(self._lexer, '_saved_state_stack'):
-                setattr(usd, "syntax_stack", self._lexer._saved_state_stack)
-                # Clean up for the next go-round.
-                del self._lexer._saved_state_stack
+            runs, stack = self._get_tokens(text, stack)
+            for index, length, token in runs:
+                self.setFormat(index, length, self._get_format(token))
+
+            if stack is not None:
+                usd.syntax_stack = stack
+            TextBlockHelper.set_state(block, _get_state_id(stack))
 
             # spaces
             text = original_text
@@ -290,13 +558,114 @@ class PygmentsSH(SyntaxHighlighter):
                 self.setFormat(index, length, self._get_format(Whitespace))
                 index = expression.indexIn(text, index + length)
 
-            self._prev_block = block
+    @staticmethod
+    def _get_entry_stack(block):
+        """
+        Gets the lexer state stack at the start of a block, i.e. the stack at
+        the end of the previous block.
+        """
+        if block.blockNumber():
+            prev_data = block.previous().userData()
+            if prev_data:
+                return getattr(prev_data, 'syntax_stack', None)
+        return None
+
+    def _check_token_cache(self):
+        """
+        Clears the token cache if the lexer changed (the cache is kept if the
+        new lexer is equivalent to the previous one).
+        """
+        if self._token_cache_lexer is not self._lexer:
+            if self._token_cache_lexer is None or self._lexer is None or \
+                    not _same_lexer(self._token_cache_lexer, self._lexer):
+                self._token_cache.clear()
+            self._token_cache_lexer = self._lexer
+            self._tokenizer_lexer = None
+
+    def _token_cache_limit(self):
+        """
+        Returns the maximum number of lines of the token cache, see
+        :attr:`TOKEN_CACHE_SIZE` and :attr:`TOKEN_CACHE_RATIO`.
+        """
+        doc = self.document()
+        lines = doc.blockCount() if doc is not None else 0
+        return self.TOKEN_CACHE_SIZE + self.TOKEN_CACHE_RATIO * lines
+
+    def _cache_tokens(self, key, result):
+        limit = self._token_cache_limit()
+        while self._token_cache and len(self._token_cache) >= limit:
+            self._token_cache.popitem(last=False)
+        self._token_cache[key] = result
+
+    def _get_tokens(self, text, stack):
+        """
+        Lexes a line of text, results are cached in a LRU cache keyed by the
+        line text and the lexer entry state stack.
+
+        :param text: line of text to lex.
+        :param stack: lexer state stack at the start of the line (tuple), None
+            to use the lexer initial state.
+
+        :return: a tuple made up of the token runs (a tuple of
+            (index, length, token)) and of the lexer state stack at the end
+            of the line (None if the lexer does not expose its state).
+        """
+        self._check_token_cache()
+        key = (text, stack)
+        try:
+            result = self._token_cache.pop(key)
+        except KeyError:
+            result = _lex(self._lexer, text, stack)
+        self._cache_tokens(key, result)
+        return result
+
+    def _prepare_block(self, block):
+        """
+        Requests the tokens of the next lines to the tokenizer thread if the
+        block tokens are not in cache yet.
+        """
+        if not self.threaded_tokenization or self._lexer is None:
+            return True
+        self._check_token_cache()
+        stack = self._get_entry_stack(block)
+        if (self._limit_line(block.text()), stack) in self._token_cache:
+            return True
+        if self._tokenizer_lexer is None:
+            try:
+                self._tokenizer_lexer = _copy_lexer(self._lexer)
+            except Exception:
+                _logger().exception('failed to copy lexer %r', self._lexer)
+                self.threaded_tokenization = False
+                return True
+        lines = []
+        while block.isValid() and len(lines) < self.TOKENIZER_CHUNK_SIZE:
+            lines.append(self._limit_line(block.text()))
+            block = block.next()
+        self._tokens_request += 1
+        self._awaited_tokens_request = self._tokens_request
+        _get_tokenizer().request(
+            self._tokenizer_lexer, lines, stack, functools.partial(
+                self._on_tokens_available, self._tokens_request,
+                self._lexer))
+        return False
+
+    def _on_tokens_available(self, request, lexer, results):
+        if results is None:
+            _logger().warning('tokenizer thread failed, disabling threaded '
+                              'tokenization')
+            self.threaded_tokenization = False
+        elif lexer is self._token_cache_lexer:
+            for key, result in results:
+                self._cache_tokens(key, result)
+        if request == self._awaited_tokens_request:
+            self._awaited_tokens_request = None
+            self._resume_rehighlight()
 
     def _update_style(self):
         """ Sets the style to the specified Pygments style.
         """
         try:
-            self._style = get_style_by_name(self._pygments_style)
+            self._style = _get_style_by_name(self._pygments_style)
         except ClassNotFound:
             # unknown style, also happen with plugins style when used from a
             # frozen app.
@@ -307,15 +676,16 @@ class PygmentsSH(SyntaxHighlighter):
                 from pyqode.core.styles import DarculaStyle
                 self._style = DarculaStyle
             else:
-                self._style = get_style_by_name('default')
+                self._style = _get_style_by_name('default')
                 self._pygments_style = 'default'
         self._clear_caches()
 
     def _clear_caches(self):
-        """ Clear caches for brushes and formats.
+        """ Reset caches for brushes and formats (the formats of a style are
+        shared by all the highlighters).
         """
-        self._brushes.clear()
-        self._formats.clear()
+        self._brushes = _BRUSHES
+        self._formats = _TOKEN_FORMATS.setdefault(self._pygments_style, {})
 
     def _get_format(self, token):
         """ Returns a QTextCharFormat for token or None.
@@ -359,6 +729,10 @@ class PygmentsSH(SyntaxHighlighter):
                     result.setFontStyleHint(QtGui.QFont.Times)
                 elif key == 'mono':
                     result.setFontStyleHint(QtGui.QFont.TypeWriter)
+        if token in [Token.Literal.String, Token.Literal.String.Doc,
+                     Token.Comment]:
+            # mark strings, comments and docstrings regions for further queries
+            result.setObjectType(result.UserObject)
         return result
 
     def _get_brush(self, color):
@@ -7,7 +7,7 @@ import os
 import sys
 from pyqode.core.api import TextBlockHelper, folding, TextDecoration, \
     DelayJobRunner
-from pyqode.core.api.folding import FoldScope
+from pyqode.core.api.folding import FoldIndex, FoldScope
 from pyqode.core.api.panel import Panel
 from pyqode.qt import QtCore, QtWidgets, QtGui, PYQT5_API
 from pyqode.core.api.utils import TextHelper, drift_color, keep_tc_pos
@@ -162,8 +162,10 @@ class FoldingPanel(Panel):
         #: the list of deco used to highlight the current fold region (
         #: surrounding regions are darker)
         self._scope_decos = []
-        #: the list of folded blocs decorations
-        self._block_decos = []
+        #: the folded blocks decorations, indexed by block number
+        self._block_decos = {}
+        # number of blocks of the document when _block_decos was indexed
+        self._block_decos_count = 0
         self.setMouseTracking(True)
         self.scrollable = True
         self._mouse_over_line = None
@@ -176,6 +178,7 @@ class FoldingPanel(Panel):
         self.action_expand_all = None
         self._original_background = None
         self._highlight_runner = DelayJobRunner(delay=250)
+        self._decorations_runner = DelayJobRunner(delay=0)
 
     def on_install(self, editor):
         """
@@ -236,27 +239,63 @@ class FoldingPanel(Panel):
                 mouse_over = self._mouse_over_line == line_number
                 self._draw_fold_indicator(
                     top_position, mouse_over, collapsed, painter)
-                if collapsed:
-                    # check if the block already has a decoration, it might
-                    # have been folded by the parent editor/document in the
-                    # case of cloned editor
-                    for deco in self._block_decos:
-                        if deco.block == block:
-                            # no need to add a deco, just go to the next block
-                            break
-                    else:
-                        self._add_fold_decoration(block, FoldScope(block))
+
+    def _update_fold_decorations(self):
+        """
+        Adds the missing decorations on the visible collapsed triggers and
+        removes the decorations of the visible expanded triggers.
+
+        Decorations are only added for the visible triggers, they might also
+        have been folded/unfolded by the parent editor/document in the case
+        of cloned editors.
+        """
+        editor = self.editor
+        doc = editor.document()
+        if self._block_decos_count != doc.blockCount():
+            # lines have been added/removed, index the decorations again
+            # (their cursor follows the text).
+            block_decos = {}
+            for deco in self._block_decos.values():
+                number = deco.cursor.blockNumber()
+                if number in block_decos:
+                    # the folded block has been merged with another one
+                    editor.decorations.remove(deco)
                 else:
-                    for deco in self._block_decos:
-                        # check if the block decoration has been removed, it
-                        # might have been unfolded by the parent
-                        # editor/document in the case of cloned editor
-                        if deco.block == block:
-                            # remove it and
-                            self._block_decos.remove(deco)
-                            self.editor.decorations.remove(deco)
-                            del deco
-                            break
+                    block_decos[number] = deco
+            self._block_decos = block_decos
+            self._block_decos_count = doc.blockCount()
+        block = editor.firstVisibleBlock()
+        top = editor.blockBoundingGeometry(block).translated(
+            editor.contentOffset()).top()
+        bottom = editor.viewport().height()
+        with editor.decorations.transaction():
+            while block.isValid() and top <= bottom:
+                if block.isVisible():
+                    number = block.blockNumber()
+                    deco = self._block_decos.get(number)
+                    if TextBlockHelper.is_fold_trigger(block) and \
+                            TextBlockHelper.is_collapsed(block):
+                        if deco is None:
+                            self._add_fold_decoration(
+                                block, FoldScope(block))
+                    elif deco is not None:
+                        del self._block_decos[number]
+                        editor.decorations.remove(deco)
+                    top += editor.blockBoundingRect(block).height()
+                block = block.next()
+
+    def _on_update_request(self, rect, dy):
+        """
+        Updates the fold decorations when the viewport has been scrolled or
+        entirely updated (e.g. a region has been folded in a clone).
+
+        The update is deferred: update requests are emitted while the
+        document is being modified.
+        """
+        if dy or rect.contains(self.editor.viewport().rect()) or \
+                self._block_decos_count != self.editor.document().blockCount():
+            self._decorations_runner.request_job(
+                self._update_fold_decorations)
 
     def _draw_fold_region_background(self, block, painter):
         """
@@ -390,26 +429,14 @@ class FoldingPanel(Panel):
         Find parent scope, if the block is not a fold trigger.
 
         """
-        original = block
-        if not TextBlockHelper.is_fold_trigger(block):
-            # search level of next non blank line
-            while block.text().strip() == '' and block.isValid():
-                block = block.next()
-            ref_lvl = TextBlockHelper.get_fold_lvl(block) - 1
-            block = original
-            while (block.blockNumber() and
-                   (not TextBlockHelper.is_fold_trigger(block) or
-                    TextBlockHelper.get_fold_lvl(block) > ref_lvl)):
-                block = block.previous()
-        return block
+        return FoldScope.find_parent_scope(block)
 
     def _clear_scope_decos(self):
         """
         Clear scope decorations (on the editor)
 
         """
-        for deco in self._scope_decos:
-            self.editor.decorations.remove(deco)
+        self.editor.decorations.remove_many(self._scope_decos)
         self._scope_decos[:] = []
 
     def _get_scope_highlight_color(self):
@@ -506,11 +533,12 @@ class FoldingPanel(Panel):
         if (self._current_scope is None or
                 self._current_scope.get_range() != scope.get_range()):
             self._current_scope = scope
-            self._clear_scope_decos()
-            # highlight surrounding parent scopes with a darker color
-            start, end = scope.get_range()
-            if not TextBlockHelper.is_collapsed(block):
-                self._add_scope_decorations(block, start, end)
+            with self.editor.decorations.transaction():
+                self._clear_scope_decos()
+                # highlight surrounding parent scopes with a darker color
+                start, end = scope.get_range()
+                if not TextBlockHelper.is_collapsed(block):
+                    self._add_scope_decorations(block, start, end)
 
     def mouseMoveEvent(self, event):
         """
@@ -584,7 +612,7 @@ class FoldingPanel(Panel):
             self._get_scope_highlight_color(), 110))
         deco.set_background(self._get_scope_highlight_color())
         deco.set_foreground(QtGui.QColor('#808080'))
-        self._block_decos.append(deco)
+        self._block_decos[block.blockNumber()] = deco
         self.editor.decorations.append(deco)
 
     def toggle_fold_trigger(self, block):
@@ -604,7 +632,9 @@ class FoldingPanel(Panel):
         else:
             region.fold()
             self._clear_scope_decos()
-        self._refresh_editor_and_scrollbars()
+        self._refresh_editor_and_scrollbars(
+            *region.get_range(ignore_blank_lines=False))
+        self._update_fold_decorations()
         self.trigger_state_changed.emit(region._trigger, region.collapsed)
 
     def mousePressEvent(self, event):
@@ -618,7 +648,7 @@ class FoldingPanel(Panel):
         """
         Unfold a folded block that has just been clicked by the user
         """
-        self.toggle_fold_trigger(deco.block)
+        self.toggle_fold_trigger(deco.cursor.block())
 
     def on_state_changed(self, state):
         """
@@ -630,14 +660,17 @@ class FoldingPanel(Panel):
                 self.editor.cursorPositionChanged.connect(
                     self._highlight_caret_scope)
                 self._block_nbr = -1
-            self.editor.new_text_set.connect(self._clear_block_deco)
+            self.editor.new_text_set.connect(self._on_new_text_set)
+            self.editor.updateRequest.connect(self._on_update_request)
         else:
             self.editor.key_pressed.disconnect(self._on_key_pressed)
             if self._highlight_caret:
                 self.editor.cursorPositionChanged.disconnect(
                     self._highlight_caret_scope)
                 self._block_nbr = -1
-            self.editor.new_text_set.disconnect(self._clear_block_deco)
+            self.editor.new_text_set.disconnect(self._on_new_text_set)
+            self.editor.updateRequest.disconnect(self._on_update_request)
+            self._decorations_runner.cancel_requests()
 
     def _on_key_pressed(self, event):
         """
@@ -673,18 +706,6 @@ class FoldingPanel(Panel):
                         tc.setPosition(end, tc.KeepAnchor)
                         self.editor.setTextCursor(tc)
 
-    @staticmethod
-    def _show_previous_blank_lines(block):
-        """
-        Show the block previous blank lines
-        """
-        # set previous blank lines visibles
-        pblock = block.previous()
-        while (pblock.text().strip() == '' and
-               pblock.blockNumber() >= 0):
-            pblock.setVisible(True)
-            pblock = pblock.previous()
-
     def refresh_decorations(self, force=False):
         """
         Refresh decorations colors. This function is called by the syntax
@@ -695,77 +716,120 @@ class FoldingPanel(Panel):
         cursor = self.editor.textCursor()
         if (self._prev_cursor is None or force or
                 self._prev_cursor.blockNumber() != cursor.blockNumber()):
-            for deco in self._block_decos:
-                self.editor.decorations.remove(deco)
-            for deco in self._block_decos:
-                deco.set_outline(drift_color(
-                    self._get_scope_highlight_color(), 110))
-                deco.set_background(self._get_scope_highlight_color())
-                self.editor.decorations.append(deco)
+            decos = list(self._block_decos.values())
+            with self.editor.decorations.transaction():
+                self.editor.decorations.remove_many(decos)
+                for deco in decos:
+                    deco.set_outline(drift_color(
+                        self._get_scope_highlight_color(), 110))
+                    deco.set_background(self._get_scope_highlight_color())
+                self.editor.decorations.append_many(decos)
         self._prev_cursor = cursor
 
-    def _refresh_editor_and_scrollbars(self):
+    def _refresh_editor_and_scrollbars(self, first_line=0, last_line=-1):
         """
         Refrehes editor content and scollbars.
 
-        We generate a fake resize event to refresh scroll bar.
+        Only the layout of the blocks between ``first_line`` and ``last_line``
+        is invalidated (the whole document by default).
 
-        We have the same problem as described here:
-        http://www.qtcentre.org/threads/44803 and we apply the same solution
-        (don't worry, there is no visual effect, the editor does not grow up
-        at all, even with a value = 500)
+        The scroll bars range is updated by notifying the editor that the
+        document size changed (the editor does not always notice that the
+        number of visible lines changed, see
+        http://www.qtcentre.org/threads/44803), there is no need to relayout
+        the whole document.
         """
-        TextHelper(self.editor).mark_whole_doc_dirty()
-        self.editor.repaint()
-        s = self.editor.size()
-        s.setWidth(s.width() + 1)
-        self.editor.resizeEvent(QtGui.QResizeEvent(self.editor.size(), s))
+        if first_line == 0 and last_line == -1:
+            TextHelper(self.editor).mark_whole_doc_dirty()
+        else:
+            doc = self.editor.document()
+            start = doc.findBlockByNumber(first_line).position()
+            last = doc.findBlockByNumber(last_line)
+            doc.markContentsDirty(start, last.position() + last.length() -
+                                  start)
+        layout = self.editor.document().documentLayout()
+        layout.documentSizeChanged.emit(layout.documentSize())
+        self.editor.viewport().update()
+
+    def fold_to_level(self, level):
+        """
+        Collapses all the fold triggers whose level is greater or equal to
+        ``level`` and expands the other ones.
+
+        E.g. with a python file, ``fold_to_level(1)`` shows the methods of
+        the top level classes but hides their bodies.
+
+        The new fold state is computed and applied in one pass (see
+        :meth:`pyqode.core.api.FoldIndex.fold_to_level`), only the layout of
+        the blocks whose visibility changed is invalidated.
+
+        :param level: fold level (0 to collapse all triggers).
+        """
+        self._apply_fold_state(
+            FoldIndex.get(self.editor.document()).fold_to_level, level)
+
+    def fold_triggers(self, lines):
+        """
+        Collapses the fold triggers found in ``lines`` and expands the other
+        ones, in one pass (see
+        :meth:`pyqode.core.api.FoldIndex.fold_triggers`).
+
+        This is used to restore the fold state of a file (see
+        :attr:`pyqode.core.managers.FileManager.restore_folding`).
+
+        :param lines: line numbers of the triggers to collapse.
+        """
+        self._apply_fold_state(
+            FoldIndex.get(self.editor.document()).fold_triggers, lines)
+
+    def _apply_fold_state(self, fold_function, *args):
+        self._clear_block_deco()
+        self._clear_scope_decos()
+        self._current_scope = None
+        changed = fold_function(*args)
+        if changed is not None:
+            self._refresh_editor_and_scrollbars(*changed)
+        self._update_fold_decorations()
+        cursor = self.editor.textCursor()
+        block = cursor.block()
+        if not block.isVisible():
+            # move the cursor to the trigger of the collapsed region
+            while not block.isVisible() and block.blockNumber() > 0:
+                block = block.previous()
+            cursor.setPosition(block.position())
+            self.editor.setTextCursor(cursor)
 
     def collapse_all(self):
         """
         Collapses all triggers and makes all blocks with fold level > 0
         invisible.
         """
-        self._clear_block_deco()
-        block = self.editor.document().firstBlock()
-        last = self.editor.document().lastBlock()
-        while block.isValid():
-            lvl = TextBlockHelper.get_fold_lvl(block)
-            trigger = TextBlockHelper.is_fold_trigger(block)
-            if trigger:
-                if lvl == 0:
-                    self._show_previous_blank_lines(block)
-                TextBlockHelper.set_collapsed(block, True)
-            block.setVisible(lvl == 0)
-            if block == last and block.text().strip() == '':
-                block.setVisible(True)
-                self._show_previous_blank_lines(block)
-            block = block.next()
-        self._refresh_editor_and_scrollbars()
+        self.fold_to_level(0)
         tc = self.editor.textCursor()
         tc.movePosition(tc.Start)
         self.editor.setTextCursor(tc)
         self.collapse_all_triggered.emit()
 
+    def _on_new_text_set(self):
+        """
+        Clears the folded block decorations and forgets the current scope
+        (its trigger block does not exist anymore).
+        """
+        self._current_scope = None
+        self._clear_block_deco()
+
     def _clear_block_deco(self):
         """
         Clear the folded block decorations.
         """
-        for deco in self._block_decos:
-            self.editor.decorations.remove(deco)
-        self._block_decos[:] = []
+        self.editor.decorations.remove_many(self._block_decos.values())
+        self._block_decos.clear()
 
     def expand_all(self):
         """
         Expands all fold triggers.
         """
-        block = self.editor.document().firstBlock()
-        while block.isValid():
-            TextBlockHelper.set_collapsed(block, False)
-            block.setVisible(True)
-            block = block.next()
-        self._clear_block_deco()
-        self._refresh_editor_and_scrollbars()
+        self.fold_to_level(sys.maxsize)
         self.expand_all_triggered.emit()
 
     def _on_action_toggle(self):
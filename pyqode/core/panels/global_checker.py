@@ -12,11 +12,21 @@ class GlobalCheckerPanel(Panel):
 
     The user can click on a marker to quickly go the the error line.
 
+    The messages are rendered into a cached pixmap, which is rendered again
+    only when the messages, the number of lines, the panel size or the editor
+    background change. Scrolling the editor only redraws the visible area.
+
     """
 
     def __init__(self):
         super(GlobalCheckerPanel, self).__init__()
         self.scrollable = True
+        self._pixmap = None
+        self._pixmap_key = None
+
+    def _checker_modes(self):
+        return [m for m in self.editor.modes
+                if isinstance(m, modes.CheckerMode)]
 
     def _draw_messages(self, painter):
         """
@@ -25,21 +35,46 @@ class GlobalCheckerPanel(Panel):
 
         :type painter: QtGui.QPainter
         """
-        checker_modes = []
-        for m in self.editor.modes:
-            if isinstance(m, modes.CheckerMode):
-                checker_modes.append(m)
-        for checker_mode in checker_modes:
+        x = self.sizeHint().width() / 4
+        height = self.get_marker_height()
+        size = self.get_marker_size()
+        brushes = {}
+        for checker_mode in self._checker_modes():
             for msg in checker_mode.messages:
-                block = msg.block
-                color = QtGui.QColor(msg.color)
-                brush = QtGui.QBrush(color)
+                try:
+                    brush = brushes[msg.color]
+                except KeyError:
+                    brush = brushes[msg.color] = QtGui.QBrush(
+                        QtGui.QColor(msg.color))
                 rect = QtCore.QRect()
-                rect.setX(self.sizeHint().width() / 4)
-                rect.setY(block.blockNumber() * self.get_marker_height())
-                rect.setSize(self.get_marker_size())
+                rect.setX(x)
+                rect.setY(msg.block.blockNumber() * height)
+                rect.setSize(size)
                 painter.fillRect(rect, brush)
 
+    def _pixmap_cache_key(self):
+        return (self.width(), self.height(),
+                self.editor.document().blockCount(),
+                self.editor.background.name(),
+                [(id(m), m.messages_revision)
+                 for m in self._checker_modes()])
+
+    def _messages_pixmap(self):
+        """
+        Returns the pixmap of the messages (and of the panel background),
+        renders it again if it is outdated.
+        """
+        key = self._pixmap_cache_key()
+        if self._pixmap is None or key != self._pixmap_key:
+            pixmap = QtGui.QPixmap(self.size())
+            pixmap.fill(self.editor.background)
+            painter = QtGui.QPainter(pixmap)
+            self._draw_messages(painter)
+            painter.end()
+            self._pixmap = pixmap
+            self._pixmap_key = key
+        return self._pixmap
+
     def _draw_visible_area(self, painter):
         """
         Draw the visible area.
@@ -69,11 +104,9 @@ class GlobalCheckerPanel(Panel):
         :param event: paint event infos
         """
         if self.isVisible():
-            # fill background
             self._background_brush = QtGui.QBrush(self.editor.background)
             painter = QtGui.QPainter(self)
-            painter.fillRect(event.rect(), self._background_brush)
-            self._draw_messages(painter)
+            painter.drawPixmap(0, 0, self._messages_pixmap())
             self._draw_visible_area(painter)
 
     def sizeHint(self):
@@ -2,6 +2,7 @@
 """
 This module contains the search and replace panel
 """
+import bisect
 import re
 import sre_constants
 
@@ -9,11 +10,13 @@ from pyqode.qt import QtCore, QtGui, QtWidgets
 
 from pyqode.core import icons
 from pyqode.core._forms.search_panel_ui import Ui_SearchPanel
-from pyqode.core.api.decoration import TextDecoration
+from pyqode.core.api.decoration import DecorationPool, ViewportDecorations
 from pyqode.core.api.panel import Panel
-from pyqode.core.api.utils import DelayJobRunner, TextHelper
+from pyqode.core.api.snapshot import SnapshotCache
+from pyqode.core.api.utils import (
+    DelayJobRunner, TextHelper, is_format_change)
 from pyqode.core.backend import NotRunning
-from pyqode.core.backend.workers import findall
+from pyqode.core.backend.workers import findall, findalliter
 
 
 class SearchAndReplacePanel(Panel, Ui_SearchPanel):
@@ -29,6 +32,10 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
     client code may now navigate through occurrences using :meth:`select_next`
     or :meth:`select_previous`, or replace the occurrences with a specific
     text using :meth:`replace` or :meth:`replace_all`.
+
+    When :attr:`incremental` is True, the search results are kept up to date
+    while the document is being edited: only the modified region of the
+    document is searched again instead of the whole document.
     """
     STYLESHEET = """SearchAndReplacePanel
     {
@@ -83,13 +90,22 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
     #: Signal emitted when a search operation finished
     search_finished = QtCore.Signal()
 
-    #: Define the maximum number of occurences that can be highlighted
-    #: in the document.
-    #:
-    #: .. note:: The search operation itself is fast but the creation of all
-    #:    the extra selection used to highlight search result can be slow.
+    #: Deprecated, all the occurrences are now highlighted: text decorations
+    #: are only created for the visible occurrences (see
+    #: :class:`pyqode.core.api.ViewportDecorations`).
     MAX_HIGHLIGHTED_OCCURENCES = 500
 
+    #: Maximum number of characters an edit may insert or remove to be
+    #: handled incrementally, bigger changes (e.g. setPlainText) trigger a
+    #: full search.
+    MAX_INCREMENTAL_EDIT = 10000
+
+    #: Maximum length of a regular expression for incremental updates.
+    #: Searches based on a longer regular expression, or on a regular
+    #: expression whose matches may be longer than the pattern (e.g. ``\w+``),
+    #: are always performed on the whole document.
+    MAX_INCREMENTAL_SPAN = 1000
+
     @property
     def background(self):
         """ Text decoration background """
@@ -126,6 +142,29 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
                     # this should never happen since we're working with clones
                     pass
 
+    @property
+    def incremental(self):
+        """
+        Keeps the search results up to date while the document is being
+        edited by searching the edited region of the document only (instead
+        of running a new search on the whole document after every change).
+
+        Default is False.
+        """
+        return self._incremental
+
+    @incremental.setter
+    def incremental(self, value):
+        self._incremental = value
+        # propagate changes to every clone
+        if self.editor:
+            for clone in self.editor.clones:
+                try:
+                    clone.panels.get(self.__class__).incremental = value
+                except KeyError:
+                    # this should never happen since we're working with clones
+                    pass
+
     def __init__(self):
         Panel.__init__(self, dynamic=True)
         self.job_runner = DelayJobRunner(delay=500)
@@ -136,11 +175,19 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
         self.cpt_occurences = 0
         self._previous_stylesheet = ""
         self._separator = None
-        self._decorations = []
+        self._decorations = None
         self._occurrences = []
         self._current_occurrence_index = 0
         self._bg = None
         self._fg = None
+        self._incremental = False
+        self._search_pending = False
+        self._ignore_text_changes = False
+        # pattern of the last search request
+        self._sub = ''
+        # number of document changes, used to detect outdated search results
+        self._version = 0
+        self._search_version = 0
         self._update_buttons(txt="")
         self.lineEditSearch.installEventFilter(self)
         self.lineEditReplace.installEventFilter(self)
@@ -205,16 +252,20 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
         self._outline = QtGui.QPen(QtGui.QColor('gray'), 1)
 
     def on_install(self, editor):
+        self._decorations = ViewportDecorations(
+            editor, self._create_decoration, pool=DecorationPool())
         super(SearchAndReplacePanel, self).on_install(editor)
         self.hide()
         self.text_helper = TextHelper(editor)
 
+    def on_uninstall(self):
+        super(SearchAndReplacePanel, self).on_uninstall()
+        self._decorations.editor = None
+
     def _refresh_decorations(self):
-        for deco in self._decorations:
-            self.editor.decorations.remove(deco)
-            deco.set_background(QtGui.QBrush(self.background))
-            deco.set_outline(self._outline)
-            self.editor.decorations.append(deco)
+        if self._decorations is not None:
+            self._decorations.reset()
+            self._decorations.update(force=True)
 
     def on_state_changed(self, state):
         super(SearchAndReplacePanel, self).on_state_changed(state)
@@ -222,7 +273,11 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
             # menu
             self.editor.add_action(self.menu.menuAction())
             # requestSearch slot
-            self.editor.textChanged.connect(self.request_search)
+            self.editor.textChanged.connect(self._on_text_changed)
+            self.editor.document().contentsChange.connect(
+                self._on_contents_change)
+            if hasattr(self.editor, 'updateRequest'):
+                self.editor.updateRequest.connect(self._decorations.update)
             self.lineEditSearch.textChanged.connect(self.request_search)
             self.checkBoxCase.stateChanged.connect(self.request_search)
             self.checkBoxWholeWords.stateChanged.connect(self.request_search)
@@ -242,7 +297,11 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
         else:
             self.editor.remove_action(self.menu.menuAction())
             # requestSearch slot
-            self.editor.textChanged.disconnect(self.request_search)
+            self.editor.textChanged.disconnect(self._on_text_changed)
+            self.editor.document().contentsChange.disconnect(
+                self._on_contents_change)
+            if hasattr(self.editor, 'updateRequest'):
+                self.editor.updateRequest.disconnect(self._decorations.update)
             self.lineEditSearch.textChanged.disconnect(self.request_search)
             self.checkBoxCase.stateChanged.disconnect(self.request_search)
             self.checkBoxWholeWords.stateChanged.disconnect(
@@ -324,10 +383,14 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
 
         if txt is None or isinstance(txt, int):
             txt = self.lineEditSearch.text()
+        self._sub = txt
         if txt:
+            self._search_pending = True
+            self._decorations.invalidate()
             self.job_runner.request_job(
                 self._exec_search, txt, self._search_flags())
         else:
+            self._search_pending = False
             self.job_runner.cancel_requests()
             self._clear_occurrences()
             self._on_search_finished()
@@ -459,11 +522,7 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
             current_occurences = self._current_occurrence()
         try:
             # prevent search request due to editor textChanged
-            try:
-                self.editor.textChanged.disconnect(self.request_search)
-            except (RuntimeError, TypeError):
-                # already disconnected
-                pass
+            self._ignore_text_changes = True
             occ = occurrences[current_occurences]
             cursor = self.editor.textCursor()
             cursor.setPosition(occ[0])
@@ -474,6 +533,7 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
             cursor.insertText(text)
             self.editor.setTextCursor(cursor)
             self._remove_occurrence(current_occurences, offset)
+            self._decorations.set_ranges(self._occurrences)
             current_occurences -= 1
             self._set_current_occurrence(current_occurences)
             self.select_next()
@@ -484,21 +544,50 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
         except IndexError:
             return False
         finally:
-            self.editor.textChanged.connect(self.request_search)
+            self._ignore_text_changes = False
 
     def replace_all(self, text=None):
         """
         Replaces all occurrences in the editor's document.
 
+        All the occurrences are replaced in a single edit block (one undo
+        step), starting from the end of the document so that the positions
+        of the remaining occurrences stay valid.
+
         :param text: The replacement text. If None, the content of the lineEdit
                      replace will be used instead
         """
+        if text is None or isinstance(text, bool):
+            text = self.lineEditReplace.text()
+        occurrences = []
+        for start, end in self.get_occurences():
+            # overlapping occurrences cannot all be replaced, the first one
+            # wins (like str.replace).
+            if not occurrences or start >= occurrences[-1][1]:
+                occurrences.append((start, end))
+        if not occurrences:
+            return
+        # remove the decorations first, there is no need to have Qt update
+        # their cursors for each replacement.
+        self._clear_occurrences()
+        self._on_search_finished()
+        self._ignore_text_changes = True
         cursor = self.editor.textCursor()
-        cursor.beginEditBlock()
-        remains = self.replace(text=text)
-        while remains:
-            remains = self.replace(text=text)
-        cursor.endEditBlock()
+        last = None
+        try:
+            cursor.beginEditBlock()
+            for start, end in reversed(occurrences):
+                cursor.setPosition(start)
+                cursor.setPosition(end, cursor.KeepAnchor)
+                cursor.insertText(text)
+                if last is None:
+                    # Qt keeps this cursor up to date while we replace the
+                    # previous occurrences.
+                    last = QtGui.QTextCursor(cursor)
+            cursor.endEditBlock()
+        finally:
+            self._ignore_text_changes = False
+        self.editor.setTextCursor(last)
 
     def eventFilter(self, obj, event):
         if event.type() == QtCore.QEvent.KeyPress:
@@ -531,6 +620,11 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
                 self.checkBoxWholeWords.isChecked(),
                 self.checkBoxInSelection.isChecked())
 
+    def _snapshot(self):
+        # the panel can be used on a QTextEdit (see InteractiveConsole), which
+        # has no snapshot method
+        return SnapshotCache.get(self.editor.document()).snapshot()
+
     def _exec_search(self, sub, flags):
         if self.editor is None:
             return
@@ -541,8 +635,9 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
             text = tc.selectedText()
             self._offset = tc.selectionStart()
         else:
-            text = self.editor.toPlainText()
+            text = self._snapshot().text
             self._offset = 0
+        self._search_version = self._version
         request_data = {
             'string': text,
             'sub': sub,
@@ -559,10 +654,152 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
             QtCore.QTimer.singleShot(100, self.request_search)
 
     def _on_results_available(self, results):
+        if self._incremental and self._search_version != self._version:
+            # the document changed while searching, results are outdated.
+            self.request_search(self._sub)
+        else:
+            self._search_pending = False
         self._occurrences = [(start + self._offset, end + self._offset)
                              for start, end in results]
         self._on_search_finished()
 
+    def _on_text_changed(self):
+        if not self._ignore_text_changes and not self._incremental:
+            self.request_search()
+
+    def _on_contents_change(self, position, chars_removed, chars_added):
+        """
+        Updates the search results incrementally (see :attr:`incremental`).
+        """
+        if is_format_change(self.editor.document(), position, chars_removed,
+                            chars_added):
+            # e.g. syntax highlighting, the results are still valid
+            return
+        self._version += 1
+        if not self._incremental or self._ignore_text_changes:
+            return
+        sub = self._sub
+        if not sub:
+            return
+        regex, case_sensitive, whole_word, in_selection = \
+            self._search_flags()
+        span = self._max_span(sub, regex)
+        if (self._search_pending or in_selection or span is None or
+                max(chars_removed, chars_added) > self.MAX_INCREMENTAL_EDIT):
+            self.request_search(sub)
+            return
+        self._occurrences = self._update_occurrences(
+            self._occurrences, sub, regex, case_sensitive, whole_word, span,
+            position, chars_removed, chars_added)
+        self._on_search_finished()
+
+    def _max_span(self, sub, regex):
+        """
+        Returns the maximum number of characters that the search pattern may
+        need to examine to find an occurrence (including the characters
+        examined around the occurrence), or None if the span is unbounded or
+        too large to update the search results incrementally.
+
+        Only the regular expressions made of single characters, character
+        sets and escapes (no repetition, alternative or group) are handled
+        incrementally: their matches can't be longer than the pattern.
+        """
+        if regex:
+            if any(char in sub for char in '*+?{}|()'):
+                return None
+            try:
+                re.compile(sub)
+            except sre_constants.error:
+                return None
+            if not re.sub(r'\\[bBAZ]|[\^$]', '', sub):
+                # zero width pattern
+                return None
+            if len(sub) > self.MAX_INCREMENTAL_SPAN:
+                return None
+        return len(sub) + 1
+
+    def _update_occurrences(self, occurrences, sub, regex, case_sensitive,
+                            whole_word, span, position, chars_removed,
+                            chars_added):
+        """
+        Updates a list of occurrences after the document changed.
+
+        Only the lines around the edit are searched again: the search resumes
+        from the first occurrence that may be affected by the edit and stops
+        at the first line where the new search is back in sync with the
+        previous results (which are then simply shifted). The searched lines
+        are extended until such a line is found.
+
+        :param occurrences: previous list of occurrences
+        :param span: maximum number of characters examined by the search
+            pattern to find an occurrence (see :meth:`_max_span`).
+        :param position: position of the edit
+        :param chars_removed: number of characters removed at ``position``
+        :param chars_added: number of characters added at ``position``
+        :return: new list of occurrences
+        """
+        doc = self.editor.document()
+        offset = chars_added - chars_removed
+        edit_end = position + chars_added
+        # keep the occurrences that are not affected by the edit, the search
+        # resumes where the previous search was (not inside an occurrence).
+        # Occurrences are sorted tuples: (pos, ) sorts before any occurrence
+        # that starts at pos.
+        resume = max(0, position - span + 1)
+        i = bisect.bisect_left(occurrences, (resume, ))
+        if i and occurrences[i - 1][1] > resume:
+            i -= 1
+            resume = occurrences[i][0]
+        updated = occurrences[:i]
+        first_block = doc.findBlock(resume)
+        window_start = first_block.position()
+        extent = 2 * span
+        while True:
+            last_block = doc.findBlock(edit_end + extent)
+            if not last_block.isValid():
+                last_block = doc.lastBlock()
+            text = self._blocks_text(first_block, last_block)
+            window_end = window_start + len(text)
+            found = [(start + window_start, end + window_start)
+                     for start, end in findalliter(
+                         text, sub, regex=regex,
+                         case_sensitive=case_sensitive,
+                         whole_word=whole_word,
+                         start=resume - window_start)]
+            if not last_block.next().isValid():
+                return updated + found
+            # look for a line where both searches are in sync: the previous
+            # search was not inside an occurrence at the (shifted) start of
+            # the line, neither is the new one and the occurrences found
+            # before the line did not examine text outside of the window.
+            block = last_block
+            while block.position() > edit_end:
+                cut = block.position()
+                j = bisect.bisect_left(found, (cut, ))
+                k = bisect.bisect_left(occurrences, (cut - offset, ))
+                if (cut <= window_end - span + 1 and
+                        not (j and found[j - 1][1] > cut) and
+                        not (k and occurrences[k - 1][1] > cut - offset)):
+                    return updated + found[:j] + [
+                        (start + offset, end + offset)
+                        for start, end in occurrences[k:]]
+                block = block.previous()
+            extent *= 2
+
+    @staticmethod
+    def _blocks_text(first_block, last_block):
+        """
+        Returns the text of a range of blocks (joined with ``\\n``).
+        """
+        lines = []
+        block = first_block
+        while block.isValid():
+            lines.append(block.text())
+            if block.blockNumber() >= last_block.blockNumber():
+                break
+            block = block.next()
+        return '\n'.join(lines)
+
     def _update_label_matches(self):
         self.labelMatches.setText(_("{0} matches").format(self.cpt_occurences))
         color = "#DD0000"
@@ -573,14 +810,8 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
             self.labelMatches.clear()
 
     def _on_search_finished(self):
-        self._clear_decorations()
         all_occurences = self.get_occurences()
-        occurrences = all_occurences[:self.MAX_HIGHLIGHTED_OCCURENCES]
-        for i, occurrence in enumerate(occurrences):
-            deco = self._create_decoration(occurrence[0],
-                                           occurrence[1])
-            self._decorations.append(deco)
-            self.editor.decorations.append(deco)
+        self._decorations.set_ranges(all_occurences)
         self.cpt_occurences = len(all_occurences)
         if not self.cpt_occurences:
             self._current_occurrence_index = -1
@@ -598,8 +829,8 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
 
     def _create_decoration(self, selection_start, selection_end):
         """ Creates the text occurences decoration """
-        deco = TextDecoration(self.editor.document(), selection_start,
-                              selection_end)
+        deco = self._decorations.pool.acquire(
+            self.editor.document(), selection_start, selection_end)
         deco.set_background(QtGui.QBrush(self.background))
         deco.set_outline(self._outline)
         deco.set_foreground(QtCore.Qt.black)
@@ -608,9 +839,7 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
 
     def _clear_decorations(self):
         """ Remove all decorations """
-        for deco in self._decorations:
-            self.editor.decorations.remove(deco)
-        self._decorations[:] = []
+        self._decorations.clear()
 
     def _set_current_occurrence(self, current_occurence_index):
         self._current_occurrence_index = current_occurence_index
@@ -618,14 +847,8 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
     def _remove_occurrence(self, i, offset=0):
         self._occurrences.pop(i)
         if offset:
-            updated_occurences = []
-            for j, occ in enumerate(self._occurrences):
-                if j >= i:
-                    updated_occurences.append(
-                        (occ[0] + offset, occ[1] + offset))
-                else:
-                    updated_occurences.append((occ[0], occ[1]))
-            self._occurrences = updated_occurences
+            self._occurrences[i:] = [(start + offset, end + offset)
+                                     for start, end in self._occurrences[i:]]
 
     def _update_buttons(self, txt=""):
         enable = self.cpt_occurences > 1
@@ -641,3 +864,4 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
     def clone_settings(self, original):
         self.background = original.background
         self.foreground = original.foreground
+        self.incremental = original.incremental
@@ -11,7 +11,7 @@ pyqode applications:
       the compiler output,...
     - CodeEditTabWidget: tab widget made to handle CodeEdit instances (or
       any other object that have the same interface).
-    - ErrorsTable: a QTableWidget specialised to show CheckerMessage.
+    - ErrorsTable: a QTableView specialised to show CheckerMessage.
     - OutlineTreeWidget: a widget that show the outline of an editor.
 
 
@@ -19,7 +19,7 @@ pyqode applications:
 from pyqode.core.widgets.code_edits import TextCodeEdit, GenericCodeEdit
 from pyqode.core.widgets.encodings import (EncodingsComboBox, EncodingsMenu,
                                            EncodingsContextMenu)
-from pyqode.core.widgets.errors_table import ErrorsTable
+from pyqode.core.widgets.errors_table import ErrorsTable, ErrorsTableModel
 from pyqode.core.widgets.file_icons_provider import FileIconProvider
 from pyqode.core.widgets.interactive import InteractiveConsole  # Deprecated
 from pyqode.core.widgets.menu_recents import MenuRecentFiles
@@ -40,6 +40,7 @@ from pyqode.core.widgets.terminal import Terminal
 
 __all__ = [
     'ErrorsTable',
+    'ErrorsTableModel',
     'FileSystemContextMenu',
     'FileSystemTreeView',
     'InteractiveConsole',
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 """
-Contains a custom QTableWidget for easier displaying of CheckerMessages
+Contains a custom QTableView for easier displaying of CheckerMessages
 """
+import functools
+
 from pyqode.core.api.utils import memoized
 from pyqode.core.modes import CheckerMessage, CheckerMessages
 from pyqode.qt import QtCore, QtWidgets, QtGui
@@ -13,31 +15,425 @@ COL_LINE_NBR = 2
 COL_MSG = 3
 
 
-class ErrorsTable(QtWidgets.QTableWidget):
+def _load_icon(icon):
+    """
+    Make icon from icon filename/tuple (if you want to use a theme)
+    """
+    if isinstance(icon, tuple):
+        return QtGui.QIcon.fromTheme(
+            icon[0], QtGui.QIcon(icon[1]))
+    elif isinstance(icon, str):
+        return QtGui.QIcon(icon)
+    elif isinstance(icon, QtGui.QIcon):
+        return icon
+    else:
+        return None
+
+
+class _EmptyRow(object):
+    """
+    Placeholder of a row that does not hold any message (rows added by
+    :meth:`ErrorsTableModel.insertRows`).
+    """
+    __slots__ = ()
+
+
+class ErrorsTableModel(QtCore.QAbstractTableModel):
+    """
+    Table model of :class:`pyqode.core.modes.CheckerMessage`, used by
+    :class:`pyqode.core.widgets.ErrorsTable`.
+
+    The model does not create any item: the cells are computed on demand from
+    the messages, and the icons are shared by all the models. Messages can be
+    added in bulk (:meth:`add_messages`), sorting and filtering are done by
+    the model itself.
+
+    Empty rows can be inserted with :meth:`insertRows` and filled later with
+    :meth:`set_message`, like the rows of a QTableWidget.
     """
-    Extends a QtWidgets.QTableWidget to easily show
+    ICONS = {
+        CheckerMessages.INFO: ':pyqode-icons/rc/dialog-info.png',
+        CheckerMessages.WARNING: ':pyqode-icons/rc/dialog-warning.png',
+        CheckerMessages.ERROR: ':pyqode-icons/rc/dialog-error.png',
+    }
+
+    HEADERS = ["Type", "File name", "Line", "Description"]
+
+    #: Above this number of messages, the messages added to a sorted model
+    #: are sorted at once (one model reset) instead of being inserted one by
+    #: one at their sorted position.
+    MAX_SORTED_INSERTS = 16
+
+    def __init__(self, parent=None, icon_factory=None):
+        """
+        :param parent: parent object
+        :param icon_factory: function that returns the icon of a message
+            status, defaults to the icons of :attr:`ICONS`.
+        """
+        super(ErrorsTableModel, self).__init__(parent)
+        self._icon_factory = icon_factory or self._make_icon
+        self._headers = list(self.HEADERS)
+        # all the messages, in insertion order
+        self._messages = []
+        # the displayed messages (filtered and sorted)
+        self._rows = []
+        self._sort_column = -1
+        self._sort_order = QtCore.Qt.AscendingOrder
+        self._filter_text = ''
+        self._filter_statuses = None
+        # file names by path
+        self._file_names = {}
+
+    @classmethod
+    @memoized
+    def _make_icon(cls, status):
+        """
+        Make icon from icon filename/tuple (if you want to use a theme)
+        """
+        return _load_icon(cls.ICONS[status])
+
+    @property
+    def messages(self):
+        """
+        Returns the list of messages (including the filtered ones), in
+        insertion order.
+        """
+        return [msg for msg in self._messages
+                if not isinstance(msg, _EmptyRow)]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._headers)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if (role == QtCore.Qt.DisplayRole and
+                orientation == QtCore.Qt.Horizontal):
+            return self._headers[section]
+        return super(ErrorsTableModel, self).headerData(
+            section, orientation, role)
+
+    def flags(self, index):
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        msg = self._rows[index.row()]
+        if isinstance(msg, _EmptyRow):
+            return None
+        column = index.column()
+        if role == QtCore.Qt.DisplayRole:
+            if column == COL_TYPE:
+                return msg.status_string
+            elif column == COL_FILE_NAME:
+                return self._file_name(msg)
+            elif column == COL_LINE_NBR:
+                return '-' if msg.line < 0 else str(msg.line + 1)
+            elif column == COL_MSG:
+                return msg.description
+        elif role == QtCore.Qt.DecorationRole and column == COL_TYPE:
+            return self._icon_factory(msg.status)
+        elif role == QtCore.Qt.UserRole:
+            return msg
+        return None
+
+    def message(self, row):
+        """
+        Returns the message displayed at ``row`` (None for an empty row).
+        """
+        msg = self._rows[row]
+        return None if isinstance(msg, _EmptyRow) else msg
+
+    def set_message(self, row, msg):
+        """
+        Replaces the message displayed at ``row``.
+
+        If the model is sorted or filtered, the new message is moved to its
+        sorted position (or hidden).
+
+        :param row: displayed row
+        :param msg: the new message, None to empty the row.
+        """
+        old = self._rows[row]
+        new = _EmptyRow() if msg is None else msg
+        self._messages[self._position(old)] = new
+        if self._sort_column < 0 and self._accepts(new):
+            self._rows[row] = new
+            self.dataChanged.emit(
+                self.index(row, 0), self.index(row, self.columnCount() - 1))
+            return
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self._rows[row]
+        self.endRemoveRows()
+        if self._accepts(new):
+            self._insert_rows([new])
+
+    def insertRows(self, row, count, parent=QtCore.QModelIndex()):
+        """
+        Inserts ``count`` empty rows before ``row``.
+        """
+        if parent.isValid() or count < 1 or not 0 <= row <= len(self._rows):
+            return False
+        rows = [_EmptyRow() for _ in range(count)]
+        if row < len(self._rows):
+            position = self._position(self._rows[row])
+        else:
+            position = len(self._messages)
+        self._messages[position:position] = rows
+        self.beginInsertRows(parent, row, row + count - 1)
+        self._rows[row:row] = rows
+        self.endInsertRows()
+        return True
+
+    def removeRows(self, row, count, parent=QtCore.QModelIndex()):
+        """
+        Removes ``count`` displayed rows (and their messages), starting at
+        ``row``.
+        """
+        if (parent.isValid() or count < 1 or row < 0 or
+                row + count > len(self._rows)):
+            return False
+        removed = set(id(msg) for msg in self._rows[row:row + count])
+        self._messages = [msg for msg in self._messages
+                          if id(msg) not in removed]
+        self.beginRemoveRows(parent, row, row + count - 1)
+        del self._rows[row:row + count]
+        self.endRemoveRows()
+        return True
+
+    def clear_contents(self):
+        """
+        Removes all the messages but keeps the displayed rows (empty).
+        """
+        self.beginResetModel()
+        self._rows = [_EmptyRow() for _ in self._rows]
+        self._messages = list(self._rows)
+        self._file_names.clear()
+        self.endResetModel()
+
+    def set_headers(self, labels):
+        """
+        Changes the header labels. The number of columns does not change,
+        the missing labels are left to their default value.
+        """
+        count = len(self.HEADERS)
+        labels = list(labels)[:count]
+        self._headers = labels + self.HEADERS[len(labels):]
+        self.headerDataChanged.emit(QtCore.Qt.Horizontal, 0, count - 1)
+
+    def add_messages(self, messages):
+        """
+        Adds a list of messages to the model.
+
+        :param messages: list of pyqode.core.modes.CheckerMessage
+        """
+        messages = list(messages)
+        self._messages += messages
+        self._insert_rows([msg for msg in messages if self._accepts(msg)])
+
+    def clear(self):
+        """
+        Removes all the messages.
+        """
+        self.beginResetModel()
+        self._messages = []
+        self._rows = []
+        self._file_names.clear()
+        self.endResetModel()
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        """
+        Sorts the messages by ``column``. A negative column restores the
+        insertion order.
+        """
+        self._sort_column = column
+        self._sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        indexes = self.persistentIndexList()
+        messages = [(self._rows[index.row()], index.column())
+                    for index in indexes]
+        if column < 0:
+            self._rows = [msg for msg in self._messages if self._accepts(msg)]
+        else:
+            self._sort_rows()
+        rows = dict((id(msg), row) for row, msg in enumerate(self._rows))
+        self.changePersistentIndexList(indexes, [
+            self.index(rows[id(msg)], col) for msg, col in messages])
+        self.layoutChanged.emit()
+
+    def set_filter(self, text='', statuses=None):
+        """
+        Filters the displayed messages.
+
+        :param text: Only show the messages whose description or file name
+            contains ``text`` (case insensitive).
+        :param statuses: Only show the messages whose status is in this list
+            (None to show all statuses).
+        """
+        self._filter_text = text.lower() if text else ''
+        self._filter_statuses = (
+            None if statuses is None else frozenset(statuses))
+        self.beginResetModel()
+        self._rows = [msg for msg in self._messages if self._accepts(msg)]
+        if self._sort_column >= 0:
+            self._sort_rows()
+        self.endResetModel()
+
+    def _insert_rows(self, rows):
+        """
+        Displays ``rows`` (messages accepted by the filter): at the end in
+        insertion order, at their sorted position otherwise.
+        """
+        if not rows:
+            return
+        if self._sort_column < 0:
+            start = len(self._rows)
+            self.beginInsertRows(
+                QtCore.QModelIndex(), start, start + len(rows) - 1)
+            self._rows += rows
+            self.endInsertRows()
+        elif len(rows) <= self.MAX_SORTED_INSERTS:
+            for msg in rows:
+                row = self._sorted_position(msg)
+                self.beginInsertRows(QtCore.QModelIndex(), row, row)
+                self._rows.insert(row, msg)
+                self.endInsertRows()
+        else:
+            # the displayed rows are already sorted, timsort only has to
+            # sort the new rows and merge the two runs.
+            self.beginResetModel()
+            self._rows += rows
+            self._sort_rows()
+            self.endResetModel()
+
+    def _sorted_position(self, msg):
+        """
+        Returns the row where ``msg`` must be inserted to keep the rows
+        sorted (after the rows that compare equal, like a stable sort).
+        """
+        key = self._sort_key()
+        value = key(msg)
+        reverse = self._sort_order == QtCore.Qt.DescendingOrder
+        low, high = 0, len(self._rows)
+        while low < high:
+            middle = (low + high) // 2
+            other = key(self._rows[middle])
+            if (value > other) if reverse else (value < other):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def _position(self, msg):
+        """
+        Returns the position of ``msg`` in the list of messages.
+        """
+        for i, other in enumerate(self._messages):
+            if other is msg:
+                return i
+        raise ValueError('message not in the model')
+
+    def _accepts(self, msg):
+        if isinstance(msg, _EmptyRow):
+            return True
+        if (self._filter_statuses is not None and
+                msg.status not in self._filter_statuses):
+            return False
+        text = self._filter_text
+        return (not text or text in msg.description.lower() or
+                text in self._file_name(msg).lower())
+
+    def _file_name(self, msg):
+        try:
+            return self._file_names[msg.path]
+        except KeyError:
+            name = self._file_names[msg.path] = QtCore.QFileInfo(
+                msg.path).fileName() if msg.path else ''
+            return name
+
+    def _sort_key(self):
+        column = self._sort_column
+        if column == COL_TYPE:
+            key = lambda msg: msg.status
+        elif column == COL_FILE_NAME:
+            key = self._file_name
+        elif column == COL_LINE_NBR:
+            key = lambda msg: msg.line
+        else:
+            key = lambda msg: msg.description
+        # empty rows are kept together, after (or before if the order is
+        # descending) the messages
+        return lambda msg: ((1, 0) if isinstance(msg, _EmptyRow) else
+                            (0, key(msg)))
+
+    def _sort_rows(self):
+        self._rows.sort(key=self._sort_key(),
+                        reverse=self._sort_order == QtCore.Qt.DescendingOrder)
+
+
+class ErrorsTable(QtWidgets.QTableView):
+    """
+    Extends a QtWidgets.QTableView to easily show
     :class:`pyqode.core.modes.CheckerMessage`.
 
     You add messages to the table using
-    :meth:`pyqode.core.widgets.ErrorsTable.add_message`.
+    :meth:`pyqode.core.widgets.ErrorsTable.add_message` (or
+    :meth:`pyqode.core.widgets.ErrorsTable.add_messages` to add a lot of
+    messages at once).
 
     You clear the table using :meth:`pyqode.core.widgets.ErrorsTable`.
+
+    The messages are stored in a :class:`ErrorsTableModel`, which can
+    handle tens of thousands of messages.
+
+    The table keeps the item based API of the QTableWidget it used to be
+    (``item``, ``setItem``, ``setRowCount``, ``itemActivated``,...). The
+    items are built on demand from the model: modifying an item does not
+    modify the table, use :meth:`setItem` to replace the message of a row.
     """
     #: Signal emitted when a message is activated, the clicked signal is passed
     #: as a parameter
     msg_activated = QtCore.Signal(CheckerMessage)
 
-    ICONS = {
-        CheckerMessages.INFO: ':pyqode-icons/rc/dialog-info.png',
-        CheckerMessages.WARNING: ':pyqode-icons/rc/dialog-warning.png',
-        CheckerMessages.ERROR: ':pyqode-icons/rc/dialog-error.png',
-    }
+    # QTableWidget signals
+    itemActivated = QtCore.Signal(QtWidgets.QTableWidgetItem)
+    itemClicked = QtCore.Signal(QtWidgets.QTableWidgetItem)
+    itemDoubleClicked = QtCore.Signal(QtWidgets.QTableWidgetItem)
+    itemPressed = QtCore.Signal(QtWidgets.QTableWidgetItem)
+    itemEntered = QtCore.Signal(QtWidgets.QTableWidgetItem)
+    itemSelectionChanged = QtCore.Signal()
+    #: current item, previous item (QTableWidgetItem or None)
+    currentItemChanged = QtCore.Signal(object, object)
+    cellActivated = QtCore.Signal(int, int)
+    cellClicked = QtCore.Signal(int, int)
+    cellDoubleClicked = QtCore.Signal(int, int)
+    cellPressed = QtCore.Signal(int, int)
+    cellEntered = QtCore.Signal(int, int)
+    currentCellChanged = QtCore.Signal(int, int, int, int)
+
+    ICONS = ErrorsTableModel.ICONS
 
     def __init__(self, parent=None):
-        QtWidgets.QTableWidget.__init__(self, parent)
-        self.setColumnCount(6)
-        self.setHorizontalHeaderLabels(
-            ["Type", "File name", "Line", "Description", 'Details'])
+        QtWidgets.QTableView.__init__(self, parent)
+        self.setModel(ErrorsTableModel(self, icon_factory=self._make_icon))
+        for signal, item_signal, cell_signal in (
+                (self.activated, self.itemActivated, self.cellActivated),
+                (self.clicked, self.itemClicked, self.cellClicked),
+                (self.doubleClicked, self.itemDoubleClicked,
+                 self.cellDoubleClicked),
+                (self.pressed, self.itemPressed, self.cellPressed),
+                (self.entered, self.itemEntered, self.cellEntered)):
+            signal.connect(functools.partial(
+                self._emit_item_signals, item_signal, cell_signal))
+        self.selectionModel().currentChanged.connect(self._on_current_changed)
+        self.selectionModel().selectionChanged.connect(
+            self.itemSelectionChanged.emit)
         try:
             # pyqt4
             self.horizontalHeader().setResizeMode(
@@ -50,6 +446,10 @@ class ErrorsTable(QtWidgets.QTableWidget):
                 QtWidgets.QHeaderView.ResizeToContents)
             self.horizontalHeader().setSectionResizeMode(
                 COL_MSG, QtWidgets.QHeaderView.Stretch)
+        # keep the insertion order until the user clicks on a header
+        self.horizontalHeader().setSortIndicator(
+            -1, QtCore.Qt.AscendingOrder)
+        self.setSortingEnabled(True)
         self.setMinimumSize(900, 200)
         self.itemActivated.connect(self._on_item_activated)
         self.setSelectionMode(self.SingleSelection)
@@ -69,7 +469,7 @@ class ErrorsTable(QtWidgets.QTableWidget):
         """
         Copies the description of the selected message to the clipboard
         """
-        txt = self.currentItem().text()
+        txt = self.currentIndex().data()
         QtWidgets.QApplication.clipboard().setText(txt)
 
     def _show_context_menu(self, pos):
@@ -80,11 +480,147 @@ class ErrorsTable(QtWidgets.QTableWidget):
         """
         Clears the tables and the message list
         """
-        QtWidgets.QTableWidget.clear(self)
-        self.setRowCount(0)
-        self.setColumnCount(4)
-        self.setHorizontalHeaderLabels(
-            ["Type", "File name", "Line", "Description"])
+        self.model().clear()
+
+    def rowCount(self):
+        """
+        Returns the number of displayed messages.
+        """
+        return self.model().rowCount()
+
+    def columnCount(self):
+        """
+        Returns the number of columns.
+        """
+        return self.model().columnCount()
+
+    def setRowCount(self, rows):
+        """
+        Sets the number of displayed rows: the last rows are removed, or
+        empty rows are appended.
+        """
+        count = self.rowCount()
+        if rows < count:
+            self.model().removeRows(rows, count - rows)
+        elif rows > count:
+            self.model().insertRows(count, rows - count)
+
+    def insertRow(self, row):
+        """
+        Inserts an empty row before ``row``.
+        """
+        self.model().insertRows(row, 1)
+
+    def removeRow(self, row):
+        """
+        Removes ``row`` and its message.
+        """
+        self.model().removeRows(row, 1)
+
+    def clearContents(self):
+        """
+        Removes the messages but keeps the rows.
+        """
+        self.model().clear_contents()
+
+    def setHorizontalHeaderLabels(self, labels):
+        """
+        Changes the header labels.
+        """
+        self.model().set_headers(labels)
+
+    def item(self, row, column):
+        """
+        Returns the item of a cell (None if the row is empty).
+        """
+        return self.itemFromIndex(self.model().index(row, column))
+
+    def itemAt(self, *args):
+        """
+        Returns the item at a position (QPoint or x, y).
+        """
+        point = QtCore.QPoint(*args) if len(args) == 2 else args[0]
+        return self.itemFromIndex(self.indexAt(point))
+
+    def itemFromIndex(self, index):
+        """
+        Builds the item of a model index: a QTableWidgetItem with the cell
+        text and icon, the message is stored in the ``QtCore.Qt.UserRole``
+        data.
+
+        Returns None if the index is invalid or if its row is empty.
+        """
+        msg = index.data(QtCore.Qt.UserRole) if index.isValid() else None
+        if msg is None:
+            return None
+        item = QtWidgets.QTableWidgetItem(index.data() or '')
+        icon = index.data(QtCore.Qt.DecorationRole)
+        if icon is not None:
+            item.setIcon(icon)
+        item.setFlags(self.model().flags(index))
+        item.setData(QtCore.Qt.UserRole, msg)
+        return item
+
+    def setItem(self, row, column, item):
+        """
+        Sets the message of ``row`` from an item that holds a
+        :class:`pyqode.core.modes.CheckerMessage` in its
+        ``QtCore.Qt.UserRole`` data. The whole row displays the message,
+        whatever the column.
+        """
+        msg = item.data(QtCore.Qt.UserRole)
+        if not isinstance(msg, CheckerMessage):
+            raise ValueError('the item data (QtCore.Qt.UserRole) must be a '
+                             'CheckerMessage')
+        self.model().set_message(row, msg)
+
+    def takeItem(self, row, column):
+        """
+        Removes the message of ``row`` and returns its item, the row is left
+        empty.
+        """
+        item = self.item(row, column)
+        if item is not None:
+            self.model().set_message(row, None)
+        return item
+
+    def currentItem(self):
+        """
+        Returns the item of the current cell.
+        """
+        return self.itemFromIndex(self.currentIndex())
+
+    def currentRow(self):
+        """
+        Returns the current row (-1 if there is no current cell).
+        """
+        return self.currentIndex().row()
+
+    def currentColumn(self):
+        """
+        Returns the current column (-1 if there is no current cell).
+        """
+        return self.currentIndex().column()
+
+    def setCurrentCell(self, row, column):
+        """
+        Makes the cell at ``row``, ``column`` the current cell.
+        """
+        self.setCurrentIndex(self.model().index(row, column))
+
+    def selectedItems(self):
+        """
+        Returns the items of the selected cells.
+        """
+        items = [self.itemFromIndex(index)
+                 for index in self.selectedIndexes()]
+        return [item for item in items if item is not None]
+
+    def sortItems(self, column, order=QtCore.Qt.AscendingOrder):
+        """
+        Sorts the rows by ``column``.
+        """
+        self.sortByColumn(column, order)
 
     @classmethod
     @memoized
@@ -92,16 +628,27 @@ class ErrorsTable(QtWidgets.QTableWidget):
         """
         Make icon from icon filename/tuple (if you want to use a theme)
         """
-        icon = cls.ICONS[status]
-        if isinstance(icon, tuple):
-            return QtGui.QIcon.fromTheme(
-                icon[0], QtGui.QIcon(icon[1]))
-        elif isinstance(icon, str):
-            return QtGui.QIcon(icon)
-        elif isinstance(icon, QtGui.QIcon):
-            return icon
-        else:
-            return None
+        return _load_icon(cls.ICONS[status])
+
+    def _emit_item_signals(self, item_signal, cell_signal, index):
+        """
+        Emits the QTableWidget signals of an index signal (activated,
+        clicked,...)
+        """
+        item = self.itemFromIndex(index)
+        if item is not None:
+            item_signal.emit(item)
+        cell_signal.emit(index.row(), index.column())
+
+    def _on_current_changed(self, current, previous):
+        """
+        Emits the QTableWidget current item/cell signals
+        """
+        self.currentItemChanged.emit(
+            self.itemFromIndex(current), self.itemFromIndex(previous))
+        self.currentCellChanged.emit(
+            current.row(), current.column(), previous.row(),
+            previous.column())
 
     def add_message(self, msg):
         """
@@ -110,37 +657,23 @@ class ErrorsTable(QtWidgets.QTableWidget):
         :param msg: The message to append
         :type msg: pyqode.core.modes.CheckerMessage
         """
-        row = self.rowCount()
-        self.insertRow(row)
-
-        # type
-        item = QtWidgets.QTableWidgetItem(
-            self._make_icon(msg.status), msg.status_string)
-        item.setFlags(QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable)
-        item.setData(QtCore.Qt.UserRole, msg)
-        self.setItem(row, COL_TYPE, item)
+        self.model().add_messages([msg])
 
-        # filename
-        item = QtWidgets.QTableWidgetItem(
-            QtCore.QFileInfo(msg.path).fileName())
-        item.setFlags(QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable)
-        item.setData(QtCore.Qt.UserRole, msg)
-        self.setItem(row, COL_FILE_NAME, item)
+    def add_messages(self, messages):
+        """
+        Adds a list of checker messages to the table, at once.
 
-        # line
-        if msg.line < 0:
-            item = QtWidgets.QTableWidgetItem("-")
-        else:
-            item = QtWidgets.QTableWidgetItem(str(msg.line + 1))
-        item.setFlags(QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable)
-        item.setData(QtCore.Qt.UserRole, msg)
-        self.setItem(row, COL_LINE_NBR, item)
+        :param messages: The messages to append
+        :type messages: list of pyqode.core.modes.CheckerMessage
+        """
+        self.model().add_messages(messages)
 
-        # desc
-        item = QtWidgets.QTableWidgetItem(msg.description)
-        item.setFlags(QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable)
-        item.setData(QtCore.Qt.UserRole, msg)
-        self.setItem(row, COL_MSG, item)
+    def set_filter(self, text='', statuses=None):
+        """
+        Filters the displayed messages, see
+        :meth:`pyqode.core.widgets.ErrorsTableModel.set_filter`.
+        """
+        self.model().set_filter(text, statuses)
 
     def _on_item_activated(self, item):
         """
@@ -153,7 +686,9 @@ class ErrorsTable(QtWidgets.QTableWidget):
         """
         Shows the error details.
         """
-        msg = self.currentItem().data(QtCore.Qt.UserRole)
+        msg = self.currentIndex().data(QtCore.Qt.UserRole)
+        if msg is None:
+            return
         desc = msg.description
         desc = desc.replace('\r\n', '\n').replace('\r', '\n')
         desc = desc.replace('\n', '<br/>')
@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+"""
+Headless benchmark of the pygments syntax highlighter.
+
+The benchmark runs on the offscreen Qt platform (no display needed) and times
+:class:`pyqode.core.modes.PygmentsSH` on synthetic corpora (and on real
+corpora: the pyqode sources and any file given with ``--file``) of various
+sizes, for the most common lexers.
+
+For each corpus, the following operations are measured:
+
+    - full rehighlight of the document (reported in lines/sec)
+    - single character edit (insert + remove) in the middle of the document
+    - insertion and removal of a multiline comment opener at the top of the
+      document (the worst case: every block below the edit changes state)
+
+Edit timings are reported as median and worst case latency, in
+milliseconds. Use ``--json`` to get machine readable results that can be
+compared between two revisions to spot regressions.
+
+Usage::
+
+    python scripts/benchmark_highlighting.py
+    python scripts/benchmark_highlighting.py --sizes 1000,200000 --lexers python
+    python scripts/benchmark_highlighting.py --file /path/to/big_file.c
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..')))
+
+from pyqode.qt import QtGui, QtWidgets  # noqa: E402
+from pyqode.core.api import CodeEdit  # noqa: E402
+from pyqode.core.modes import PygmentsSH  # noqa: E402
+
+
+#: Synthetic corpora: mime type, snippet repeated to reach the requested
+#: size, multiline comment opener.
+LEXERS = {
+    'python': ('text/x-python', '''\
+class Foo%(i)d(object):
+    """
+    Docstring of class %(i)d.
+    """
+    def bar(self, arg=%(i)d):
+        # comment
+        value = 'string %%s' %% arg
+        if value and arg > 0x%(i)x:
+            return [x ** 2 for x in range(arg)]
+        return None
+
+''', '"""'),
+    'c': ('text/x-c', '''\
+/* Function number %(i)d */
+static int foo_%(i)d(const char *str, int arg)
+{
+    // comment
+    int value = %(i)d;
+    if (str != NULL && arg > 0x%(i)x) {
+        printf("string %%s\\n", str);
+        return value * arg;
+    }
+    return 0;
+}
+
+''', '/*'),
+    'cpp': ('text/x-c++src', '''\
+/* Class number %(i)d */
+template <typename T>
+class Foo%(i)d : public Base {
+public:
+    // comment
+    explicit Foo%(i)d(const std::string &str) : m_value(%(i)d) {
+        std::cout << "string " << str << std::endl;
+    }
+    virtual ~Foo%(i)d() = default;
+private:
+    T m_value;
+};
+
+''', '/*'),
+    'javascript': ('application/javascript', '''\
+/* Function number %(i)d */
+function foo%(i)d(str, arg) {
+    // comment
+    var value = %(i)d;
+    if (str !== null && arg > 0x%(i)x) {
+        console.log('string ' + str);
+        return value * arg;
+    }
+    return [1, 2, 3].map(function (x) { return x * 2; });
+}
+
+''', '/*'),
+    'html': ('text/html', '''\
+<!-- Section number %(i)d -->
+<div class="section" id="section-%(i)d">
+    <h1>Title %(i)d</h1>
+    <p>Some <b>bold</b> and <i>italic</i> text &amp; an entity.</p>
+    <a href="http://example.com/%(i)d">link</a>
+    <script type="text/javascript">var x = %(i)d;</script>
+</div>
+
+''', '<!--'),
+}
+
+#: Number of times each edit is repeated.
+EDIT_REPEAT = 10
+
+
+def synthetic_text(snippet, nb_lines):
+    """
+    Builds a synthetic corpus by repeating ``snippet`` until the corpus has
+    ``nb_lines`` lines.
+    """
+    lines = []
+    i = 0
+    while len(lines) < nb_lines:
+        lines += (snippet % {'i': i}).splitlines()
+        i += 1
+    return '\n'.join(lines[:nb_lines])
+
+
+def real_text(paths, nb_lines):
+    """
+    Builds a real corpus by concatenating the content of ``paths`` until the
+    corpus has ``nb_lines`` lines.
+    """
+    contents = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            contents += f.read().decode('utf-8', 'replace').splitlines()
+    if not contents:
+        return ''
+    lines = []
+    while len(lines) < nb_lines:
+        lines += contents
+    return '\n'.join(lines[:nb_lines])
+
+
+def pyqode_sources():
+    """
+    Returns the list of python files of the pyqode package, used as a real
+    python corpus.
+    """
+    root = os.path.join(os.path.dirname(__file__), '..', 'pyqode')
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            if filename.endswith('.py') and not filename.endswith('_rc.py'):
+                paths.append(os.path.join(dirpath, filename))
+    return sorted(paths)
+
+
+def process_events():
+    QtWidgets.QApplication.processEvents()
+
+
+def create_editor(mime_type=None, filename=None, threaded=False):
+    editor = CodeEdit()
+    editor.resize(800, 600)
+    sh = editor.modes.append(PygmentsSH(editor.document()))
+    # keep the measures deterministic: lexing in the worker thread would
+    # only be waited for by the benchmark.
+    sh.threaded_tokenization = threaded
+    if filename:
+        sh.set_lexer_from_filename(filename)
+    else:
+        sh.set_mime_type(mime_type)
+    editor.show()
+    process_events()
+    return editor, sh
+
+
+def time_edit(editor, position, text):
+    """
+    Inserts ``text`` at ``position`` then removes it, returns the latency of
+    both operations (in seconds).
+    """
+    cursor = editor.textCursor()
+    cursor.setPosition(position)
+    start = time.time()
+    cursor.insertText(text)
+    process_events()
+    insert = time.time() - start
+    cursor.setPosition(position)
+    cursor.setPosition(position + len(text), cursor.KeepAnchor)
+    start = time.time()
+    cursor.removeSelectedText()
+    process_events()
+    remove = time.time() - start
+    return insert, remove
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def run(name, text, comment_opener, mime_type=None, filename=None,
+        threaded=False):
+    editor, sh = create_editor(mime_type, filename, threaded)
+    try:
+        editor.setPlainText(text, mime_type or '', 'utf-8')
+        process_events()
+        doc = editor.document()
+        nb_lines = doc.blockCount()
+
+        # setPlainText started a background rehighlight of the big
+        # documents, it would run between (and be timed with) the edits
+        # below. The full rehighlight highlights every block anyway.
+        sh.cancel_rehighlight()
+
+        # full rehighlight, without the help of the token cache and
+        # synchronously (no background pass)
+        sh._token_cache.clear()
+        start = time.time()
+        QtGui.QSyntaxHighlighter.rehighlight(sh)
+        full = time.time() - start
+        process_events()
+        assert not sh.is_rehighlighting()
+
+        position = doc.findBlockByNumber(nb_lines // 2).position()
+        char_edits = []
+        for _ in range(EDIT_REPEAT):
+            char_edits += time_edit(editor, position, 'x')
+
+        comment_edits = []
+        for _ in range(EDIT_REPEAT):
+            comment_edits += time_edit(editor, 0, comment_opener + '\n')
+    finally:
+        sh.cancel_rehighlight()
+        editor.close()
+        del editor
+        process_events()
+    return {
+        'corpus': name,
+        'lines': nb_lines,
+        'full_rehighlight_s': full,
+        'lines_per_sec': nb_lines / full if full else float('inf'),
+        'char_edit_median_ms': median(char_edits) * 1000,
+        'char_edit_worst_ms': max(char_edits) * 1000,
+        'comment_edit_median_ms': median(comment_edits) * 1000,
+        'comment_edit_worst_ms': max(comment_edits) * 1000,
+    }
+
+
+def print_results(results):
+    header = ('%-28s %8s %12s %10s %10s %10s %10s' % (
+        'corpus', 'lines', 'lines/sec', 'char med', 'char max',
+        'cmt med', 'cmt max'))
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print('%-28s %8d %12.0f %10.2f %10.2f %10.2f %10.2f' % (
+            r['corpus'], r['lines'], r['lines_per_sec'],
+            r['char_edit_median_ms'], r['char_edit_worst_ms'],
+            r['comment_edit_median_ms'], r['comment_edit_worst_ms']))
+    print('\n(edit latencies in ms)')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the pygments syntax highlighter.')
+    parser.add_argument(
+        '--sizes', default='1000,10000,50000,200000',
+        help='comma separated list of corpus sizes, in lines')
+    parser.add_argument(
+        '--lexers', default=','.join(sorted(LEXERS.keys())),
+        help='comma separated list of synthetic corpora to run (%s)' %
+        ', '.join(sorted(LEXERS.keys())))
+    parser.add_argument(
+        '--file', action='append', default=[],
+        help='add a real corpus (the lexer is guessed from the file name)')
+    parser.add_argument(
+        '--comment', default='/*',
+        help='multiline comment opener of the files given with --file')
+    parser.add_argument(
+        '--no-sources', action='store_true',
+        help='do not use the pyqode sources as a real python corpus')
+    parser.add_argument(
+        '--threaded', action='store_true',
+        help='tokenize in the worker thread, as the editor does by default')
+    parser.add_argument(
+        '--json', action='store_true', help='print the results as json')
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv)
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    results = []
+    for size in sizes:
+        for lexer in args.lexers.split(','):
+            if not lexer:
+                continue
+            mime_type, snippet, opener = LEXERS[lexer]
+            results.append(run(
+                '%s (synthetic)' % lexer, synthetic_text(snippet, size),
+                opener, mime_type=mime_type, threaded=args.threaded))
+        if not args.no_sources:
+            results.append(run(
+                'python (pyqode sources)',
+                real_text(pyqode_sources(), size), LEXERS['python'][2],
+                mime_type=LEXERS['python'][0], threaded=args.threaded))
+        for path in args.file:
+            results.append(run(
+                os.path.basename(path), real_text([path], size),
+                args.comment,
+                filename=path, threaded=args.threaded))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+    del app
+
+
+if __name__ == '__main__':
+    main()
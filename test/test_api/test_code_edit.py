@@ -402,3 +402,26 @@ Line 3''', '', '')
     editor.select_line_on_copy_empty = True
     editor.copy()
     assert editor.textCursor().hasSelection()
+
+
+@editor_open(__file__)
+def test_snapshot(editor):
+    snapshot = editor.snapshot()
+    assert snapshot.text == editor.toPlainText()
+    # the snapshot is shared until the text changes
+    assert editor.snapshot() is snapshot
+    editor.rehighlight()
+    assert editor.snapshot() is snapshot
+    doc = editor.document()
+    assert snapshot.line_count == doc.blockCount()
+    assert snapshot.line(10) == doc.findBlockByNumber(10).text()
+    position = doc.findBlockByNumber(10).position() + 2
+    assert snapshot.position(10, 2) == position
+    assert snapshot.line_and_column(position) == (10, 2)
+    TextHelper(editor).insert_text('foo')
+    new_snapshot = editor.snapshot()
+    assert new_snapshot is not snapshot
+    assert new_snapshot.revision > snapshot.revision
+    assert new_snapshot.text == editor.toPlainText()
+    # old snapshots are immutable
+    assert snapshot.text != new_snapshot.text
@@ -3,7 +3,8 @@
 This module tests the extension frontend module
 (pyqode.core.api.decoration and pyqode.core.managers.TextDecorationManager)
 """
-from pyqode.core.api import TextHelper, TextDecoration
+from pyqode.core.api import (
+    DecorationPool, TextHelper, TextDecoration, ViewportDecorations)
 from pyqode.qt import QtGui
 from ..helpers import editor_open
 
@@ -74,3 +75,106 @@ def test_formats(editor):
     deco.set_as_error(QtGui.QColor('#FF0000'))
     deco.set_as_error()
     deco.set_as_warning()
+
+
+@editor_open(__file__)
+def test_viewport_decorations(editor):
+    def factory(start, end):
+        return TextDecoration(editor.document(), start, end)
+
+    ranges = []
+    block = editor.document().firstBlock()
+    while block.isValid():
+        ranges.append((block.position(), block.position() + 1))
+        block = block.next()
+    decorations = ViewportDecorations(editor, factory, margin=0)
+    decorations.set_ranges(ranges)
+    # only the visible ranges are decorated
+    assert 0 < len(decorations) < len(ranges)
+    for deco in decorations:
+        assert deco in editor.decorations
+    decorations.invalidate()
+    assert decorations.ranges is None
+    created = list(decorations)
+    decorations.clear()
+    assert len(decorations) == 0
+    for deco in created:
+        assert deco not in editor.decorations
+
+
+@editor_open(__file__)
+def test_decorations_batch(editor):
+    # start without the decorations left by the modes or the previous tests
+    editor.decorations.clear()
+    decos = [TextDecoration(editor.document(), start_line=i, end_line=i + 1,
+                            draw_order=i % 3) for i in range(30)]
+    assert editor.decorations.append_many(decos) == 30
+    assert editor.decorations.append_many(decos[:10]) == 0
+    # sorted by draw order, insertion order is kept for equal draw orders
+    orders = [deco.draw_order for deco in editor.decorations]
+    assert orders == sorted(orders)
+    assert list(editor.decorations)[:10] == decos[::3]
+    assert len(editor.extraSelections()) == 30
+    assert editor.decorations.remove_many(decos[:10]) == 10
+    assert decos[0] not in editor.decorations
+    assert decos[10] in editor.decorations
+    with editor.decorations.transaction():
+        editor.decorations.remove(decos[10])
+        editor.decorations.append(decos[0])
+        # the editor is updated when the transaction ends
+        assert len(editor.extraSelections()) == 20
+    assert len(editor.extraSelections()) == 20
+    # appended after the decorations that have the same draw order
+    assert list(editor.decorations)[6] is decos[0]
+    editor.decorations.clear()
+    assert len(editor.extraSelections()) == 0
+
+
+@editor_open(__file__)
+def test_decorations_culling(editor):
+    editor.decorations.CULLING_THRESHOLD = 10
+    editor.decorations.CULLING_MARGIN = 0
+    # start without the decorations left by the modes or the previous tests
+    editor.decorations.clear()
+    try:
+        decos = []
+        block = editor.document().firstBlock()
+        while block.isValid():
+            decos.append(TextDecoration(block))
+            block = block.next()
+        editor.decorations.append_many(decos)
+        assert len(editor.decorations) == len(decos)
+        # only the decorations of the visible lines are handed to the editor
+        selections = editor.extraSelections()
+        assert 0 < len(selections) < len(decos)
+        first = editor.firstVisibleBlock().blockNumber()
+        assert selections[0].cursor.blockNumber() == first
+        editor.decorations.culling = False
+        editor.decorations.remove(decos[0])
+        assert len(editor.extraSelections()) == len(decos) - 1
+    finally:
+        editor.decorations.clear()
+        editor.decorations.culling = True
+        del editor.decorations.CULLING_THRESHOLD
+        del editor.decorations.CULLING_MARGIN
+
+
+@editor_open(__file__)
+def test_decoration_pool(editor):
+    pool = DecorationPool(max_size=1)
+    deco = pool.acquire(editor.document(), 0, 5, draw_order=2)
+    assert deco.cursor.selectedText() == editor.toPlainText()[:5]
+    deco.set_background(QtGui.QBrush(QtGui.QColor('#FF0000')))
+    pool.release([deco, TextDecoration(editor.document())])
+    assert len(pool) == 1
+    # released decorations are reset and reused
+    reused = pool.acquire(editor.document(), 10, 12)
+    assert reused is deco
+    assert reused.draw_order == 0
+    assert reused.cursor.selectionStart() == 10
+    assert reused.cursor.selectionEnd() == 12
+    assert not reused.format.hasProperty(QtGui.QTextFormat.BackgroundBrush)
+    # decorations whose signals were used are not reused
+    reused.signals.clicked.connect(lambda deco: None)
+    pool.release([reused])
+    assert len(pool) == 0
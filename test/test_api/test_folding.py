@@ -4,6 +4,7 @@ import pytest
 import sys
 from ..helpers import delete_file_on_return, editor_open
 from pyqode.core.api import folding, TextBlockHelper, TextHelper
+from pyqode.qt import QtGui
 from pyqode.qt.QtTest import QTest
 
 
@@ -53,6 +54,16 @@ def test_base_fold_indenter():
         f.detect_fold_level(None, None)
 
 
+def test_fold_detector_index_cache(editor):
+    detector = editor.syntax_highlighter.fold_detector
+    index = folding.FoldIndex.get(editor.document())
+    assert detector._get_fold_index(editor.document()) is index
+    # the cached index is refreshed when the document changes
+    doc = QtGui.QTextDocument()
+    assert detector._get_fold_index(doc) is folding.FoldIndex.get(doc)
+    assert detector._get_fold_index(editor.document()) is index
+
+
 class DynamicFoldDetectorTestCase(object):
     """
     A dynamic test consists in loading a file and performing a few predefined
@@ -178,3 +189,39 @@ class DynamicFoldDetectorTestCase(object):
 ])
 def test_fold_detection_dynamic(editor, case):
     case.execute(editor)
+
+
+@editor_open('test/test_api/folding_cases/foo.py')
+def test_fold_index(editor, monkeypatch):
+    index = folding.FoldIndex.get(editor.document())
+    assert folding.FoldIndex.get(editor.document()) is index
+    # use tiny chunks, so that the edits below split and merge them
+    monkeypatch.setattr(index, 'CHUNK_SIZE', 4, raising=False)
+    index.invalidate()
+    assert index.get_range(8) == (8, 27)
+    # the index is updated incrementally from now on
+    monkeypatch.setattr(index, '_build', lambda: pytest.fail('rebuilt'))
+    assert index.get_range(8, ignore_blank_lines=False) == (8, 28)
+    assert index.child_regions(8) == [14, 23]
+    assert index.parent(8) is None
+    assert index.parent(19) == 18
+    assert index.find_parent_scope(20) == 19
+    assert index.find_parent_scope(4) == 0
+    # insert two lines at the top of the document, the index must follow
+    tc = editor.textCursor()
+    tc.movePosition(tc.Start)
+    tc.insertText('\n\n')
+    assert index.get_range(10) == (10, 29)
+    assert index.child_regions(10) == [16, 25]
+    assert index.parent(21) == 20
+    assert index.find_parent_scope(22) == 21
+    # remove the class attribute line
+    tc.setPosition(editor.document().findBlockByNumber(14).position())
+    tc.movePosition(tc.Down, tc.KeepAnchor)
+    tc.removeSelectedText()
+    assert index.get_range(10) == (10, 28)
+    assert index.child_regions(10) == [15, 24]
+    # the FoldScope API uses the index
+    scope = folding.FoldScope(editor.document().findBlockByNumber(20))
+    assert scope.get_range() == (20, 21)
+    assert scope.parent().get_range() == (19, 21)
@@ -31,3 +31,24 @@ def test_cached_encodings():
     s.set_file_encoding(__file__, 'utf_16')
     s = Cache(suffix='-pytest')
     assert s.get_file_encoding(__file__) == 'utf_16'
+
+
+def test_cached_lexer_classes():
+    s = Cache(suffix='-pytest')
+    s.clear()
+    assert s.get_lexer_class('filename:*.py') is None
+    s.set_lexer_class('filename:*.py', 'pygments.lexers.python:PythonLexer')
+    s = Cache(suffix='-pytest')
+    assert s.get_lexer_class('filename:*.py') == \
+        'pygments.lexers.python:PythonLexer'
+
+
+def test_cached_fold_state():
+    s = Cache(suffix='-pytest')
+    s.clear()
+    assert s.get_fold_state(__file__) == ([], None)
+    s.set_fold_state(__file__, [3, 12], 'b80f965c')
+    s = Cache(suffix='-pytest')
+    assert s.get_fold_state(__file__) == ([3, 12], 'b80f965c')
+    s.set_fold_state(__file__, [], None)
+    assert s.get_fold_state(__file__) == ([], None)
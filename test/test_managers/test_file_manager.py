@@ -2,6 +2,7 @@
 import os
 import pytest
 from pyqode.core import panels
+from pyqode.core.api import FoldIndex
 from pyqode.core.managers import FileManager
 from pyqode.qt.QtTest import QTest
 
@@ -47,6 +48,53 @@ def test_close(editor):
     assert editor.file.mimetype == ''
 
 
+def test_restore_folding(editor):
+    path = os.path.join(os.getcwd(), 'test', 'test_api', 'folding_cases',
+                        'foo.py')
+    editor.file.open(path)
+    QTest.qWait(100)
+    panel = editor.panels.get(panels.FoldingPanel)
+    panel.fold_triggers([14, 18])
+    editor.file.close()
+    editor.file.open(path)
+    QTest.qWait(100)
+    doc = editor.document()
+    assert FoldIndex.get(doc).collapsed_triggers() == [14, 18]
+    assert doc.findBlockByNumber(14).isVisible()
+    assert not doc.findBlockByNumber(15).isVisible()
+    panel.expand_all()
+    editor.file.close()
+    editor.file.open(path)
+    QTest.qWait(100)
+    assert FoldIndex.get(editor.document()).collapsed_triggers() == []
+
+
+def test_restore_folding_cancelled(editor, monkeypatch):
+    path = os.path.join(os.getcwd(), 'test', 'test_api', 'folding_cases',
+                        'foo.py')
+    editor.file.open(path)
+    QTest.qWait(100)
+    panel = editor.panels.get(panels.FoldingPanel)
+    panel.fold_triggers([14, 18])
+    editor.file.close()
+    editor.file.open(path)
+    # the fold levels are known as soon as the text is set
+    assert FoldIndex.get(editor.document()).collapsed_triggers() == [14, 18]
+    panel.expand_all()
+    # fold levels not known yet: wait for the rehighlight, which gets
+    # cancelled
+    highlighter = editor.syntax_highlighter
+    monkeypatch.setattr(highlighter, 'is_rehighlighting', lambda: True)
+    editor.document().lastBlock().setUserState(-1)
+    editor.file._restore_fold_state()
+    assert editor.file._fold_state is not None
+    highlighter.rehighlight_cancelled.emit()
+    assert editor.file._fold_state is None
+    highlighter.rehighlight_finished.emit()
+    assert FoldIndex.get(editor.document()).collapsed_triggers() == []
+    editor.file.close()
+
+
 @pytest.mark.parametrize('system, eol', [
     ('mac', '\r'), ('linux', '\n'), ('windows', '\r\n')
 ])
@@ -3,6 +3,7 @@ from pyqode.qt.QtTest import QTest
 import sys
 import pytest
 from pyqode.core import modes, panels
+from pyqode.core.api import TextBlockUserData
 
 from ..helpers import wait_for_connected, editor_open
 from ..helpers import server_path
@@ -70,6 +71,94 @@ def test_remove_message(editor):
     mode.clear_messages()
 
 
+@editor_open(__file__)
+def test_add_messages_diff(editor):
+    mode = get_mode(editor)
+    mode.clear_messages()
+    mode.add_messages([modes.CheckerMessage('desc', modes.CheckerMessages.ERROR,
+                                            10 + i)
+                       for i in range(10)])
+    # messages are applied synchronously
+    assert mode._finished
+    assert len(mode._messages) == 10
+    kept = mode._messages[5:]
+    mode.add_messages([modes.CheckerMessage('desc', modes.CheckerMessages.ERROR,
+                                            10 + i)
+                       for i in range(5, 15)])
+    assert len(mode._messages) == 10
+    # messages that did not change are kept as is
+    for msg in kept:
+        assert msg in mode._messages
+        assert msg.decoration in editor.decorations
+    assert sorted(msg.line for msg in mode._messages) == list(range(15, 25))
+    # a different status is a different message
+    mode.add_messages([modes.CheckerMessage('desc', modes.CheckerMessages.INFO,
+                                            15)])
+    assert len(mode._messages) == 1
+    assert mode._messages[0].status == modes.CheckerMessages.INFO
+    mode.clear_messages()
+
+
+@editor_open(__file__)
+def test_remap_messages(editor):
+    mode = get_mode(editor)
+    mode.clear_messages()
+    mode.add_messages([modes.CheckerMessage('desc', modes.CheckerMessages.ERROR,
+                                            10)])
+    msg = mode.messages[0]
+    # insert a line break at the start of the message line
+    cursor = editor.textCursor()
+    cursor.setPosition(editor.document().findBlockByNumber(10).position())
+    cursor.insertText('\n')
+    assert msg.line == 11
+    assert msg.block.blockNumber() == 11
+    assert msg in msg.block.userData().messages
+    assert msg not in (editor.document().findBlockByNumber(10).userData() or
+                       TextBlockUserData()).messages
+    # remove lines above the message
+    cursor.setPosition(0)
+    cursor.setPosition(
+        editor.document().findBlockByNumber(2).position(), cursor.KeepAnchor)
+    cursor.removeSelectedText()
+    assert msg.line == 9
+    assert msg in msg.block.userData().messages
+    mode.clear_messages()
+
+
+@editor_open(__file__)
+def test_superseded_analysis(editor):
+    mode = get_mode(editor)
+    mode.clear_messages()
+    mode._job_runner.cancel_requests()
+    # simulate a running analysis
+    mode._finished = False
+    mode._line_shifts = []
+    mode._request()
+    assert mode._pending
+    # a line is inserted at the top of the document while the analysis runs
+    cursor = editor.textCursor()
+    cursor.setPosition(0)
+    cursor.insertText('\n')
+    requests = []
+    mode._request = lambda: requests.append(True)
+    try:
+        mode._on_work_finished([('desc', 0, 10)])
+    finally:
+        del mode._request
+    # the outdated results are discarded and a new analysis is run
+    assert requests == [True]
+    assert not mode._pending
+    assert not mode.messages
+    # results of an analysis that was not superseded are remapped
+    mode._finished = False
+    mode._line_shifts = []
+    cursor.setPosition(0)
+    cursor.insertText('\n')
+    mode._on_work_finished([('desc', 0, 10)])
+    assert mode.messages[0].line == 11
+    mode.clear_messages()
+
+
 @editor_open(__file__)
 def test_work_finished(editor):
     mode = get_mode(editor)
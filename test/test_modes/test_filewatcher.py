@@ -18,7 +18,9 @@ def setup_module():
 
 
 def teardown_module():
-    os.remove(file_path)
+    # test_delete may have failed before writing the file again
+    if os.path.exists(file_path):
+        os.remove(file_path)
 
 
 def get_mode(editor):
@@ -63,9 +65,11 @@ def test_delete(editor):
     mode = get_mode(editor)
     mode.auto_reload = False
     os.remove(file_path)
-    QTest.qWait(1000)
-    with open(file_path, 'w') as f:
-        f.write("test file initial")
+    try:
+        QTest.qWait(1000)
+    finally:
+        with open(file_path, 'w') as f:
+            f.write("test file initial")
     editor.file.open(file_path)
 
 
@@ -61,3 +61,34 @@ def test_occurrences(editor):
         TextHelper(editor).goto_line(16, 7)
         QTest.qWait(2000)
         assert len(mode._decorations) > 0
+
+
+@ensure_visible
+def test_visible_occurrences(editor):
+    editor.file.open(__file__)
+    mode = get_mode(editor)
+    TextHelper(editor).goto_line(16, 7)
+    mode._send_request()
+    # visible occurrences are found without waiting for the backend
+    assert len(mode._decorations) > 0
+
+
+@ensure_visible
+def test_format_change(editor):
+    editor.file.open(__file__)
+    mode = get_mode(editor)
+    TextHelper(editor).goto_line(16, 7)
+    mode._send_request()
+    sub = mode._sub
+    assert sub
+    # changing the format of the text does not invalidate the occurrences
+    cursor = editor.textCursor()
+    cursor.select(cursor.LineUnderCursor)
+    fmt = QtGui.QTextCharFormat()
+    fmt.setFontItalic(True)
+    cursor.mergeCharFormat(fmt)
+    assert mode._sub == sub
+    # editing the text does
+    cursor.clearSelection()
+    cursor.insertText(' ')
+    assert mode._sub is None
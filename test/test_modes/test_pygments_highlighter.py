@@ -1,5 +1,8 @@
+from pyqode.qt import QtGui
 from pyqode.qt.QtTest import QTest
 from pyqode.core import modes
+from pyqode.core.api import (
+    ColorScheme, TextBlockHelper, get_block_symbol_data)
 from test.helpers import editor_open
 
 
@@ -27,3 +30,251 @@ def test_apply_all_pygments_styles(editor):
         mode.pygments_style = style
         assert mode.pygments_style == style
         QTest.qWait(500)
+
+
+@editor_open(__file__)
+def test_background_rehighlight(editor):
+    mode = get_mode(editor)
+    mode.BACKGROUND_REHIGHLIGHT_THRESHOLD = 10
+    progress = []
+    mode.rehighlight_progress.connect(
+        lambda nb, total: progress.append((nb, total)))
+    try:
+        mode.rehighlight()
+        assert mode.is_rehighlighting()
+        while mode.is_rehighlighting():
+            QTest.qWait(10)
+        nb_blocks = editor.document().blockCount()
+        assert progress[-1] == (nb_blocks, nb_blocks)
+    finally:
+        del mode.BACKGROUND_REHIGHLIGHT_THRESHOLD
+
+
+@editor_open(__file__)
+def test_background_rehighlight_edits(editor):
+    mode = get_mode(editor)
+    mode.BACKGROUND_REHIGHLIGHT_THRESHOLD = 10
+    try:
+        mode.rehighlight()
+        assert mode.is_rehighlighting()
+        # blocks highlighted ahead of the background rehighlight (out of
+        # the viewport, where the visible blocks get highlighted again)
+        mode._highlighted_blocks = set([100, 105, 150])
+        doc = editor.document()
+        # format changes are ignored
+        cursor = QtGui.QTextCursor(doc.findBlockByNumber(105))
+        cursor.movePosition(cursor.EndOfBlock, cursor.KeepAnchor)
+        fmt = QtGui.QTextCharFormat()
+        fmt.setFontWeight(QtGui.QFont.Bold)
+        cursor.mergeCharFormat(fmt)
+        assert set([100, 105, 150]) <= mode._highlighted_blocks
+        # the edited blocks are dropped, the next ones are renumbered
+        cursor.setPosition(doc.findBlockByNumber(105).position())
+        cursor.insertText('\n')
+        assert set([100, 151]) <= mode._highlighted_blocks
+        assert not set([105, 106, 150]) & mode._highlighted_blocks
+    finally:
+        mode.cancel_rehighlight()
+        del mode.BACKGROUND_REHIGHLIGHT_THRESHOLD
+
+
+def test_lazy_highlighting(editor):
+    mode = get_mode(editor)
+    mode.BACKGROUND_REHIGHLIGHT_THRESHOLD = 10
+    mode.LAZY_HIGHLIGHT_BLOCKS = 5
+    try:
+        text = '\n'.join('x = %d  # comment' % i for i in range(100))
+        for pending in (False, True):
+            # flush the rehighlight that Qt schedules when the mode is
+            # enabled (e.g. by a previous test)
+            QTest.qWait(10)
+            if pending:
+                # Qt ignores the document changes until its pending
+                # rehighlight runs, the text must be highlighted lazily
+                # anyway
+                mode.enabled = False
+                mode.enabled = True
+            editor.setPlainText(text, 'text/x-python', 'utf-8')
+            assert mode.is_rehighlighting()
+            block = editor.document().findBlockByNumber(99)
+            assert not block.layout().additionalFormats()
+            while mode.is_rehighlighting():
+                QTest.qWait(10)
+            assert block.layout().additionalFormats()
+    finally:
+        del mode.BACKGROUND_REHIGHLIGHT_THRESHOLD
+        del mode.LAZY_HIGHLIGHT_BLOCKS
+
+
+def test_token_cache(editor):
+    mode = get_mode(editor)
+    mode.set_mime_type('text/x-python')
+    runs, stack = mode._get_tokens('s = """doc', None)
+    assert stack is not None
+    assert mode._get_tokens('s = """doc', None) is \
+        mode._get_tokens('s = """doc', None)
+    # a different entry state gives different tokens
+    assert mode._get_tokens('end"""', stack)[0] != \
+        mode._get_tokens('end"""', None)[0]
+    # the cache is reset when the lexer changes
+    mode.set_mime_type('text/x-c')
+    mode._get_tokens('int i;', None)
+    assert ('end"""', stack) not in mode._token_cache
+    mode.set_mime_type('text/x-python')
+
+
+def test_token_cache_size(editor, monkeypatch):
+    from pyqode.core.modes import pygments_sh
+    lexed = []
+    lex = pygments_sh._lex
+
+    def count_lex(lexer, text, stack):
+        lexed.append(text)
+        return lex(lexer, text, stack)
+
+    def toggle_string():
+        cursor = editor.textCursor()
+        cursor.insertText('"""\n')
+        del lexed[:]
+        cursor.setPosition(0, cursor.KeepAnchor)
+        cursor.removeSelectedText()
+        return len(lexed)
+
+    mode = get_mode(editor)
+    mode.TOKEN_CACHE_SIZE = 100
+    monkeypatch.setattr(pygments_sh, '_lex', count_lex)
+    try:
+        # a document larger than TOKEN_CACHE_SIZE
+        editor.setPlainText('\n'.join('x = %d' % i for i in range(500)),
+                            'text/x-python', 'utf-8')
+        QtGui.QSyntaxHighlighter.rehighlight(mode)
+        # the cache grows with the document: the tokens of both states
+        # of the lines are kept, only the edited line is lexed again
+        assert toggle_string() < 10
+        assert len(mode._token_cache) > 500
+        mode.TOKEN_CACHE_RATIO = 0
+        assert toggle_string() >= 500
+        assert len(mode._token_cache) == 100
+    finally:
+        del mode.TOKEN_CACHE_SIZE
+        if 'TOKEN_CACHE_RATIO' in mode.__dict__:
+            del mode.TOKEN_CACHE_RATIO
+
+
+def test_state_propagation(editor):
+    mode = get_mode(editor)
+    editor.setPlainText('\n'.join('x = %d' % i for i in range(20)),
+                        'text/x-python', 'utf-8')
+    block = editor.document().findBlockByNumber(10)
+    formats = block.layout().additionalFormats()
+    # the new text is highlighted by setPlainText, even if Qt had a
+    # rehighlight pending (e.g. if the mode was enabled by a previous test),
+    # and the highlighters of the previous tests do not clear it
+    assert formats
+    QTest.qWait(10)
+    assert block.layout().additionalFormats() == formats
+    # opening a multi-line string changes the state of the next blocks
+    cursor = editor.textCursor()
+    cursor.setPosition(editor.document().findBlockByNumber(5).position())
+    cursor.insertText('s = """')
+    assert TextBlockHelper.get_state(block) != 0
+    assert block.layout().additionalFormats() != formats
+    # closing it restores them
+    cursor.insertText('"""')
+    assert TextBlockHelper.get_state(block) == 0
+    assert block.layout().additionalFormats() == formats
+    mode.rehighlight()
+    assert block.layout().additionalFormats() == formats
+
+
+def _get_formats(editor):
+    formats = []
+    block = editor.document().firstBlock()
+    while block.isValid():
+        formats.append([(r.start, r.length, r.format.foreground().color())
+                        for r in block.layout().additionalFormats()])
+        block = block.next()
+    return formats
+
+
+@editor_open(__file__)
+def test_threaded_tokenization(editor):
+    mode = get_mode(editor)
+    mode.BACKGROUND_REHIGHLIGHT_THRESHOLD = 10
+    try:
+        results = []
+        for threaded in (True, False):
+            mode.threaded_tokenization = threaded
+            mode._token_cache.clear()
+            mode.rehighlight()
+            while mode.is_rehighlighting():
+                QTest.qWait(10)
+            results.append(_get_formats(editor))
+        assert results[0] == results[1]
+    finally:
+        del mode.BACKGROUND_REHIGHLIGHT_THRESHOLD
+        mode.threaded_tokenization = True
+
+
+def test_long_line_limit(editor):
+    editor.long_line_limit = 100
+    try:
+        editor.setPlainText('x = [%s]' % ', '.join(['(1)'] * 100),
+                            'text/x-python', 'utf-8')
+        block = editor.document().firstBlock()
+        assert max(r.start + r.length
+                   for r in block.layout().additionalFormats()) <= 100
+        parentheses = get_block_symbol_data(editor, block)[0]
+        assert parentheses[-1].position < 100
+    finally:
+        editor.long_line_limit = 10000
+
+
+def test_shared_registry(editor):
+    from pyqode.core.modes import pygments_sh
+    mode = get_mode(editor)
+    mode.set_mime_type('text/x-python')
+    lexer = mode._lexer
+    mode._get_tokens('x = 1', None)
+    mode.set_lexer_from_filename('foo.py')
+    # each highlighter gets its own copy of the registry lexer
+    assert mode._lexer is not lexer
+    assert mode._lexer.__class__ is lexer.__class__
+    assert all(lexer is not shared
+               for shared in pygments_sh._LEXERS.values())
+    # an equivalent lexer keeps the token cache
+    mode._get_tokens('y = 2', None)
+    assert ('x = 1', None) in mode._token_cache
+    # color schemes get copies of the cached formats
+    scheme = ColorScheme('monokai')
+    other = ColorScheme('monokai')
+    assert scheme.formats['keyword'] is not other.formats['keyword']
+    assert scheme.formats['keyword'] == other.formats['keyword']
+    scheme.formats['keyword'].setFontUnderline(True)
+    assert not other.formats['keyword'].fontUnderline()
+    assert not ColorScheme('monokai').formats['keyword'].fontUnderline()
+
+
+def test_lexer_from_complex_filename(editor):
+    mode = get_mode(editor)
+    mode.set_lexer_from_filename('notes.txt')
+    text_lexer = mode._lexer.__class__
+    mode.set_lexer_from_filename('CMakeLists.txt')
+    assert mode._lexer.__class__ is not text_lexer
+    mode.set_lexer_from_filename('foo.txt')
+    assert mode._lexer.__class__ is text_lexer
+    mode.set_mime_type('text/x-python')
+
+
+def test_filename_key(monkeypatch):
+    from pyqode.core.modes import pygments_sh
+    # the filename patterns come from the public pygments registry, e.g. a
+    # plugin lexer
+    monkeypatch.setattr(pygments_sh, '_COMPLEX_FILENAME_PATTERNS', None)
+    monkeypatch.setattr(pygments_sh, 'get_all_lexers', lambda: iter([
+        ('Plugin', ('plugin', ), ('*.plugin.txt', '*.plg'), ())]))
+    key = pygments_sh._get_filename_key
+    assert key('foo.plugin.txt') == 'filename:foo.plugin.txt'
+    assert key('/path/to/foo.txt') == 'filename:*.txt'
+    assert key('foo.plg') == 'filename:*.plg'
+    assert key('Makefile') == 'filename:Makefile'
@@ -3,7 +3,7 @@ from pyqode.core import panels
 from pyqode.core.api import TextHelper
 from pyqode.qt import QtCore
 from pyqode.qt.QtTest import QTest
-from test.helpers import editor_open
+from test.helpers import editor_open, ensure_visible
 
 
 def get_panel(editor):
@@ -28,3 +28,26 @@ def test_enabled(editor):
 
 def check(data):
     return True, [('desc', i % 3, i + 1) for i in range(20)]
+
+
+@editor_open(__file__)
+@ensure_visible
+def test_global_checker_pixmap(editor):
+    panel = editor.panels.get(panels.GlobalCheckerPanel)
+    mode = get_mode(editor)
+    mode.clear_messages()
+    QTest.qWait(100)
+    panel.repaint()
+    pixmap = panel._pixmap
+    assert pixmap is not None
+    # scrolling does not render the messages again
+    editor.verticalScrollBar().setValue(10)
+    panel.repaint()
+    assert panel._pixmap is pixmap
+    revision = mode.messages_revision
+    mode.add_messages([modes.CheckerMessage('desc', i % 3, i + 1)
+                       for i in range(20)])
+    assert mode.messages_revision > revision
+    panel.repaint()
+    assert panel._pixmap is not pixmap
+    mode.clear_messages()
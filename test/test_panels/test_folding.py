@@ -129,3 +129,45 @@ def test_expand_all(editor):
         if TextBlockHelper.is_fold_trigger(block):
             assert TextBlockHelper.is_collapsed(block) is False
         block = block.next()
+
+
+@ensure_visible
+@editor_open('test/test_api/folding_cases/foo.py')
+def test_fold_to_level(editor):
+    panel = get_panel(editor)
+    QTest.qWait(1000)
+    panel.fold_to_level(1)
+    block = editor.document().firstBlock()
+    while block.blockNumber() < editor.document().blockCount() - 1:
+        lvl = TextBlockHelper.get_fold_lvl(block)
+        if block.text().strip():
+            assert block.isVisible() is (lvl <= 1)
+        if TextBlockHelper.is_fold_trigger(block):
+            assert TextBlockHelper.is_collapsed(block) is (lvl >= 1)
+        block = block.next()
+    # the methods of the class are still visible, their body is not
+    assert editor.document().findBlockByNumber(14).isVisible()
+    assert not editor.document().findBlockByNumber(18).isVisible()
+    panel.expand_all()
+    block = editor.document().firstBlock()
+    while block.isValid():
+        assert block.isVisible()
+        block = block.next()
+
+
+@ensure_visible
+@editor_open('test/test_api/folding_cases/foo.py')
+def test_fold_decorations(editor):
+    panel = get_panel(editor)
+    QTest.qWait(1000)
+    block = editor.document().findBlockByNumber(14)
+    assert TextBlockHelper.is_fold_trigger(block)
+    panel.toggle_fold_trigger(block)
+    assert list(panel._block_decos.keys()) == [14]
+    # the decoration follows the folded block when lines are inserted above
+    TextHelper(editor).goto_line(0)
+    editor.textCursor().insertText('\n\n')
+    QTest.qWait(100)
+    assert list(panel._block_decos.keys()) == [16]
+    panel.toggle_fold_trigger(editor.document().findBlockByNumber(16))
+    assert not panel._block_decos
@@ -155,3 +155,50 @@ def test_event_filter(editor):
     editor.show()
     QTest.qWait(1000)
     assert not panel.isVisible()
+
+
+@editor_open(__file__)
+@ensure_connected
+def test_incremental(editor):
+    panel = get_panel(editor)
+    panel.incremental = True
+    try:
+        panel.request_search('import')
+        QTest.qWait(2000)
+        nb_occurences = panel.cpt_occurences
+        assert nb_occurences > 1
+        # results are updated without running a new search
+        TextHelper(editor).goto_line(0)
+        editor.textCursor().insertText('import ')
+        assert panel.cpt_occurences == nb_occurences + 1
+        assert editor.toPlainText().startswith('import ')
+        assert panel.get_occurences()[0] == (0, len('import'))
+        # format changes (e.g. syntax highlighting) are ignored
+        version = panel._version
+        cursor = editor.textCursor()
+        cursor.select(cursor.LineUnderCursor)
+        fmt = QtGui.QTextCharFormat()
+        fmt.setFontItalic(True)
+        cursor.mergeCharFormat(fmt)
+        assert panel._version == version
+        assert panel.cpt_occurences == nb_occurences + 1
+    finally:
+        panel.incremental = False
+
+
+@editor_open(__file__)
+@ensure_connected
+def test_replace_all_single_undo(editor):
+    panel = get_panel(editor)
+    original = editor.toPlainText()
+    panel.request_search('import')
+    QTest.qWait(2000)
+    assert panel.cpt_occurences > 1
+    # test_replace counts the occurrences of its own replacement text in
+    # this module, use another one.
+    panel.replace_all('EXPORT')
+    assert panel.cpt_occurences == 0
+    assert editor.toPlainText() == original.replace('import', 'EXPORT')
+    # all the occurrences are replaced in one single edit block
+    editor.undo()
+    assert editor.toPlainText() == original
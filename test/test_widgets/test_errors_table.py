@@ -0,0 +1,129 @@
+from pyqode.core.modes import CheckerMessage, CheckerMessages
+from pyqode.core.widgets import ErrorsTable
+from pyqode.qt import QtCore, QtGui, QtWidgets
+
+
+def make_messages(nb_messages):
+    return [CheckerMessage('message %d' % i, i % 3, i,
+                           path='/tmp/file_%d.py' % (i % 5))
+            for i in range(nb_messages)]
+
+
+def test_add_messages():
+    table = ErrorsTable()
+    table.add_message(CheckerMessage(
+        'desc', CheckerMessages.ERROR, 10, path=__file__))
+    table.add_messages(make_messages(1000))
+    assert table.rowCount() == 1001
+    model = table.model()
+    assert model.index(0, 0).data() == 'Error'
+    assert model.index(0, 1).data() == 'test_errors_table.py'
+    assert model.index(0, 2).data() == '11'
+    assert model.index(0, 3).data() == 'desc'
+    assert model.index(0, 0).data(QtCore.Qt.DecorationRole) is not None
+    table.clear()
+    assert table.rowCount() == 0
+
+
+def test_sort_and_filter():
+    table = ErrorsTable()
+    messages = make_messages(100)
+    table.add_messages(messages)
+    model = table.model()
+    table.sortByColumn(2, QtCore.Qt.DescendingOrder)
+    assert model.message(0) is messages[-1]
+    # messages added to a sorted table are sorted
+    table.add_message(CheckerMessage('last', CheckerMessages.INFO, 1000))
+    assert model.message(0).description == 'last'
+    table.set_filter(statuses=[CheckerMessages.ERROR])
+    assert table.rowCount() == 33
+    table.set_filter('MESSAGE 9')
+    assert table.rowCount() == 11
+    table.set_filter()
+    # restore the insertion order
+    model.sort(-1)
+    assert model.message(0) is messages[0]
+    assert table.rowCount() == 101
+
+
+def test_msg_activated():
+    table = ErrorsTable()
+    messages = make_messages(10)
+    table.add_messages(messages)
+    activated = []
+    table.msg_activated.connect(activated.append)
+    table.activated.emit(table.model().index(3, 0))
+    assert activated == [messages[3]]
+
+
+def test_sorted_insertion():
+    table = ErrorsTable()
+    model = table.model()
+    table.sortByColumn(2, QtCore.Qt.AscendingOrder)
+    resets = []
+    model.modelReset.connect(lambda: resets.append(True))
+    for msg in make_messages(100)[::-1]:
+        table.add_message(msg)
+    assert not resets
+    assert [model.message(i).line for i in range(100)] == list(range(100))
+    # a lot of messages at once are sorted in one go
+    table.add_messages(make_messages(50))
+    assert len(resets) == 1
+    lines = [model.message(i).line for i in range(150)]
+    assert lines == sorted(lines)
+
+
+def test_icons():
+    class Table(ErrorsTable):
+        ICONS = dict(ErrorsTable.ICONS)
+        ICONS[CheckerMessages.ERROR] = QtGui.QIcon()
+
+    table = Table()
+    table.add_message(CheckerMessage('desc', CheckerMessages.ERROR, 10))
+    icon = table.model().index(0, 0).data(QtCore.Qt.DecorationRole)
+    assert icon.isNull()
+    assert table.item(0, 0).icon().isNull()
+    table = ErrorsTable()
+    table.add_message(CheckerMessage('desc', CheckerMessages.ERROR, 10))
+    assert not table.item(0, 0).icon().isNull()
+
+
+def test_table_widget_api():
+    table = ErrorsTable()
+    messages = make_messages(10)
+    table.add_messages(messages)
+    assert table.columnCount() == 4
+    item = table.item(3, 3)
+    assert item.text() == 'message 3'
+    assert item.data(QtCore.Qt.UserRole) is messages[3]
+    items = []
+    cells = []
+    table.itemActivated.connect(items.append)
+    table.cellActivated.connect(lambda row, col: cells.append((row, col)))
+    table.activated.emit(table.model().index(3, 0))
+    assert items[0].data(QtCore.Qt.UserRole) is messages[3]
+    assert cells == [(3, 0)]
+    current = []
+    table.currentItemChanged.connect(
+        lambda item, previous: current.append(item))
+    table.setCurrentCell(2, 1)
+    assert current[-1].text() == 'file_2.py'
+    assert table.currentRow() == 2
+    assert table.currentItem().data(QtCore.Qt.UserRole) is messages[2]
+    # rows are filled with setItem, like in a QTableWidget
+    table.setRowCount(12)
+    assert table.rowCount() == 12
+    assert table.item(11, 0) is None
+    msg = CheckerMessage('new', CheckerMessages.WARNING, 1)
+    item = QtWidgets.QTableWidgetItem('new')
+    item.setData(QtCore.Qt.UserRole, msg)
+    table.setItem(11, 0, item)
+    assert table.item(11, 0).text() == 'Warning'
+    assert table.model().message(11) is msg
+    table.removeRow(0)
+    assert table.model().message(0) is messages[1]
+    assert table.takeItem(0, 0).data(QtCore.Qt.UserRole) is messages[1]
+    assert table.item(0, 0) is None
+    table.setRowCount(0)
+    assert table.rowCount() == 0
+    assert table.model().messages == []